@@ -2,62 +2,392 @@ from http.server import BaseHTTPRequestHandler
 import json
 import tempfile
 import os
+import re
+import time
 import base64
-from paddleocr import PaddleOCR
+import binascii
+import threading
+from abc import ABC, abstractmethod
+
+# Read the request body in pieces of this size
+CHUNK_SIZE = 64 * 1024
+
+# Larger request bodies are refused with 413 before any of them is read
+MAX_UPLOAD_BYTES = int(float(os.environ.get('OCR_MAX_UPLOAD_MB', 20)) * 1024 * 1024)
+
+# Set OCR_PRELOAD=1 to load the model while the container starts rather than
+# on its first request
+PRELOAD = os.environ.get('OCR_PRELOAD', '0').lower() in ('1', 'true', 'on')
+
+# The model is created once per container and reused by every invocation
+# that container serves
+_ocr = None
+_ocr_lock = threading.Lock()
+_requests_served = 0
+
+def get_ocr():
+    """
+    The container's PaddleOCR model, loading it on first use. Returns the
+    model and the milliseconds spent loading it in this call (0 when warm).
+    """
+    global _ocr
+    if _ocr is not None:
+        return _ocr, 0.0
+    with _ocr_lock:
+        if _ocr is not None:
+            return _ocr, 0.0
+        started = time.perf_counter()
+        # Imported here so the import cost is part of the (reported) load
+        from paddleocr import PaddleOCR
+        _ocr = PaddleOCR(use_angle_cls=True, lang='en')
+        return _ocr, (time.perf_counter() - started) * 1000
+
+def warm_up():
+    """
+    Preload hook: load the model now so the next invocation is warm.
+    Returns the milliseconds spent loading (0 if it already was).
+    """
+    _, load_ms = get_ocr()
+    return load_ms
+
+if PRELOAD:
+    warm_up()
+
+class UploadWriter(ABC):
+    """
+    Base of the body readers below: each is fed the request body in chunks
+    and writes the uploaded file's bytes to ``out`` as they arrive, keeping
+    its first bytes for file_suffix
+    """
+
+    def __init__(self, out):
+        self.out = out
+        self.head = b''
+        self.size = 0
+
+    @abstractmethod
+    def feed(self, chunk):
+        """
+        Take the next chunk of the request body
+        """
+
+    def close(self):
+        pass
+
+    def _write(self, data):
+        if len(self.head) < 8:
+            self.head += data[:8 - len(self.head)]
+        self.out.write(data)
+        self.size += len(data)
+
+class RawWriter(UploadWriter):
+    """
+    A body that is the file itself (application/pdf, image/*)
+    """
+
+    def feed(self, chunk):
+        self._write(chunk)
+
+class Base64FieldWriter(UploadWriter):
+    """
+    Streams the base64 string value of one top-level JSON field (``"file"``)
+    out of a request body fed in chunks, decoding it into a binary file as
+    it arrives. The rest of the body is skipped without being parsed, so
+    neither the JSON nor the decoded file is ever held in memory whole.
+    """
+
+    def __init__(self, out, field='file'):
+        super().__init__(out)
+        self.pattern = re.compile(r'"' + re.escape(field) + r'"\s*:\s*"')
+        self.state = 'search'
+        self.window = ''
+        self.pending = ''
+        self.escape = False
+
+    def feed(self, chunk):
+        text = chunk.decode('ascii', errors='replace')
+        if self.state == 'search':
+            self.window += text
+            match = self.pattern.search(self.window)
+            if not match:
+                # Keep enough of the tail to match a key split across chunks
+                self.window = self.window[-64:]
+                return
+            text = self.window[match.end():]
+            self.window = ''
+            self.state = 'value'
+        if self.state == 'value':
+            self._value(text)
+
+    def _value(self, text):
+        end = None
+        chars = []
+        for index, char in enumerate(text):
+            if self.escape:
+                # Only "\/" can carry base64 data; "\n" etc. are line breaks
+                if char == '/':
+                    chars.append('/')
+                self.escape = False
+            elif char == '\\':
+                self.escape = True
+            elif char == '"':
+                end = index
+                break
+            elif not char.isspace():
+                chars.append(char)
+        self.pending += ''.join(chars)
+
+        # Decode whole 4-character groups, keep the remainder for next time
+        usable = len(self.pending) - len(self.pending) % 4
+        if end is not None:
+            usable = len(self.pending)
+            self.pending += '=' * (-usable % 4)
+            usable = len(self.pending)
+            self.state = 'done'
+        if usable:
+            self._write(base64.b64decode(self.pending[:usable], validate=True))
+            self.pending = self.pending[usable:]
+
+    def close(self):
+        if self.state == 'search':
+            raise ValueError("Request body has no 'file' field")
+        if self.state != 'done':
+            raise ValueError("Request body ended inside the 'file' field")
+
+class MultipartFileWriter(UploadWriter):
+    """
+    Streams the ``file`` part of a multipart/form-data body (or, without
+    one, the first part that carries a filename) to ``out``. Other parts
+    are skipped. Only the bytes that might begin a boundary are buffered.
+
+    A part with a filename that comes before the ``file`` part is written
+    to ``out`` as the fallback and replaced (``out`` is truncated) if the
+    ``file`` part follows.
+    """
+
+    def __init__(self, out, boundary, field='file'):
+        super().__init__(out)
+        # Every boundary but the first follows a line break; prefixing the
+        # body with one lets a single delimiter match them all
+        self.delimiter = b'\r\n--' + boundary
+        self.field = field
+        self.buffer = b'\r\n'
+        self.state = 'preamble'
+        # Kind of the part being read ('field', 'filename' or None to skip
+        # it) and whether a whole fallback part has been written
+        self.target = None
+        self.fallback = False
+
+    def feed(self, chunk):
+        self.buffer += chunk
+        while self.state != 'done':
+            if self.state in ('preamble', 'body'):
+                index = self.buffer.find(self.delimiter)
+                if index < 0:
+                    # Hold back what could be the start of a split delimiter
+                    keep = len(self.delimiter) - 1
+                    if self.target and len(self.buffer) > keep:
+                        self._write(self.buffer[:-keep])
+                    self.buffer = self.buffer[-keep:]
+                    return
+                if self.target:
+                    self._write(self.buffer[:index])
+                    if self.target == 'field':
+                        self.state = 'done'
+                        return
+                    self.fallback = True
+                self.buffer = self.buffer[index + len(self.delimiter):]
+                self.state = 'boundary'
+            elif self.state == 'boundary':
+                if len(self.buffer) < 2:
+                    return
+                if self.buffer.startswith(b'--'):
+                    # Closing boundary without a ``file`` part
+                    self.state = 'end'
+                    return
+                self.state = 'headers'
+            elif self.state == 'headers':
+                index = self.buffer.find(b'\r\n\r\n')
+                if index < 0:
+                    if len(self.buffer) > CHUNK_SIZE:
+                        raise ValueError("Multipart part headers too long")
+                    return
+                headers = self.buffer[:index].decode('latin-1')
+                self.buffer = self.buffer[index + 4:]
+                self.target = self._part_kind(headers)
+                if self.target == 'field' and self.size:
+                    # The ``file`` part replaces an earlier fallback part
+                    self.out.seek(0)
+                    self.out.truncate()
+                    self.head = b''
+                    self.size = 0
+                elif self.target == 'filename' and self.fallback:
+                    self.target = None
+                self.state = 'body'
+            else:
+                return
+
+    def _part_kind(self, headers):
+        """
+        'field' for the ``file`` part, 'filename' for another part with a
+        filename, None for a part to skip
+        """
+        for line in headers.split('\r\n'):
+            name, _, value = line.partition(':')
+            if name.strip().lower() != 'content-disposition':
+                continue
+            params = dict(re.findall(r';\s*([\w*]+)="?([^";]*)"?', value))
+            if params.get('name') == self.field:
+                return 'field'
+            if 'filename' in params:
+                return 'filename'
+            return None
+        return None
+
+    def close(self):
+        if self.state == 'done' or (self.state == 'end' and self.fallback):
+            return
+        if self.target:
+            raise ValueError("Request body ended inside the file part")
+        raise ValueError("Multipart body has no file part")
+
+def body_writer(content_type, out):
+    """
+    The UploadWriter for a request's Content-Type: the file itself for
+    application/pdf, image/* and application/octet-stream, the file part of
+    multipart/form-data, and otherwise (the original API) a JSON body with
+    the file base64-encoded in its "file" field
+    """
+    media_type, _, params = (content_type or '').partition(';')
+    media_type = media_type.strip().lower()
+    if media_type in ('application/pdf', 'application/octet-stream') or media_type.startswith('image/'):
+        return RawWriter(out)
+    if media_type == 'multipart/form-data':
+        match = re.search(r'boundary="?([^";]+)"?', params)
+        if not match:
+            raise ValueError("Multipart Content-Type has no boundary")
+        return MultipartFileWriter(out, match.group(1).strip().encode('latin-1'))
+    return Base64FieldWriter(out)
+
+def file_suffix(head):
+    """
+    Temporary file suffix from a file's first bytes; PaddleOCR tells PDFs
+    from images by the extension
+    """
+    if head.startswith(b'%PDF'):
+        return '.pdf'
+    if head.startswith(b'\x89PNG'):
+        return '.png'
+    if head.startswith(b'\xff\xd8'):
+        return '.jpg'
+    if head[:4] in (b'II*\x00', b'MM\x00*'):
+        return '.tiff'
+    if head.startswith(b'BM'):
+        return '.bmp'
+    return '.pdf'
+
+def read_body(rfile, length, sink):
+    """
+    Feed ``length`` bytes of the request body to ``sink`` in chunks
+    """
+    remaining = length
+    while remaining > 0:
+        chunk = rfile.read(min(CHUNK_SIZE, remaining))
+        if not chunk:
+            raise ValueError("Request body ended early")
+        remaining -= len(chunk)
+        sink(chunk)
 
 class handler(BaseHTTPRequestHandler):
+    def send_json(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(json.dumps(body).encode())
+
+    def do_GET(self):
+        # Warm-up hook, e.g. for a scheduled ping: loads the model if needed
+        try:
+            load_ms = warm_up()
+            self.send_json(200, {
+                "success": True,
+                "warm": True,
+                "cold_start": load_ms > 0,
+                "model_load_ms": round(load_ms, 1)
+            })
+        except Exception as e:
+            self.send_json(500, {"success": False, "error": str(e)})
+
     def do_POST(self):
+        global _requests_served
+        _requests_served += 1
+        first_request = _requests_served == 1
+        tmp_file_path = None
         try:
-            # Read the request
-            content_length = int(self.headers.get('Content-Length', 0))
-            post_data = self.rfile.read(content_length)
-            
-            # Parse JSON request
-            request_data = json.loads(post_data.decode('utf-8'))
-            file_data = base64.b64decode(request_data['file'])
-            
-            # Initialize PaddleOCR
-            ocr = PaddleOCR(use_angle_cls=True, lang='en')
-            
-            # Save file temporarily
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-                tmp_file.write(file_data)
-                tmp_file_path = tmp_file.name
-            
+            if self.headers.get('Content-Length') is None:
+                self.send_json(411, {"success": False, "error": "Content-Length required"})
+                return
+
+            # Only a body that can't be read is the client's fault (400);
+            # errors from the model and OCR below are the server's (500)
             try:
-                # Run OCR
-                result = ocr.ocr(tmp_file_path, cls=True)
-                
-                # Extract text
-                text = ""
-                for page_result in result:
-                    if page_result:
-                        for line in page_result:
-                            if len(line) >= 2:
-                                text += line[1][0] + "\n"
-                
-                # Return response
-                self.send_response(200)
-                self.send_header('Content-Type', 'application/json')
-                self.send_header('Access-Control-Allow-Origin', '*')
-                self.end_headers()
-                
-                response = {
-                    "success": True,
-                    "text": text
-                }
-                self.wfile.write(json.dumps(response).encode())
-                
-            finally:
-                os.unlink(tmp_file_path)
-                
+                content_length = int(self.headers['Content-Length'])
+                if content_length > MAX_UPLOAD_BYTES:
+                    self.send_json(413, {
+                        "success": False,
+                        "error": f"Upload larger than {MAX_UPLOAD_BYTES} bytes"
+                    })
+                    return
+
+                # Stream the uploaded file straight to disk
+                started = time.perf_counter()
+                with tempfile.NamedTemporaryFile(delete=False) as tmp_file:
+                    tmp_file_path = tmp_file.name
+                    writer = body_writer(self.headers.get('Content-Type'), tmp_file)
+                    read_body(self.rfile, content_length, writer.feed)
+                    writer.close()
+                upload_ms = (time.perf_counter() - started) * 1000
+
+                # PaddleOCR picks its PDF or image reader by extension
+                named_path = tmp_file_path + file_suffix(writer.head)
+                os.rename(tmp_file_path, named_path)
+                tmp_file_path = named_path
+            except (ValueError, binascii.Error) as e:
+                self.send_json(400, {"success": False, "error": str(e)})
+                return
+
+            ocr, load_ms = get_ocr()
+
+            # Run OCR
+            started = time.perf_counter()
+            result = ocr.ocr(tmp_file_path, cls=True)
+            ocr_ms = (time.perf_counter() - started) * 1000
+
+            # Extract text
+            text = ""
+            for page_result in result:
+                if page_result:
+                    for line in page_result:
+                        if len(line) >= 2:
+                            text += line[1][0] + "\n"
+
+            self.send_json(200, {
+                "success": True,
+                "text": text,
+                # A cold start loaded the model during this request
+                "cold_start": load_ms > 0,
+                "first_request": first_request,
+                "timings": {
+                    "upload_ms": round(upload_ms, 1),
+                    "model_load_ms": round(load_ms, 1),
+                    "ocr_ms": round(ocr_ms, 1)
+                },
+                "file_bytes": writer.size
+            })
+
         except Exception as e:
-            self.send_response(500)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            
-            error_response = {
-                "success": False,
-                "error": str(e)
-            }
-            self.wfile.write(json.dumps(error_response).encode())
\ No newline at end of file
+            self.send_json(500, {"success": False, "error": str(e)})
+        finally:
+            if tmp_file_path is not None and os.path.exists(tmp_file_path):
+                os.unlink(tmp_file_path)
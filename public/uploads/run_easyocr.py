@@ -2,7 +2,6 @@
 import sys
 import os
 import json
-import tempfile
 from pathlib import Path
 import traceback
 
@@ -20,6 +19,23 @@ except ImportError as e:
     }))
     sys.exit(1)
 
+# Shared OCR helpers (rendering, word tables, tracing) in src/parsers/ocr_common
+sys.path.insert(0, os.path.join(Path(__file__).resolve().parents[2], 'src', 'parsers'))
+
+from ocr_common.render import render_page, choose_zoom, parse_zoom, ZOOM_SETTING
+from ocr_common.columnar import WordTable
+from ocr_common.trace import start_trace, span, add_count
+
+# Render scale for PDF pages, 2x unless OCR_ZOOM sets it; with OCR_ZOOM=auto
+# each page gets the smallest scale that keeps its text legible
+PAGE_ZOOM = parse_zoom(ZOOM_SETTING, 2)
+
+# OCR_WORDS=columns outputs the word details as one array per field
+# ({"text": [...], "confidence": [...], "page": [...], "bbox": [...]})
+# instead of a dict per word, which is smaller and faster to serialize.
+# OCR_TRACE=1 prints stage timings and counters as a TRACE line on stderr.
+WORDS_LAYOUT = os.environ.get('OCR_WORDS', 'records').lower()
+
 def get_reader(languages=['en']):
     """Initialize the EasyOCR reader with specified languages"""
     print(f"Languages: {languages}", file=sys.stderr)
@@ -31,7 +47,8 @@ def get_reader(languages=['en']):
     
     try:
         print(f"Initializing EasyOCR with languages: {languages}")
-        return easyocr.Reader(languages, gpu=gpu)
+        with span('load'):
+            return easyocr.Reader(languages, gpu=gpu)
     except Exception as e:
         print(f"Error initializing EasyOCR: {e}", file=sys.stderr)
         raise
@@ -50,25 +67,25 @@ def process_image(image_path, reader=None):
             img = image_path
         
         # Perform OCR
-        results = reader.readtext(img)
+        with span('ocr'):
+            results = reader.readtext(img)
         
         # Extract text and confidence
         full_text = ""
-        word_details = []
         total_confidence = 0
+        kept = []
         
         for bbox, text, confidence in results:
             if text.strip():
                 full_text += text + " "
-                word_details.append({
-                    "text": text,
-                    "confidence": confidence,
-                    "bbox": bbox
-                })
+                kept.append((bbox, text, confidence))
                 total_confidence += confidence
         
+        word_details = WordTable.from_detections(kept)
+        
         # Calculate average confidence
         avg_confidence = total_confidence / len(results) if results else 0
+        add_count('words', len(kept))
         
         return full_text.strip(), word_details, avg_confidence
     
@@ -77,6 +94,14 @@ def process_image(image_path, reader=None):
         print(traceback.format_exc(), file=sys.stderr)
         raise
 
+def format_words(words):
+    """Word details for the JSON output: a dict per word, or columns with OCR_WORDS=columns"""
+    if WORDS_LAYOUT == 'columns':
+        columns = words.columns(form='quad')
+        columns['bbox'] = columns.pop('box')
+        return columns
+    return words.records(box_key='bbox', form='quad')
+
 def process_pdf(pdf_path, reader=None):
     """Process a PDF file page by page with EasyOCR"""
     if reader is None:
@@ -93,42 +118,28 @@ def process_pdf(pdf_path, reader=None):
         all_words = []
         total_confidence = 0
         total_results = 0
+        zooms = []
         
         # Process each page
         for page_num in range(num_pages):
             try:
                 print(f"Processing page {page_num + 1}/{num_pages}")
                 
-                # Get the page
-                page = pdf_document[page_num]
+                # Convert to a grayscale image, 2x zoom for better OCR unless chosen per page
+                zoom = choose_zoom(pdf_document[page_num], default=2.0) if PAGE_ZOOM == 'auto' else PAGE_ZOOM
+                zooms.append(zoom)
+                print(f"Page {page_num + 1} zoom: {zoom}", file=sys.stderr)
+                image = render_page(pdf_document, page_num, zoom, gray=True)
                 
-                # Convert to image
-                pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))  # 2x zoom for better OCR
+                # Process the image
+                page_text, page_words, page_confidence = process_image(image, reader)
+                add_count('pages', source='ocr')
                 
-                # Save to a temporary file
-                fd, temp_path = tempfile.mkstemp(suffix='.png')
-                os.close(fd)  # Close the file descriptor
-                
-                # Use a try-finally block to ensure cleanup
-                try:
-                    # Convert PyMuPDF pixmap to bytes
-                    pix.save(temp_path)
-                    
-                    # Process the image
-                    page_text, page_words, page_confidence = process_image(temp_path, reader)
-                    
-                    if page_text:
-                        all_text += page_text + "\n\n"
-                        all_words.extend(page_words)
-                        total_confidence += page_confidence * len(page_words)
-                        total_results += len(page_words)
-                finally:
-                    # Clean up the temporary file
-                    try:
-                        if os.path.exists(temp_path):
-                            os.unlink(temp_path)
-                    except Exception as e:
-                        print(f"Warning: Failed to delete temporary file: {e}", file=sys.stderr)
+                if page_text:
+                    all_text += page_text + "\n\n"
+                    all_words.append(page_words.with_page(page_num))
+                    total_confidence += page_confidence * len(page_words)
+                    total_results += len(page_words)
             
             except Exception as e:
                 print(f"Error processing page {page_num + 1}: {e}", file=sys.stderr)
@@ -141,7 +152,9 @@ def process_pdf(pdf_path, reader=None):
         # Calculate overall confidence
         avg_confidence = total_confidence / total_results if total_results > 0 else 0
         
-        return all_text.strip(), all_words, avg_confidence
+        all_words = WordTable.concat(all_words)
+        
+        return all_text.strip(), all_words, avg_confidence, zooms
         
     except Exception as e:
         print(traceback.format_exc(), file=sys.stderr)
@@ -166,22 +179,29 @@ if __name__ == "__main__":
         sys.exit(1)
     
     try:
-        # Initialize reader
-        reader = get_reader(['en'])
-        
-        # Check file type and process accordingly
-        if input_path.lower().endswith('.pdf'):
-            text, words, confidence = process_pdf(input_path, reader)
-        else:
-            # Assume it's an image
-            text, words, confidence = process_image(input_path, reader)
-        
-        # Return the results as JSON
-        print(json.dumps({
-            "text": text,
-            "words": words,
-            "confidence": confidence
-        }))
+        with start_trace('easyocr', file=os.path.basename(input_path)):
+            # Initialize reader
+            reader = get_reader(['en'])
+            
+            # Check file type and process accordingly
+            zooms = None
+            if input_path.lower().endswith('.pdf'):
+                text, words, confidence, zooms = process_pdf(input_path, reader)
+            else:
+                # Assume it's an image
+                text, words, confidence = process_image(input_path, reader)
+            
+            # Return the results as JSON
+            with span('serialize'):
+                result = {
+                    "text": text,
+                    "words": format_words(words),
+                    "confidence": confidence
+                }
+                if zooms is not None:
+                    # Render scale used for each page
+                    result["zoom"] = zooms
+                print(json.dumps(result))
         
     except Exception as e:
         print(json.dumps({
@@ -9,12 +9,15 @@ a deep learning-based OCR system.
 import os
 import io
 import sys
-import tempfile
+import json
+import asyncio
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, List, Dict, Any
 
 import uvicorn
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import FastAPI, File, UploadFile, HTTPException, Query
+from fastapi.responses import StreamingResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import numpy as np
@@ -23,6 +26,16 @@ import cv2
 import pdf2image
 import torch
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ocr_common.pipeline import DEFAULT_PREFETCH, prefetch
+from ocr_common.render import RenderedPage, open_pdf, iter_pdf_pages
+from ocr_common.cache import open_cache, hash_bytes, hash_array, make_key, package_version
+from ocr_common.textlayer import TEXT_LAYER_ENABLED, MIN_TEXT_CHARS
+from ocr_common.columnar import WordTable
+from ocr_common.trace import METRICS, start_trace, span, add_count, in_context
+from ocr_common.logs import log_level
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -30,6 +43,8 @@ logging.basicConfig(
     handlers=[logging.StreamHandler(sys.stdout)]
 )
 logger = logging.getLogger(__name__)
+# OCR_LOG_LEVEL overrides the level (default: INFO); DEBUG adds per-batch detail
+logger.setLevel(log_level("INFO"))
 
 # Initialize FastAPI app
 app = FastAPI(title="DocTR Document Processing API")
@@ -55,7 +70,8 @@ try:
 
     # Load models
     logger.info("Loading DocTR models...")
-    predictor = ocr_predictor(pretrained=True).to(device)
+    with span("load"):
+        predictor = ocr_predictor(pretrained=True).to(device)
     logger.info("DocTR models loaded successfully")
 except ImportError:
     logger.error("Failed to import DocTR. Please install it with: pip install python-doctr")
@@ -64,235 +80,788 @@ except Exception as e:
     logger.error(f"Error initializing DocTR models: {e}")
     predictor = None
 
+# Micro-batching: pages from concurrent requests that arrive within this window
+# are run through the predictor together (up to DOCTR_MAX_BATCH_PAGES pages)
+BATCH_WINDOW_MS = float(os.environ.get("DOCTR_BATCH_WINDOW_MS", 20))
+MAX_BATCH_PAGES = int(os.environ.get("DOCTR_MAX_BATCH_PAGES", 16))
+
+class PageBatcher:
+    """
+    Collects pages submitted by concurrent requests and runs them through the
+    predictor as one batch, resolving each page's future with its own result.
+    """
+
+    def __init__(self, predictor, window_ms, max_pages):
+        self.predictor = predictor
+        self.window = window_ms / 1000
+        self.max_pages = max(1, max_pages)
+        self._queue = None
+        self._task = None
+        # A single inference thread: batches run one at a time off the event loop
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="doctr-batch")
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._executor.shutdown(wait=False)
+
+    @property
+    def queued_pages(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def submit(self, image):
+        """Queue one page image; the returned future resolves to its DocTR Page."""
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((image, future))
+        return future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.window
+        
+        while len(batch) < self.max_pages:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        
+        # Callers that gave up (e.g. disconnected) don't need inference
+        return [(image, future) for image, future in batch if not future.done()]
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            if not batch:
+                continue
+            
+            logger.debug("Running OCR prediction on a batch of %d page(s)", len(batch))
+            add_count("batch_pages", len(batch))
+            try:
+                # Timed here for the whole batch; each request times its own wait
+                with span("ocr_batch"):
+                    result = await loop.run_in_executor(
+                        self._executor, self.predictor, [image for image, _ in batch]
+                    )
+            except Exception as e:
+                logger.error(f"Batch prediction failed: {str(e)}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            
+            for (_, future), page in zip(batch, result.pages):
+                if not future.done():
+                    future.set_result(page)
+
+batcher = PageBatcher(predictor, BATCH_WINDOW_MS, MAX_BATCH_PAGES) if predictor is not None else None
+
+# Documents processed at once; further uploads get 503 with Retry-After
+MAX_CONCURRENCY = int(os.environ.get("DOCTR_MAX_CONCURRENCY", 4))
+RETRY_AFTER_SECONDS = int(os.environ.get("DOCTR_RETRY_AFTER", 5))
+
+# Bounded pool for the blocking, non-inference work (decoding, PDF loading,
+# result summaries) so it never runs on the event loop
+cpu_executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENCY, thread_name_prefix="doctr-cpu")
+
+class RequestLimiter:
+    """Counts documents in flight and refuses new ones past the limit."""
+
+    def __init__(self, limit):
+        self.limit = max(1, limit)
+        self.active = 0
+
+    def acquire(self):
+        # Only touched from the event loop thread, so no lock is needed
+        if self.active >= self.limit:
+            return False
+        self.active += 1
+        return True
+
+    def release(self):
+        self.active -= 1
+
+limiter = RequestLimiter(MAX_CONCURRENCY)
+
+class LimitedStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse holding a limiter slot, released once the response is
+    over however it ends: finished, failed, or the client gone before or
+    while the body streams (when the body may never have started).
+    """
+
+    def __init__(self, content, limiter, **kwargs):
+        super().__init__(content, **kwargs)
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            try:
+                # Runs the body's cleanup if it was cut off part way
+                await self.body_iterator.aclose()
+            finally:
+                self.limiter.release()
+
+async def run_blocking(func, *args):
+    """Run a blocking call on the bounded CPU executor, as part of the current trace."""
+    return await asyncio.get_running_loop().run_in_executor(cpu_executor, in_context(func), *args)
+
+# Cache counters for /status and /metrics are read on their own thread, so
+# those endpoints neither block the event loop nor wait behind OCR work on
+# cpu_executor, and give up after STATS_TIMEOUT_SECONDS (e.g. while another
+# process holds the cache file locked)
+stats_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="doctr-stats")
+STATS_TIMEOUT_SECONDS = float(os.environ.get("DOCTR_STATS_TIMEOUT", 2))
+
+async def cache_stats():
+    """The cache's counters, or None without a cache or when they take too long."""
+    if cache is None:
+        return None
+    future = asyncio.get_running_loop().run_in_executor(stats_executor, cache.stats)
+    try:
+        return await asyncio.wait_for(future, STATS_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        logger.warning(f"OCR cache stats took longer than {STATS_TIMEOUT_SECONDS}s, leaving them out")
+        return None
+
+@app.on_event("startup")
+async def start_batcher():
+    if batcher is not None:
+        batcher.start()
+
+@app.on_event("shutdown")
+async def stop_batcher():
+    if batcher is not None:
+        await batcher.stop()
+    cpu_executor.shutdown(wait=False)
+    stats_executor.shutdown(wait=False)
+
+# Shared on-disk result cache (disabled with OCR_CACHE=0)
+cache = open_cache()
+
+# Bump when a change to this server alters its responses, so cached results
+# from the old version are not reused
+PIPELINE_VERSION = 2
+
+IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.tif']
+
+# Word geometry in responses: "full" relative [[x0, y0], [x1, y1]] boxes,
+# "compact" [x0, y0, x1, y1] integer boxes in thousandths of the page size,
+# or "none" to leave boxes out
+GEOMETRY_MODES = ("full", "compact", "none")
+COMPACT_SCALE = 1000
+
+STREAM_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "sse": "text/event-stream"}
+
+# Word details as a list of per-word dicts ("records") or as one array per
+# field ("columns"), which is much smaller and faster to produce
+WORD_LAYOUTS = ("records", "columns")
+
+def cache_key(file_content, kind):
+    """Cache key for an upload under the current DocTR version and settings."""
+    return make_key(hash_bytes(file_content), 'doctr', package_version('python-doctr'), {
+        'pipeline': PIPELINE_VERSION,
+        'type': kind,
+        'zoom': 2,
+        'text_layer': TEXT_LAYER_ENABLED,
+        'text_layer_min_chars': MIN_TEXT_CHARS,
+    })
+
+def lookup_page(image):
+    """Cache key and stored summary (or None) for one rendered page."""
+    key = make_key(hash_array(image), 'doctr-page', package_version('python-doctr'), {
+        'pipeline': PIPELINE_VERSION,
+    })
+    with span("cache"):
+        cached = cache.get(key)
+    if cached is None:
+        return key, None
+    return key, {"text": cached["text"], "words": WordTable.from_columns(cached["words"])}
+
+def store_page(key, summary):
+    """Cache one page summary, its words stored as columns."""
+    with span("cache"):
+        cache.put(key, {"text": summary["text"], "words": summary["words"].columns()})
+
+async def iter_page_summaries(pages, depth=None):
+    """
+    Summarize RenderedPages, yielding (page number, summary, source) in page
+    order as soon as each page is done. ``source`` is "text_layer", "cache"
+    or "ocr": pages read from the PDF's text layer and pages already in the
+    cache are answered directly; only the rest are sent to the batcher.
+
+    ``pages`` may be a lazy iterator (e.g. pages being rendered on a
+    background thread); pulling from it and hashing happen off the event
+    loop, and later pages keep being submitted while earlier ones are
+    waiting for the model, up to ``depth`` pages (OCR_PREFETCH_PAGES) at a
+    time: the feeder waits for a slot before submitting another page image,
+    so a long document doesn't queue all its pages in memory.
+    """
+    ready = asyncio.Queue()
+    in_flight = asyncio.Semaphore(max(1, DEFAULT_PREFETCH if depth is None else depth))
+    stopping = False
+    
+    async def feed():
+        iterator = iter(pages)
+        try:
+            while not stopping:
+                page = await run_blocking(next, iterator, None)
+                if page is None:
+                    break
+                
+                if page.words is not None:
+                    ready.put_nowait((page.number, "text_layer", text_layer_summary(page), None, None))
+                    continue
+                if page.image is None:
+                    continue
+                
+                key, cached = await run_blocking(lookup_page, page.image) if cache is not None else (None, None)
+                if cached is not None:
+                    ready.put_nowait((page.number, "cache", cached, None, None))
+                    continue
+                
+                # Released once the page's result is back
+                await in_flight.acquire()
+                if stopping:
+                    break
+                ready.put_nowait((page.number, "ocr", None, key, batcher.submit(page.image)))
+        finally:
+            ready.put_nowait(None)
+    
+    feeder = asyncio.ensure_future(feed())
+    try:
+        while True:
+            item = await ready.get()
+            if item is None:
+                break
+            number, source, summary, key, future = item
+            if future is not None:
+                # Queueing for and running through the batched predictor
+                try:
+                    with span("ocr", page=number):
+                        page = await future
+                finally:
+                    in_flight.release()
+                summary = await run_blocking(summarize_page, page)
+                if key is not None:
+                    await run_blocking(store_page, key, summary)
+            add_count("pages", source=source)
+            yield number, summary, source
+        await feeder
+    finally:
+        # Let the feeder finish the page it is on rather than cancelling it,
+        # so the page iterator isn't closed while a thread is still in it,
+        # and drop queued pages nobody is waiting for any more. A feeder
+        # waiting for a slot is woken up and sees it should stop
+        stopping = True
+        in_flight.release()
+        await asyncio.gather(feeder, return_exceptions=True)
+        while not ready.empty():
+            item = ready.get_nowait()
+            if item is not None and item[4] is not None:
+                item[4].cancel()
+
+async def collect_pages(page_summaries):
+    """
+    Gather the output of iter_page_summaries into the page summaries in
+    order and counts of pages answered from the text layer and the cache.
+    """
+    summaries = []
+    counts = {"text_layer_pages": 0, "page_hits": 0}
+    
+    async for _, summary, source in page_summaries:
+        summaries.append(summary)
+        if source == "text_layer":
+            counts["text_layer_pages"] += 1
+        elif source == "cache":
+            counts["page_hits"] += 1
+    
+    return summaries, counts
+
 class OCRResponse(BaseModel):
     """Response model for OCR results"""
     text: str
     confidence: float
     words: List[Dict[str, Any]] = []
+    columns: Optional[Dict[str, Any]] = None
     pages: int = 1
+    text_layer_pages: int = 0
+    cache: Optional[Dict[str, Any]] = None
 
 @app.get("/")
 async def root():
     """Root endpoint"""
     return {"message": "DocTR Document Processing API. POST to /process_document to analyze documents."}
 
+@app.get("/metrics")
+async def metrics():
+    """Stage timings, page and request counters and current load in Prometheus text format."""
+    METRICS.set("ocr_active_requests", limiter.active)
+    METRICS.set("ocr_queued_pages", batcher.queued_pages if batcher is not None else 0)
+    for name, value in (await cache_stats() or {}).items():
+        METRICS.set(f"ocr_cache_{name}", value)
+    return PlainTextResponse(METRICS.prometheus(), media_type="text/plain; version=0.0.4")
+
 @app.get("/status")
 async def status():
     """Check service status"""
     return {
         "status": "ok" if predictor is not None else "error",
         "device": str(device) if predictor is not None else "N/A",
-        "message": "DocTR service is running" if predictor is not None else "DocTR failed to initialize"
+        "message": "DocTR service is running" if predictor is not None else "DocTR failed to initialize",
+        "active_requests": limiter.active,
+        "max_concurrency": limiter.limit,
+        "queued_pages": batcher.queued_pages if batcher is not None else 0,
+        "cache": await cache_stats()
     }
 
-def process_pdf(file_content):
+def summarize_page(page):
+    """
+    Text and word details (a WordTable) of one DocTR page.
+    
+    Nothing in the summary depends on where the page sits in the document,
+    so it can be cached and reused for the same page in another upload.
+    """
+    page_text = ""
+    texts = []
+    confidences = []
+    rects = []
+    
+    with span("reconstruct"):
+        for block in page.blocks:
+            for line in block.lines:
+                line_text = " ".join([word.value for word in line.words])
+                page_text += line_text + " "
+                
+                for word in line.words:
+                    try:
+                        (x0, y0), (x1, y1) = word.geometry
+                        rects.append((float(x0), float(y0), float(x1), float(y1)))
+                        confidences.append(float(word.confidence))
+                        texts.append(word.value)
+                    except Exception as e:
+                        logger.error(f"Error processing word: {str(e)}")
+        
+        return {"text": page_text.strip(), "words": WordTable.from_rects(texts, confidences, rects)}
+
+def text_layer_summary(page):
+    """
+    Summary of a page read from the PDF's text layer, in the same form as
+    summarize_page (relative word boxes, full confidence).
+    """
+    width, height = page.size
+    rects = np.array([word[:4] for word in page.words], dtype=np.float64).reshape(-1, 4)
+    rects /= (width, height, width, height)
+    texts = [word.text for word in page.words]
+    words = WordTable.from_rects(texts, np.ones(len(texts)), rects)
+    return {"text": " ".join(texts), "words": words}
+
+def combine_pages(summaries):
+    """Join page summaries into full text, average confidence and one WordTable."""
+    with span("reconstruct"):
+        full_text = "".join(summary["text"] + "\n\n" for summary in summaries)
+        words = WordTable.concat([summary["words"].with_page(page_idx) for page_idx, summary in enumerate(summaries)])
+    add_count("words", len(words))
+    
+    logger.info(f"Extracted text length: {len(full_text)}")
+    
+    confidence = words.mean_confidence()
+    logger.info(f"Processed {len(words)} words with average confidence {confidence:.2f}")
+    
+    return full_text, confidence, words, len(summaries)
+
+def decode_image(file_content):
+    """
+    Decode image upload bytes straight from memory into an RGB page array.
+    
+    The bytes are wrapped without copying; formats OpenCV can't decode fall
+    back to DocTR's own loader, which also reads from bytes.
+    """
+    image = cv2.imdecode(np.frombuffer(file_content, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        return DocumentFile.from_images(file_content)
+    
+    cv2.cvtColor(image, cv2.COLOR_BGR2RGB, dst=image)
+    return [image]
+
+def close_pdf_pages(rendered, doc):
+    """Stop the render thread, then close the document it reads."""
+    rendered.close()
+    doc.close()
+
+async def summarize_pdf(file_content):
+    """Page summaries of a PDF upload, as iter_page_summaries yields them."""
+    # Render pages from the upload bytes on a background thread (same 2x
+    # scale as DocumentFile.from_pdf) and hand each page to the batcher as
+    # soon as it is ready
+    doc = await run_blocking(open_pdf, file_content)
+    logger.info(f"Document loaded with {len(doc)} page(s)")
+    
+    # Pages with an embedded text layer skip rendering and the model
+    rendered = prefetch(iter_pdf_pages(doc, zoom=2, text_layer=TEXT_LAYER_ENABLED))
+    summaries = iter_page_summaries(rendered)
+    try:
+        async for item in summaries:
+            yield item
+    finally:
+        # Stop the feeder pulling pages first; closing the pages then waits
+        # for the render thread to finish its page, so it runs off the loop
+        await summaries.aclose()
+        await run_blocking(close_pdf_pages, rendered, doc)
+
+async def summarize_image(file_content):
+    """Page summaries of an image upload, as iter_page_summaries yields them."""
+    doc = await run_blocking(decode_image, file_content)
+    logger.info(f"Image loaded with {len(doc)} page(s)")
+    
+    async for item in iter_page_summaries(RenderedPage(i, image) for i, image in enumerate(doc)):
+        yield item
+
+async def process_pdf(file_content):
     """Process a PDF file with DocTR."""
     try:
-        # Save the file content to a temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp:
-            temp.write(file_content)
-            temp_path = temp.name
-        
-        logger.info(f"Created temporary file at {temp_path}")
-        
-        # Process with DocTR
-        logger.info("Loading document with DocumentFile.from_pdf")
-        doc = DocumentFile.from_pdf(temp_path)
-        logger.info(f"Document loaded: {type(doc)} with {len(doc)} page(s)")
-        
-        logger.info("Running OCR prediction")
-        result = predictor(doc)
-        logger.info(f"Prediction result type: {type(result)}")
-        
-        # Debug the result structure
-        exported = result.export()
-        logger.info(f"Export result type: {type(exported)}")
-        logger.info(f"Export result keys: {list(exported.keys()) if isinstance(exported, dict) else 'Not a dict'}")
-        
-        # Try different approaches to get the text
-        if isinstance(exported, dict) and 'text' in exported:
-            full_text = exported['text']
-        elif hasattr(result, 'text'):
-            full_text = result.text
-        elif hasattr(result, 'get_text'):
-            full_text = result.get_text()
-        else:
-            # If we can't get text directly, reconstruct it from pages/blocks/lines/words
-            full_text = ""
-            for page in result.pages:
-                page_text = ""
-                for block in page.blocks:
-                    for line in block.lines:
-                        line_text = " ".join([word.value for word in line.words])
-                        page_text += line_text + " "
-                full_text += page_text.strip() + "\n\n"
-        
-        logger.info(f"Extracted text length: {len(full_text)}")
-        
-        # Calculate average confidence and word details
-        word_details = []
-        total_confidence = 0
-        word_count = 0
-        
-        for page_idx, page in enumerate(result.pages):
-            for block_idx, block in enumerate(page.blocks):
-                for line_idx, line in enumerate(block.lines):
-                    for word_idx, word in enumerate(line.words):
-                        try:
-                            word_detail = {
-                                "text": word.value,
-                                "confidence": float(word.confidence),
-                                "box": [
-                                    [float(word.geometry[0][0]), float(word.geometry[0][1])],
-                                    [float(word.geometry[1][0]), float(word.geometry[1][1])]
-                                ],
-                                "page": page_idx
-                            }
-                            word_details.append(word_detail)
-                            total_confidence += word.confidence
-                            word_count += 1
-                        except Exception as e:
-                            logger.error(f"Error processing word: {str(e)}")
-        
-        confidence = total_confidence / word_count if word_count > 0 else 0
-        logger.info(f"Processed {word_count} words with average confidence {confidence:.2f}")
-        
-        # Clean up
-        os.unlink(temp_path)
-        logger.info(f"Temporary file {temp_path} removed")
-        
-        return full_text, confidence, word_details, len(result.pages)
+        summaries, counts = await collect_pages(summarize_pdf(file_content))
+        return combine_pages(summaries), counts
     
     except Exception as e:
         logger.error(f"Error in process_pdf: {str(e)}")
         logger.exception("Detailed traceback:")
         raise
 
-def process_image(file_content):
+async def process_image(file_content):
     """Process an image file with DocTR."""
     try:
-        # Save the file content to a temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as temp:
-            temp.write(file_content)
-            temp_path = temp.name
-        
-        logger.info(f"Created temporary file at {temp_path}")
-        
-        # Process with DocTR
-        logger.info("Loading document with DocumentFile.from_images")
-        doc = DocumentFile.from_images(temp_path)
-        logger.info(f"Document loaded: {type(doc)} with {len(doc)} page(s)")
-        
-        logger.info("Running OCR prediction")
-        result = predictor(doc)
-        logger.info(f"Prediction result type: {type(result)}")
-        
-        # Debug the result structure
-        exported = result.export()
-        logger.info(f"Export result type: {type(exported)}")
-        logger.info(f"Export result keys: {list(exported.keys()) if isinstance(exported, dict) else 'Not a dict'}")
-        
-        # Try different approaches to get the text
-        if isinstance(exported, dict) and 'text' in exported:
-            full_text = exported['text']
-        elif hasattr(result, 'text'):
-            full_text = result.text
-        elif hasattr(result, 'get_text'):
-            full_text = result.get_text()
-        else:
-            # If we can't get text directly, reconstruct it from pages/blocks/lines/words
-            full_text = ""
-            for page in result.pages:
-                page_text = ""
-                for block in page.blocks:
-                    for line in block.lines:
-                        line_text = " ".join([word.value for word in line.words])
-                        page_text += line_text + " "
-                full_text += page_text.strip() + "\n\n"
-        
-        logger.info(f"Extracted text length: {len(full_text)}")
-        
-        # Calculate average confidence and word details
-        word_details = []
-        total_confidence = 0
-        word_count = 0
-        
-        for page_idx, page in enumerate(result.pages):
-            for block_idx, block in enumerate(page.blocks):
-                for line_idx, line in enumerate(block.lines):
-                    for word_idx, word in enumerate(line.words):
-                        try:
-                            word_detail = {
-                                "text": word.value,
-                                "confidence": float(word.confidence),
-                                "box": [
-                                    [float(word.geometry[0][0]), float(word.geometry[0][1])],
-                                    [float(word.geometry[1][0]), float(word.geometry[1][1])]
-                                ],
-                                "page": page_idx
-                            }
-                            word_details.append(word_detail)
-                            total_confidence += word.confidence
-                            word_count += 1
-                        except Exception as e:
-                            logger.error(f"Error processing word: {str(e)}")
-        
-        confidence = total_confidence / word_count if word_count > 0 else 0
-        logger.info(f"Processed {word_count} words with average confidence {confidence:.2f}")
-        
-        # Clean up
-        os.unlink(temp_path)
-        logger.info(f"Temporary file {temp_path} removed")
-        
-        return full_text, confidence, word_details, len(result.pages)
+        summaries, counts = await collect_pages(summarize_image(file_content))
+        return combine_pages(summaries), counts
     
     except Exception as e:
         logger.error(f"Error in process_image: {str(e)}")
         logger.exception("Detailed traceback:")
         raise
-    
+
+def upload_kind(filename):
+    """Kind of an upload ("pdf" or "image") from its file name, or None."""
+    file_extension = os.path.splitext(filename)[1].lower()
+    if file_extension == '.pdf':
+        return 'pdf'
+    if file_extension in IMAGE_EXTENSIONS:
+        return 'image'
+    return None
+
+def check_geometry(geometry):
+    """Reject an unknown geometry mode with a 400."""
+    if geometry not in GEOMETRY_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported geometry '{geometry}'. Use one of: {', '.join(GEOMETRY_MODES)}"
+        )
+
+def check_word_layout(words):
+    """Reject an unknown word layout with a 400."""
+    if words not in WORD_LAYOUTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported words layout '{words}'. Use one of: {', '.join(WORD_LAYOUTS)}"
+        )
+
+def format_words(words, geometry, page=True):
+    """Per-word dicts of a WordTable in the requested geometry form (see GEOMETRY_MODES)."""
+    if geometry == "full":
+        return words.records(form="rect", page=page)
+    if geometry == "none":
+        return words.records(box_key=None, page=page)
+    return words.records(form="flat", page=page, scale=COMPACT_SCALE, decimals=3)
+
+def format_columns(words, geometry):
+    """Columns of a WordTable, with flat [x0, y0, x1, y1] boxes in the requested geometry form."""
+    if geometry == "full":
+        return words.columns(form="flat")
+    if geometry == "none":
+        return words.columns(form=None)
+    return words.columns(form="flat", scale=COMPACT_SCALE, decimals=3)
+
+def word_fields(words, geometry, layout, page=True):
+    """The words/columns fields of a response for the requested layout."""
+    if layout == "columns":
+        return {"words": [], "columns": format_columns(words, geometry)}
+    return {"words": format_words(words, geometry, page)}
+
+def cache_document(full_text, confidence, words, num_pages, counts):
+    """Document cache value, its words stored as columns."""
+    return {
+        "text": full_text,
+        "confidence": confidence,
+        "words": words.columns(),
+        "pages": num_pages,
+        "text_layer_pages": counts["text_layer_pages"]
+    }
+
+def cached_page_summaries(cached):
+    """Split a cached document back into per-page summaries."""
+    texts = cached["text"].split("\n\n")
+    words = WordTable.from_columns(cached["words"])
+    return [
+        {"text": texts[i] if i < len(texts) else "", "words": page_words}
+        for i, page_words in enumerate(words.pages(cached["pages"]))
+    ]
+
+def page_record(number, summary, source, geometry, layout):
+    """Streamed record of one finished page."""
+    words = summary["words"].with_page(number)
+    return {
+        "type": "page",
+        "page": number,
+        "text": summary["text"],
+        "confidence": words.mean_confidence(),
+        **word_fields(words, geometry, layout, page=False),
+        "source": source
+    }
+
+def encode_record(record, stream_format):
+    """One NDJSON line or server-sent event."""
+    with span("serialize"):
+        data = json.dumps(record)
+    if stream_format == "sse":
+        return f"event: {record['type']}\ndata: {data}\n\n"
+    return data + "\n"
+
 @app.post("/process_document", response_model=OCRResponse)
-async def process_document(file: UploadFile = File(...)):
+async def process_document(
+    file: UploadFile = File(...),
+    geometry: str = Query("full"),
+    words: str = Query("records")
+):
     """
     Process a document (PDF or image) using DocTR
     
     Args:
         file: Uploaded file (PDF or image)
+        geometry: Word box form, one of GEOMETRY_MODES
+        words: Word details as "records" (a dict per word) or "columns" (one array per field)
         
     Returns:
         OCRResponse: Extracted text and confidence
     """
     if predictor is None:
         raise HTTPException(status_code=500, detail="OCR service not properly initialized")
+    check_geometry(geometry)
+    check_word_layout(words)
+    
+    if not limiter.acquire():
+        logger.warning(f"Rejecting {file.filename}: {limiter.active} documents already in progress")
+        raise HTTPException(
+            status_code=503,
+            detail="OCR service is busy, please retry later",
+            headers={"Retry-After": str(RETRY_AFTER_SECONDS)}
+        )
     
     try:
         # Read file content
         file_content = await file.read()
         
         # Check file type and process accordingly
-        file_extension = os.path.splitext(file.filename)[1].lower()
+        kind = upload_kind(file.filename)
         
-        logger.info(f"Processing {file.filename} ({file_extension})")
+        logger.info(f"Processing {file.filename} ({kind})")
         
-        if file_extension == '.pdf':
-            full_text, confidence, word_details, num_pages = process_pdf(file_content)
-        elif file_extension in ['.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.tif']:
-            full_text, confidence, word_details, num_pages = process_image(file_content)
-        else:
+        if kind is None:
             raise HTTPException(status_code=400, detail="Unsupported file format. Please upload a PDF or image file.")
-        
-        logger.info(f"Processed document with {len(word_details)} words across {num_pages} pages. Confidence: {confidence:.2f}")
-        
+        with start_trace("process_document", filename=file.filename, kind=kind):
+            return await process_upload(file_content, file.filename, kind, geometry, words)
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error processing document: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error processing document: {str(e)}")
+    finally:
+        limiter.release()
+
+async def process_upload(file_content, filename, kind, geometry, words):
+    """The /process_document response for one upload, from the cache when possible."""
+    process = process_pdf if kind == 'pdf' else process_image
+    
+    # Repeat uploads of the same document are answered from the cache
+    key = None
+    if cache is not None:
+        key = await run_blocking(cache_key, file_content, kind)
+        cached = await run_blocking(cache.get, key)
+        if cached is not None:
+            logger.info(f"OCR cache hit for {filename}")
+            cached_words = WordTable.from_columns(cached.pop("words"))
+            with span("serialize"):
+                return OCRResponse(**cached, **word_fields(cached_words, geometry, words), cache={
+                    "document_hit": True,
+                    "page_hits": cached["pages"],
+                    "pages": cached["pages"],
+                    "page_hit_rate": 1.0
+                })
+    
+    (full_text, confidence, word_table, num_pages), counts = await process(file_content)
+    page_hits = counts["page_hits"]
+    
+    logger.info(f"Processed document with {len(word_table)} words across {num_pages} pages. Confidence: {confidence:.2f}")
+    logger.info(f"Text layer pages for {filename}: {counts['text_layer_pages']}/{num_pages}")
+    if cache is not None:
+        logger.info(f"Page cache hits for {filename}: {page_hits}/{num_pages}")
+    
+    if key is not None:
+        await run_blocking(cache.put, key, cache_document(full_text, confidence, word_table, num_pages, counts))
+    
+    with span("serialize"):
         return OCRResponse(
             text=full_text,
             confidence=confidence,
-            words=word_details,
-            pages=num_pages
+            **word_fields(word_table, geometry, words),
+            pages=num_pages,
+            text_layer_pages=counts["text_layer_pages"],
+            cache={
+                "document_hit": False,
+                "page_hits": page_hits,
+                "pages": num_pages,
+                "page_hit_rate": page_hits / num_pages if num_pages else 0.0
+            } if cache is not None else None
         )
+
+async def stream_records(file_content, filename, kind, geometry, layout):
+    """
+    Page records of one upload as they finish, then a summary record. A
+    failure part way through is reported as an error record, since the
+    response status has already been sent.
+    """
+    key = None
+    try:
+        if cache is not None:
+            key = await run_blocking(cache_key, file_content, kind)
+            cached = await run_blocking(cache.get, key)
+            if cached is not None:
+                logger.info(f"OCR cache hit for {filename}")
+                for number, summary in enumerate(cached_page_summaries(cached)):
+                    yield page_record(number, summary, "cache", geometry, layout)
+                yield {
+                    "type": "summary",
+                    "pages": cached["pages"],
+                    "text_layer_pages": cached["text_layer_pages"],
+                    "confidence": cached["confidence"],
+                    "cache": {
+                        "document_hit": True,
+                        "page_hits": cached["pages"],
+                        "pages": cached["pages"],
+                        "page_hit_rate": 1.0
+                    }
+                }
+                return
+        
+        summarize = summarize_pdf if kind == 'pdf' else summarize_image
+        summaries = []
+        counts = {"text_layer_pages": 0, "page_hits": 0}
+        async for number, summary, source in summarize(file_content):
+            summaries.append(summary)
+            if source == "text_layer":
+                counts["text_layer_pages"] += 1
+            elif source == "cache":
+                counts["page_hits"] += 1
+            yield page_record(number, summary, source, geometry, layout)
+        
+        full_text, confidence, word_table, num_pages = combine_pages(summaries)
+        page_hits = counts["page_hits"]
+        logger.info(f"Streamed {num_pages} pages of {filename}. Confidence: {confidence:.2f}")
+        
+        # Stored in the same form as /process_document so either endpoint
+        # answers a repeat upload from the cache
+        if key is not None:
+            await run_blocking(cache.put, key, cache_document(full_text, confidence, word_table, num_pages, counts))
+        
+        yield {
+            "type": "summary",
+            "pages": num_pages,
+            "text_layer_pages": counts["text_layer_pages"],
+            "confidence": confidence,
+            "cache": {
+                "document_hit": False,
+                "page_hits": page_hits,
+                "pages": num_pages,
+                "page_hit_rate": page_hits / num_pages if num_pages else 0.0
+            } if cache is not None else None
+        }
     
     except Exception as e:
-        logger.error(f"Error processing document: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error processing document: {str(e)}")
+        logger.error(f"Error streaming document: {str(e)}")
+        logger.exception("Detailed traceback:")
+        yield {"type": "error", "detail": f"Error processing document: {str(e)}"}
+
+
+@app.post("/process_document/stream")
+async def process_document_stream(
+    file: UploadFile = File(...),
+    stream_format: str = Query("ndjson", alias="format"),
+    geometry: str = Query("full"),
+    words: str = Query("records")
+):
+    """
+    Process a document like /process_document, but stream one record per
+    page as soon as it is done instead of a single response at the end
+    
+    Args:
+        file: Uploaded file (PDF or image)
+        format: "ndjson" (one JSON record per line) or "sse" (server-sent events)
+        geometry: Word box form, one of GEOMETRY_MODES
+        words: Word details as "records" (a dict per word) or "columns" (one array per field)
+        
+    Returns:
+        StreamingResponse: "page" records in page order, then a "summary"
+        record (or an "error" record if processing fails part way)
+    """
+    if predictor is None:
+        raise HTTPException(status_code=500, detail="OCR service not properly initialized")
+    if stream_format not in STREAM_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="Unsupported format. Use 'ndjson' or 'sse'.")
+    check_geometry(geometry)
+    check_word_layout(words)
+    
+    kind = upload_kind(file.filename)
+    if kind is None:
+        raise HTTPException(status_code=400, detail="Unsupported file format. Please upload a PDF or image file.")
+    
+    if not limiter.acquire():
+        logger.warning(f"Rejecting {file.filename}: {limiter.active} documents already in progress")
+        raise HTTPException(
+            status_code=503,
+            detail="OCR service is busy, please retry later",
+            headers={"Retry-After": str(RETRY_AFTER_SECONDS)}
+        )
+    
+    try:
+        # The upload is read before responding; the records stream after.
+        # From here the response releases the limiter when it is over
+        file_content = await file.read()
+        
+        logger.info(f"Streaming {file.filename} ({kind})")
+        
+        async def body():
+            with start_trace("process_document_stream", filename=file.filename, kind=kind):
+                async for record in stream_records(file_content, file.filename, kind, geometry, words):
+                    yield encode_record(record, stream_format)
+        
+        return LimitedStreamingResponse(body(), limiter, media_type=STREAM_MEDIA_TYPES[stream_format])
+    except BaseException:
+        limiter.release()
+        raise
+
 
 if __name__ == "__main__":
     # Get port from environment variable or use default
@@ -6,104 +6,524 @@ Minimal EasyOCR script for extracting text from PDFs and images
 import sys
 import os
 import re
+import json
+import time
+import argparse
 import tempfile
 import traceback
 from typing import List
 
-# Check if we have enough arguments
-if len(sys.argv) < 2:
-    print("Usage: python run_easyocr.py <path_to_file>")
-    sys.exit(1)
+import cv2
+import numpy as np
 
-file_path = sys.argv[1]
-file_ext = os.path.splitext(file_path)[1].lower()
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-try:
-    # Import required libraries
+from ocr_common.pipeline import prefetch
+from ocr_common.parallel import PagePool, DEFAULT_WORKERS, DEFAULT_THREADS_PER_WORKER
+from ocr_common.cache import open_cache, hash_file, make_key, package_version
+from ocr_common.render import open_pdf, render_page, choose_zoom, parse_zoom, ZOOM_SETTING
+from ocr_common.textlayer import TEXT_LAYER_ENABLED, MIN_TEXT_CHARS, extract_words
+from ocr_common.boxes import LOW_CONFIDENCE, box_rect, merge_detections
+from ocr_common.roi import ROI_ENABLED, select_table_boxes
+from ocr_common.preprocess import Preprocessor, engine_steps, to_gray
+from ocr_common.trace import start_trace, span, record_span, add_count
+
+PDF_DPI = 300
+
+# --dpi auto (or OCR_ZOOM=auto) picks the resolution per page from the size
+# of its text; a numeric OCR_ZOOM is a scale relative to 72 dpi
+_zoom_setting = parse_zoom(ZOOM_SETTING, None)
+if _zoom_setting == 'auto':
+    DEFAULT_DPI = 'auto'
+else:
+    DEFAULT_DPI = round(_zoom_setting * 72) if _zoom_setting else PDF_DPI
+
+# Bump when a change to this script alters the text it produces, so cached
+# results from the old version are not reused
+PIPELINE_VERSION = 3
+
+# Second pass over an adaptive-threshold copy of the page: 'gated' runs it
+# only on low-confidence regions (or the whole page if nothing was found),
+# 'always' on the whole page, 'off' never
+ENHANCE_MODES = ('gated', 'always', 'off')
+DEFAULT_ENHANCE = os.environ.get('OCR_ENHANCE', 'gated').strip().lower()
+# Steps that make the enhanced copy; OCR_PREPROCESS_EASYOCR picks others
+# (unknown steps raise ValueError here, before anything is read)
+ENHANCE_PREPROCESS = Preprocessor(engine_steps('easyocr', 'adaptive'))
+
+# Pixels of context kept around a low-confidence box when re-reading it
+CROP_PADDING = 4
+
+DATE_PATTERN = r'(?:Date|Collection|Collected)[:\s]+(\d{1,2}[/-]\d{1,2}[/-]\d{2,4}|\d{4}[/-]\d{1,2}[/-]\d{1,2})'
+
+
+def create_reader():
+    """
+    Load the EasyOCR model; imported lazily so cache hits skip it entirely
+    """
     import easyocr
-    import cv2
-    import numpy as np
-    from pdf2image import convert_from_path
+    with span('load'):
+        return easyocr.Reader(['en'], gpu=False)  # Set gpu=True if you have a GPU
+
+
+def render_pdf_page(doc, page_index, dpi=PDF_DPI):
+    """
+    Render a single page of an open PDF at ``dpi`` as a grayscale image.
+    PyMuPDF draws it in gray straight into one buffer, which the array
+    views; EasyOCR reads grayscale arrays as they are.
+    """
+    return render_page(doc, page_index, dpi / 72, gray=True)
+
+
+def iter_pdf_images(doc, page_dpis=None):
+    """
+    Render an open PDF one page at a time, yielding (page_index, grayscale
+    image). ``page_dpis`` lists the (page_index, dpi) pairs to render;
+    default is every page at PDF_DPI. Only the pages being rendered and
+    OCR'd are in memory, however long the document.
+    """
+    if page_dpis is None:
+        page_dpis = [(i, PDF_DPI) for i in range(len(doc))]
+    for page_index, dpi in page_dpis:
+        yield page_index, render_pdf_page(doc, page_index, dpi)
+
+
+def choose_dpis(doc, page_indexes, dpi=DEFAULT_DPI):
+    """
+    Render resolution of each page to OCR: ``dpi`` itself, or with 'auto'
+    the smallest that keeps the page's text legible (see choose_zoom)
+    """
+    if dpi != 'auto':
+        return [(page_index, dpi) for page_index in page_indexes]
+    return [(i, round(choose_zoom(doc[i], default=PDF_DPI / 72) * 72)) for i in page_indexes]
+
+
+def read_text_layer(doc):
+    """
+    Words of each page of an open PDF taken from its embedded text layer
+    (boxes in PDF points), or None for pages (scanned or image-only) that
+    need OCR
+    """
+    if not TEXT_LAYER_ENABLED:
+        return [None] * len(doc)
+    with span('text_layer'):
+        return [extract_words(page) for page in doc]
+
+
+def page_result(detections):
+    """
+    Text, words with (x0, y0, x1, y1) boxes and average confidence of
+    readtext-style detections
+    """
+    words = [
+        {'text': text, 'confidence': float(confidence), 'box': [float(v) for v in box_rect(box)]}
+        for box, text, confidence in detections
+    ]
+    return {
+        'text': ' '.join([word['text'] for word in words]),
+        'words': words,
+        'confidence': sum(word['confidence'] for word in words) / len(words) if words else 0.0,
+    }
+
+
+def text_layer_result(words):
+    """
+    page_result for a page read from its text layer
+    """
+    return page_result([([[w.x0, w.y0], [w.x1, w.y1]], w.text, 1.0) for w in words])
+
+
+def enhance_image(image):
+    """
+    Adaptive-threshold copy of the image to enhance text visibility (the
+    ENHANCE_PREPROCESS steps). The copy is a reused buffer, good until the
+    next page is enhanced.
+    """
+    enhanced, _ = ENHANCE_PREPROCESS.process(image)
+    return enhanced
+
+
+def reread_regions(reader, enhanced, detections):
+    """
+    Recognize the regions of ``detections`` again on the enhanced image,
+    skipping text detection
+    """
+    height, width = enhanced.shape[:2]
+    regions = []
+    for box, _, _ in detections:
+        x0, y0, x1, y1 = box_rect(box)
+        regions.append([
+            max(int(x0) - CROP_PADDING, 0), min(int(x1) + CROP_PADDING, width),
+            max(int(y0) - CROP_PADDING, 0), min(int(y1) + CROP_PADDING, height),
+        ])
+    return reader.recognize(enhanced, horizontal_list=regions, free_list=[])
+
+
+def read_table_regions(reader, image):
+    """
+    Two-stage OCR: detection only over the whole image, then recognition
+    only of the boxes that form table rows. Returns readtext-style results.
+    """
+    horizontal_list, free_list = reader.detect(image)
+    horizontal_list, free_list = horizontal_list[0], free_list[0]
+
+    # Horizontal boxes are [x_min, x_max, y_min, y_max], free ones 4 points
+    rects = [(x0, y0, x1, y1) for x0, x1, y0, y1 in horizontal_list]
+    rects += [box_rect(box) for box in free_list]
+    keep = select_table_boxes(rects)
+
+    total = len(rects)
+    skipped = total - len(keep)
+    print(f"ROI: recognizing {len(keep)}/{total} boxes, skipped {skipped / total if total else 0:.0%}",
+          file=sys.stderr)
+    if not keep:
+        return []
+
+    split = len(horizontal_list)
+    return reader.recognize(
+        to_gray(image),
+        horizontal_list=[horizontal_list[i] for i in keep if i < split],
+        free_list=[free_list[i - split] for i in keep if i >= split],
+    )
+
+
+def check_enhance(enhance):
+    """
+    Reject an enhance mode that isn't one of ENHANCE_MODES
+    """
+    if enhance not in ENHANCE_MODES:
+        raise ValueError(f"Unknown enhance mode '{enhance}'. Use one of: {', '.join(ENHANCE_MODES)}")
+    return enhance
+
+
+def ocr_detections(reader, image, enhance=DEFAULT_ENHANCE, roi=ROI_ENABLED):
+    """
+    Run EasyOCR on the image, with a second pass on an adaptive-threshold
+    copy according to ``enhance``. The passes are merged by box overlap so
+    every region's text appears once. With ``roi`` only the results table
+    is recognized.
+    """
+    detections = read_table_regions(reader, image) if roi else reader.readtext(image)
+
+    if enhance == 'always' or (enhance == 'gated' and not detections and not roi):
+        detections = merge_detections(detections, reader.readtext(enhance_image(image)))
+    elif enhance == 'gated':
+        low = [d for d in detections if d[2] < LOW_CONFIDENCE]
+        if low:
+            print(f"Re-reading {len(low)}/{len(detections)} low-confidence regions", file=sys.stderr)
+            detections = merge_detections(detections, reread_regions(reader, enhance_image(image), low))
+
+    return detections
+
+
+def ocr_image(reader, image, enhance=DEFAULT_ENHANCE, roi=ROI_ENABLED):
+    """
+    OCR an image into a page_result, with the time it took
+    """
+    started = time.perf_counter()
+    result = page_result(ocr_detections(reader, image, enhance, roi))
+    result['timings'] = {'ocr_ms': round((time.perf_counter() - started) * 1000, 1)}
+    return result
+
+
+# Reader of a page-parallel pool worker, loaded once per process, and the
+# document it is working on
+_pool_reader = None
+_pool_doc = None
+
+
+def init_pool_worker(threads):
+    """
+    Load the EasyOCR model once in each pool worker
+    """
+    global _pool_reader
+    import torch
+    torch.set_num_threads(threads)
+    _pool_reader = create_reader()
+
+
+def ocr_pool_page(task):
+    """
+    Render and OCR a single PDF page inside a pool worker
+    """
+    global _pool_doc
+    file_path, page_index, dpi, enhance, roi = task
+    started = time.perf_counter()
+
+    # Keep the current document open across its pages
+    stat = os.stat(file_path)
+    key = (file_path, stat.st_mtime_ns, stat.st_size)
+    if _pool_doc is None or _pool_doc[0] != key:
+        if _pool_doc is not None:
+            _pool_doc[1].close()
+        _pool_doc = (key, open_pdf(file_path))
+    image = render_pdf_page(_pool_doc[1], page_index, dpi)
+    render_ms = round((time.perf_counter() - started) * 1000, 1)
+
+    result = ocr_image(_pool_reader, image, enhance, roi)
+    result['timings']['render_ms'] = render_ms
+    return page_index, result
+
+
+def ocr_pdf_pages(reader, doc, page_dpis, enhance=DEFAULT_ENHANCE, roi=ROI_ENABLED):
+    """
+    OCR the given (page_index, dpi) pages of an open PDF in this process,
+    yielding (page_index, page_result). The reader is created on first use
+    when ``reader`` is None.
+    """
+    # Only the render thread uses the document until the pages are done
+    images = prefetch(iter_pdf_images(doc, page_dpis))
+    try:
+        while True:
+            # Time spent waiting here is rendering the OCR stage couldn't overlap
+            started = time.perf_counter()
+            item = next(images, None)
+            if item is None:
+                return
+            wait_ms = round((time.perf_counter() - started) * 1000, 1)
+
+            i, image = item
+            if reader is None:
+                reader = create_reader()
+            with span('ocr', page=i):
+                result = ocr_image(reader, image, enhance, roi)
+            result['timings']['wait_ms'] = wait_ms
+            yield i, result
+    finally:
+        images.close()
+
+
+def iter_pages(reader, file_path, pool=None, enhance=DEFAULT_ENHANCE, dpi=DEFAULT_DPI, roi=ROI_ENABLED):
+    """
+    Yield a page record (page_result plus page number, source, dpi and
+    timings) for every page in page order. Pages with a text layer are read
+    directly; the rest are OCR'd either by the pool or in this process with
+    rendering running one page ahead on a background thread.
+
+    The PDF is opened once for the text layer, the resolutions and the
+    rendering; pool workers open their own copy, once per document.
+    """
+    doc = open_pdf(file_path)
+    ocr_results = None
+    try:
+        page_words = read_text_layer(doc)
+        ocr_pages = [i for i, words in enumerate(page_words) if words is None]
+        print(f"Text layer: {len(page_words) - len(ocr_pages)}/{len(page_words)} pages", file=sys.stderr)
+
+        page_dpis = choose_dpis(doc, ocr_pages, dpi)
+        for page_index, page_dpi in page_dpis:
+            print(f"Page {page_index+1}: rendering at {page_dpi} dpi", file=sys.stderr)
+
+        if pool is not None:
+            tasks = [(file_path, page_index, page_dpi, enhance, roi) for page_index, page_dpi in page_dpis]
+            ocr_results = pool.imap(ocr_pool_page, tasks)
+        else:
+            ocr_results = ocr_pdf_pages(reader, doc, page_dpis, enhance, roi)
+
+        # Both sources are in page order, so merge them as we go
+        page_dpis = dict(page_dpis)
+        for i, words in enumerate(page_words):
+            if words is None:
+                print(f"Processing page {i+1}", file=sys.stderr)
+                _, result = next(ocr_results)
+                if pool is not None:
+                    # The stages ran in the worker process; add them to this run's trace
+                    for name, value in result['timings'].items():
+                        record_span(name[:-len('_ms')], value / 1000, page=i)
+                result.update(source='ocr', dpi=page_dpis[i])
+            else:
+                result = text_layer_result(words)
+                result.update(source='text_layer', dpi=72, timings={})
+            add_count('pages', source=result['source'])
+            add_count('words', len(result['words']))
+            yield dict(type='page', page=i + 1, **result)
+    finally:
+        # Stop the render thread before the document it reads is closed
+        close = getattr(ocr_results, 'close', None)
+        if close is not None:
+            close()
+        doc.close()
+
+
+def process_pdf(reader, file_path, pool=None, enhance=DEFAULT_ENHANCE, dpi=DEFAULT_DPI, roi=ROI_ENABLED,
+                on_page=None):
+    """
+    OCR every page of a PDF; with ``reader`` None the model is only loaded
+    if some page has no text layer. ``on_page`` is called with each page
+    record as soon as the page is done.
+    """
+    all_text = []
+
+    for record in iter_pages(reader, file_path, pool, enhance, dpi, roi):
+        if on_page is not None:
+            on_page(record)
+        page_text = record['text']
+
+        # Look specifically for date patterns
+        date_matches = re.findall(DATE_PATTERN, page_text, re.IGNORECASE)
+        if date_matches:
+            print(f"Found date: {date_matches[0]}", file=sys.stderr)
+
+        all_text.append(page_text)
+
+    # Combine text from all pages
+    return '\n\n'.join(all_text)
+
+
+def cache_key(file_path, enhance=DEFAULT_ENHANCE, dpi=DEFAULT_DPI, roi=ROI_ENABLED):
+    """
+    Cache key for a file under the current engine version and settings
+    """
+    return make_key(hash_file(file_path), 'easyocr', package_version('easyocr'), {
+        'pipeline': PIPELINE_VERSION,
+        'type': os.path.splitext(file_path)[1].lower(),
+        'dpi': dpi,
+        'roi': roi,
+        'enhance': enhance,
+        'preprocess': ENHANCE_PREPROCESS.setting,
+        'languages': ['en'],
+        'text_layer': TEXT_LAYER_ENABLED,
+        'text_layer_min_chars': MIN_TEXT_CHARS,
+    })
+
+
+def extract_text(file_path, workers=0, threads_per_worker=0, enhance=DEFAULT_ENHANCE, dpi=DEFAULT_DPI,
+                 roi=ROI_ENABLED, on_page=None):
+    """
+    Run EasyOCR on a PDF or image file and return the raw text, passing
+    each page record to ``on_page`` as it finishes
+    """
+    check_enhance(enhance)
+    file_ext = os.path.splitext(file_path)[1].lower()
 
-    # Initialize EasyOCR reader
-    reader = easyocr.Reader(['en'], gpu=False)  # Set gpu=True if you have a GPU
-    
     # Process file based on type
+    if file_ext == '.pdf' and workers > 1:
+        # Every worker loads its own reader; the parent doesn't need one
+        with PagePool(workers, init_pool_worker, threads=threads_per_worker) as pool:
+            return process_pdf(None, file_path, pool, enhance, dpi, roi, on_page)
+
     if file_ext == '.pdf':
-        # Convert PDF to images
-        all_text = []
-        # Use higher DPI for better quality
-        images = convert_from_path(file_path, dpi=300)
-        
-        for i, image in enumerate(images):
-            print(f"Processing page {i+1}", file=sys.stderr)
-            # Convert PIL Image to OpenCV format
-            open_cv_image = np.array(image)
-            # RGB to BGR for OpenCV
-            open_cv_image = open_cv_image[:, :, ::-1].copy()
-            
-            # Try to detect and enhance text areas
-            gray = cv2.cvtColor(open_cv_image, cv2.COLOR_BGR2GRAY)
-            # Apply adaptive thresholding to enhance text visibility
-            enhanced = cv2.adaptiveThreshold(
-                gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2
-            )
-            
-            # Extract text from both the original and enhanced images
-            # and combine the results for better coverage
-            result_orig = reader.readtext(open_cv_image)
-            result_enhanced = reader.readtext(enhanced)
-            
-            # Combine results from both versions
-            page_text = ' '.join([entry[1] for entry in result_orig])
-            page_text += ' ' + ' '.join([entry[1] for entry in result_enhanced])
-            
-            # Look specifically for date patterns
-            date_pattern = r'(?:Date|Collection|Collected)[:\s]+(\d{1,2}[/-]\d{1,2}[/-]\d{2,4}|\d{4}[/-]\d{1,2}[/-]\d{1,2})'
-            date_matches = re.findall(date_pattern, page_text, re.IGNORECASE)
-            if date_matches:
-                print(f"Found date: {date_matches[0]}", file=sys.stderr)
-                
-            all_text.append(page_text)
-        
-        # Combine text from all pages
-        full_text = '\n\n'.join(all_text)
-    else:
-        # Process image file directly
-        image = cv2.imread(file_path)
-        # Convert to grayscale
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        # Try with both original and enhanced
-        result_orig = reader.readtext(image)
-        
-        # Apply adaptive thresholding
-        enhanced = cv2.adaptiveThreshold(
-            gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2
-        )
-        result_enhanced = reader.readtext(enhanced)
-        
-        # Combine results
-        full_text = ' '.join([entry[1] for entry in result_orig])
-        full_text += ' ' + ' '.join([entry[1] for entry in result_enhanced])
-    
-    # Look for reference ranges and format them consistently
+        return process_pdf(None, file_path, enhance=enhance, dpi=dpi, roi=roi, on_page=on_page)
+
+    # Process image file directly
+    image = cv2.imread(file_path, cv2.IMREAD_GRAYSCALE)
+    reader = create_reader()
+    with span('ocr', page=0):
+        record = dict(type='page', page=1, source='ocr', **ocr_image(reader, image, enhance, roi))
+    add_count('pages', source='ocr')
+    if on_page is not None:
+        on_page(record)
+    return record['text']
+
+
+def format_reference_ranges(full_text):
+    """
+    Look for reference ranges and format them consistently
+    """
     # Use a safer approach with finditer instead of sub
     modified_text = full_text
-    
+
     # First pattern: Reference Range format
     for match in re.finditer(r'((?:Ref|Reference)\s*Range[^0-9]*?)(\d+\.?\d*)\s*[-–]\s*(\d+\.?\d*)', full_text):
         range_value = f"{match.group(2)}-{match.group(3)}"
         modified_text = modified_text.replace(match.group(0), f"Reference Range: {range_value}")
-    
+
     # Second pattern: Range with units
     for match in re.finditer(r'(\d+\.?\d*)\s*[-–]\s*(\d+\.?\d*)\s*(?:mmol/L|nmol/L|pmol/L|ug/L|µg/L)', full_text):
         range_value = f"{match.group(1)}-{match.group(2)}"
         modified_text = modified_text.replace(match.group(0), f"Reference Range: {range_value}")
-    
-    # Print extracted text (will be captured by Node.js)
-    print(modified_text)
-    
-except Exception as e:
-    print(f"Error processing file: {str(e)}", file=sys.stderr)
-    traceback.print_exc(file=sys.stderr)
-    sys.exit(1)
\ No newline at end of file
+
+    return modified_text
+
+
+def write_record(record):
+    """
+    Write one JSON record as a line on stdout, with its text formatted like
+    the plain text output, and flush it so Node sees it right away
+    """
+    record = dict(record, text=format_reference_ranges(record['text']))
+    with span('serialize'):
+        sys.stdout.write(json.dumps(record) + '\n')
+    sys.stdout.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract text from PDFs and images with EasyOCR")
+    parser.add_argument('file_path', nargs='?')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help="OCR PDF pages in parallel across this many processes (env OCR_WORKERS)")
+    parser.add_argument('--threads-per-worker', type=int, default=DEFAULT_THREADS_PER_WORKER,
+                        help="Torch/BLAS threads per worker process, 0 = cores / workers "
+                             "(env OCR_THREADS_PER_WORKER)")
+    parser.add_argument('--enhance', choices=ENHANCE_MODES, default=DEFAULT_ENHANCE,
+                        help="Adaptive-threshold second pass: only on low-confidence regions (gated), "
+                             "on every page (always) or never (off) (env OCR_ENHANCE)")
+    parser.add_argument('--dpi', type=lambda value: value if value == 'auto' else int(value), default=DEFAULT_DPI,
+                        help=f"PDF render resolution, or 'auto' to pick the lowest that keeps text legible "
+                             f"within a pixel budget (env OCR_ZOOM=auto, default {PDF_DPI})")
+    parser.add_argument('--format', choices=('text', 'ndjson'), default='text',
+                        help="Print the text once at the end (text), or one JSON record per page as it "
+                             "finishes followed by a summary record (ndjson)")
+    parser.add_argument('--roi', action='store_true', default=ROI_ENABLED,
+                        help="Detect text first and only recognize the results table rows (env OCR_ROI)")
+    args = parser.parse_args()
+    # argparse checks --enhance against the choices, but not the default
+    # taken from OCR_ENHANCE
+    if args.enhance not in ENHANCE_MODES:
+        parser.error(f"OCR_ENHANCE must be one of: {', '.join(ENHANCE_MODES)} (got '{args.enhance}')")
+
+    # Check if we have enough arguments
+    if not args.file_path:
+        print("Usage: python run_easyocr.py <path_to_file>")
+        sys.exit(1)
+
+    file_path = args.file_path
+
+    try:
+        with start_trace('easyocr', file=os.path.basename(file_path)):
+            # A document seen before is answered from the cache without loading the model
+            cache = open_cache()
+            key = cache_key(file_path, args.enhance, args.dpi, args.roi) if cache is not None else None
+            cached = cache.get(key) if key is not None else None
+            streaming = args.format == 'ndjson'
+            # Entries stored before the pages were kept can't be streamed
+            if cached is not None and streaming and 'pages' not in cached:
+                cached = None
+
+            # Page records are kept for the cache, so a warm run can stream them too
+            pages = []
+
+            def on_page(record):
+                if key is not None:
+                    pages.append(record)
+                if streaming:
+                    write_record(record)
+
+            if cached is not None:
+                print("OCR cache hit", file=sys.stderr)
+                full_text = cached['text']
+                if streaming:
+                    for record in cached['pages']:
+                        write_record(dict(record, source='cache', timings={}))
+            else:
+                full_text = extract_text(file_path, args.workers, args.threads_per_worker, args.enhance, args.dpi,
+                                         args.roi, on_page)
+                if key is not None:
+                    cache.put(key, {'text': full_text, 'pages': pages})
+
+            if args.format == 'ndjson':
+                write_record({'type': 'summary', 'text': full_text, 'cached': cached is not None})
+                return
+
+            # Print extracted text (will be captured by Node.js)
+            with span('serialize'):
+                print(format_reference_ranges(full_text))
+
+    except Exception as e:
+        print(f"Error processing file: {str(e)}", file=sys.stderr)
+        traceback.print_exc(file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
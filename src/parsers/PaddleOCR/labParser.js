@@ -2,7 +2,8 @@
 
 const fs = require('fs');
 const path = require('path');
-const { exec } = require('child_process');
+const readline = require('readline');
+const { exec, spawn } = require('child_process');
 const { labPatterns, datePatterns } = require('../labPatterns');
 const { 
   parseStructuredLabReport, 
@@ -11,6 +12,12 @@ const {
   mapToStandardBiomarker 
 } = require('./imageParser');
 
+// Keep one warm paddle_ocr.py process (model loaded once) instead of a process per upload
+const USE_PADDLE_WORKER = process.env.PADDLE_OCR_WORKER === 'true';
+
+// Receive one NDJSON record per page as it is OCR'd and parse lab values page by page
+const STREAM_PADDLE_OCR = process.env.PADDLE_OCR_STREAM === 'true';
+
 /**
  * Detect document type based on file extension
  * @param {string} filePath - Path to the file
@@ -439,11 +446,22 @@ async function extractFromPDF(filePath) {
     // Preprocess the file
     await preprocessImage(filePath, processedPath);
     
-    // Run PaddleOCR to extract text
-    const text = await runPaddleOCR(processedPath);
+    // Run PaddleOCR to extract text; when streaming, earlier pages are parsed
+    // while later ones are still being OCR'd
+    const pageLabValues = [];
+    const onPage = STREAM_PADDLE_OCR
+      ? (page) => {
+          console.log(`Parsing page ${page.page} (${page.source}, ${page.text.length} chars)`);
+          pageLabValues.push(parseLabValues(page.text));
+        }
+      : null;
+    const text = await runPaddleOCR(processedPath, onPage);
     
     // Parse lab values and test date
-    const labValues = parseLabValues(text);
+    let labValues = mergeLabValues(pageLabValues);
+    if (Object.keys(labValues).length === 0) {
+      labValues = parseLabValues(text);
+    }
     let testDate = extractTestDate(text, filePath);
     
     // Try to extract date from filename if normal extraction failed
@@ -542,12 +560,38 @@ async function extractFromImage(filePath) {
   }
 }
 
+/**
+ * Combine lab values parsed from individual pages; the first page a
+ * biomarker appears on wins
+ * @param {Object[]} pageLabValues - Lab values of each page, in page order
+ * @returns {Object} Merged lab values
+ */
+function mergeLabValues(pageLabValues) {
+  const merged = {};
+  for (const values of pageLabValues) {
+    for (const [name, data] of Object.entries(values)) {
+      if (!(name in merged)) {
+        merged[name] = data;
+      }
+    }
+  }
+  return merged;
+}
+
 /**
  * Run the PaddleOCR Python script on a file
  * @param {string} filePath - Path to the file
+ * @param {Function} [onPage] - Called with each page record as soon as the page is done
  * @returns {Promise<string>} Extracted text
  */
-function runPaddleOCR(filePath) {
+function runPaddleOCR(filePath, onPage) {
+  if (USE_PADDLE_WORKER) {
+    return runPaddleOCRWorker(filePath, onPage);
+  }
+  if (onPage) {
+    return runPaddleOCRStream(filePath, onPage);
+  }
+
   return new Promise((resolve, reject) => {
     // Update the Python script path
     const scriptPath = path.join(__dirname, 'paddle_ocr.py');
@@ -616,6 +660,178 @@ function runPaddleOCR(filePath) {
   });
 }
 
+/**
+ * Run the PaddleOCR Python script in NDJSON mode, handing each page record
+ * to onPage as it arrives instead of buffering all of stdout
+ * @param {string} filePath - Path to the file
+ * @param {Function} onPage - Called with each page record
+ * @returns {Promise<string>} Extracted text from the summary record
+ */
+function runPaddleOCRStream(filePath, onPage) {
+  return new Promise((resolve, reject) => {
+    const scriptPath = path.join(__dirname, 'paddle_ocr.py');
+    const child = spawn('py', ['-3.11', scriptPath, '--format', 'ndjson', filePath], { stdio: ['ignore', 'pipe', 'pipe'] });
+    let totalPages = 1;
+    let summary = null;
+
+    console.log(`Running PaddleOCR (streaming) on ${filePath}`);
+
+    readline.createInterface({ input: child.stdout }).on('line', (line) => {
+      let record;
+      try {
+        record = JSON.parse(line);
+      } catch (err) {
+        console.warn(`PaddleOCR output: ${line}`);
+        return;
+      }
+
+      if (record.type === 'page') {
+        try {
+          onPage(record);
+        } catch (err) {
+          console.error(`Error handling page ${record.page}: ${err.message}`);
+        }
+      } else if (record.type === 'summary') {
+        summary = record;
+      }
+    });
+
+    readline.createInterface({ input: child.stderr }).on('line', (line) => {
+      if (line.startsWith('TOTAL_PAGES:')) {
+        totalPages = parseInt(line.split(':')[1]);
+        console.log(`Processing document with ${totalPages} pages`);
+      } else if (line.startsWith('CURRENT_PAGE:')) {
+        console.log(`Processing page ${parseInt(line.split(':')[1])} of ${totalPages}`);
+      } else if (line.trim()) {
+        console.warn(`PaddleOCR warnings: ${line}`);
+      }
+    });
+
+    child.on('error', reject);
+    // 'close' fires after stdout has been fully read, so the summary is in
+    child.on('close', (code) => {
+      if (code !== 0 || !summary) {
+        reject(new Error(`PaddleOCR exited with code ${code}`));
+        return;
+      }
+      console.log(`Completed processing ${totalPages} pages`);
+      resolve((summary.text || '').trim());
+    });
+  });
+}
+
+let paddleWorker = null;
+
+/**
+ * Start (or reuse) the long-lived PaddleOCR worker process
+ * @returns {Object} Worker handle with the child process and pending jobs
+ */
+function getPaddleWorker() {
+  if (paddleWorker) {
+    return paddleWorker;
+  }
+
+  const scriptPath = path.join(__dirname, 'paddle_ocr.py');
+  const child = spawn('py', ['-3.11', scriptPath, '--worker'], { stdio: ['pipe', 'pipe', 'pipe'] });
+  const worker = { child, pending: [], nextId: 1 };
+
+  console.log(`Started PaddleOCR worker (pid ${child.pid})`);
+
+  // One JSON response per line on stdout, answered in the order jobs were sent
+  readline.createInterface({ input: child.stdout }).on('line', (line) => {
+    let response;
+    try {
+      response = JSON.parse(line);
+    } catch (err) {
+      console.warn(`PaddleOCR worker output: ${line}`);
+      return;
+    }
+
+    const index = worker.pending.findIndex(job => job.id === response.id);
+    if (index === -1) {
+      console.warn(`PaddleOCR worker returned unknown job ${response.id}`);
+      return;
+    }
+
+    // Page records of a streaming job come before its final response
+    if (response.type === 'page') {
+      const job = worker.pending[index];
+      try {
+        job.onPage(response);
+      } catch (err) {
+        console.error(`Error handling page ${response.page}: ${err.message}`);
+      }
+      return;
+    }
+
+    const [job] = worker.pending.splice(index, 1);
+    if (response.error) {
+      job.reject(new Error(response.error));
+    } else {
+      console.log(`Completed processing ${job.totalPages} pages`);
+      job.resolve((response.text || '').trim());
+    }
+  });
+
+  // Progress lines always belong to the job at the head of the queue
+  readline.createInterface({ input: child.stderr }).on('line', (line) => {
+    const job = worker.pending[0];
+    if (line.startsWith('TOTAL_PAGES:')) {
+      if (job) job.totalPages = parseInt(line.split(':')[1]);
+      console.log(`Processing document with ${job ? job.totalPages : '?'} pages`);
+    } else if (line.startsWith('CURRENT_PAGE:')) {
+      const actualPage = parseInt(line.split(':')[1]);
+      console.log(`Processing page ${actualPage} of ${job ? job.totalPages : '?'}`);
+    } else if (line.trim()) {
+      console.warn(`PaddleOCR warnings: ${line}`);
+    }
+  });
+
+  const failPending = (error) => {
+    if (paddleWorker === worker) {
+      paddleWorker = null;
+    }
+    worker.pending.splice(0).forEach(job => job.reject(error));
+  };
+
+  child.on('error', (error) => {
+    console.error(`PaddleOCR worker error: ${error.message}`);
+    failPending(error);
+  });
+
+  // Writing a job to a worker that has died fails with EPIPE, which would be
+  // an uncaught exception without a listener
+  child.stdin.on('error', (error) => {
+    console.error(`PaddleOCR worker stdin error: ${error.message}`);
+    failPending(error);
+    child.kill();
+  });
+
+  child.on('exit', (code, signal) => {
+    console.warn(`PaddleOCR worker exited (code ${code}, signal ${signal})`);
+    failPending(new Error(`PaddleOCR worker exited with code ${code}`));
+  });
+
+  paddleWorker = worker;
+  return worker;
+}
+
+/**
+ * Send a file to the warm PaddleOCR worker
+ * @param {string} filePath - Path to the file
+ * @param {Function} [onPage] - Called with each page record as soon as the page is done
+ * @returns {Promise<string>} Extracted text
+ */
+function runPaddleOCRWorker(filePath, onPage) {
+  return new Promise((resolve, reject) => {
+    const worker = getPaddleWorker();
+    const id = worker.nextId++;
+
+    worker.pending.push({ id, resolve, reject, onPage, totalPages: 1 });
+    worker.child.stdin.write(JSON.stringify({ id, file: filePath, stream: Boolean(onPage) }) + '\n');
+  });
+}
+
 /**
  * Main extraction function that detects document type and processes accordingly
  * @param {string} filePath - Path to the file
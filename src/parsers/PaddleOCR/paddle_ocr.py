@@ -5,72 +5,119 @@ Debug version of PaddleOCR script to identify text extraction issues
 
 import sys
 import os
+import json
+import time
+import argparse
+from itertools import chain
 import fitz  # PyMuPDF
 import cv2
 import numpy as np
-from paddleocr import PaddleOCR
 import tempfile
 from PIL import Image, ImageEnhance
 import logging
 
-# Configure logging to stderr so it doesn't interfere with text output
-logging.basicConfig(level=logging.WARNING, stream=sys.stderr)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-def simple_preprocess(image):
+from ocr_common.pipeline import prefetch
+from ocr_common.render import open_pdf, iter_pdf_pages, render_page, resolve_zoom, parse_zoom, ZOOM_SETTING
+from ocr_common.parallel import PagePool, DEFAULT_WORKERS, DEFAULT_THREADS_PER_WORKER
+from ocr_common.cache import open_cache, hash_file, hash_array, make_key, package_version
+from ocr_common.textlayer import TEXT_LAYER_ENABLED, MIN_TEXT_CHARS, extract_words, group_lines
+from ocr_common.roi import ROI_ENABLED, select_table_boxes
+from ocr_common.boxes import box_rect
+from ocr_common.layout import assign_lines, assign_columns, reconstruct_lines
+from ocr_common.trace import start_trace, span, record_span, add_count
+from ocr_common.logs import setup_logging
+from ocr_common.preprocess import Preprocessor, engine_steps
+
+# Render scale for PDF pages; --zoom auto / OCR_ZOOM=auto picks one per page
+PAGE_ZOOM = 1.3
+DEFAULT_ZOOM = parse_zoom(ZOOM_SETTING, PAGE_ZOOM)
+
+# Bump when a change to this script alters the text it produces, so cached
+# results from the old version are not reused
+PIPELINE_VERSION = 4
+
+# Otsu binarization by default; OCR_PREPROCESS_PADDLE picks other steps
+PREPROCESS = Preprocessor(engine_steps('paddle', 'otsu'))
+
+# Diagnostics go to stderr so they don't interfere with text output; they
+# are only built at OCR_LOG_LEVEL=DEBUG or with -v (see ocr_common/logs.py)
+logger = logging.getLogger('ocr.paddle')
+
+def simple_preprocess(image, page_num=None):
+    """
+    Simplified preprocessing to avoid over-processing: the PREPROCESS steps,
+    run in a reused buffer (valid until the next page is preprocessed)
+    """
+    processed, _ = PREPROCESS.process(image, page_num)
+    return processed
+
+def detect_and_recognize_roi(processed_image, page_num, ocr, roi_stats=None):
     """
-    Simplified preprocessing to avoid over-processing
+    Two-stage OCR: detection only over the whole page, then recognition only
+    of the boxes that form table rows. Returns results in the same form as
+    ocr.ocr(..., det=True, rec=True).
     """
-    # Convert to grayscale if needed
-    if len(image.shape) == 3:
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    else:
-        gray = image.copy()
+    with span('detect', page=page_num):
+        det_result = ocr.ocr(processed_image, det=True, rec=False, cls=False)
+    boxes = det_result[0] if det_result and det_result[0] is not None else []
     
-    # Simple threshold
-    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    keep = select_table_boxes([box_rect(box) for box in boxes])
+    logger.debug("Page %d ROI: recognizing %d/%d boxes", page_num + 1, len(keep), len(boxes))
+    if roi_stats is not None:
+        roi_stats['boxes'] = roi_stats.get('boxes', 0) + len(boxes)
+        roi_stats['recognized'] = roi_stats.get('recognized', 0) + len(keep)
     
-    return binary
+    if not keep:
+        return [[]]
+    
+    # The recognizer expects 3-channel crops; only the crops are converted,
+    # not the whole page
+    height, width = processed_image.shape[:2]
+    crops = []
+    for index in keep:
+        x0, y0, x1, y1 = box_rect(boxes[index])
+        crop = processed_image[max(int(y0), 0):min(int(y1) + 1, height), max(int(x0), 0):min(int(x1) + 1, width)]
+        crops.append(cv2.cvtColor(crop, cv2.COLOR_GRAY2BGR) if crop.ndim == 2 else crop)
+    
+    with span('recognize', page=page_num):
+        rec_result, _ = ocr.text_recognizer(crops)
+    return [[[boxes[index], rec] for index, rec in zip(keep, rec_result)]]
 
-def process_pdf_page_simple(pdf_path, page_num, ocr):
+def process_pdf_page_simple(image, page_num, ocr, roi=False, roi_stats=None):
     """
     Simplified page processing with debug output
+
+    With ``roi``, only boxes in the results table are recognized (see
+    detect_and_recognize_roi); box counts are added to ``roi_stats``.
     """
     try:
-        # Open PDF and get page
-        doc = fitz.open(pdf_path)
-        page = doc[page_num]
-        
-        # Render page at moderate resolution
-        zoom = 1.3  # Reduced from 2.0
-        mat = fitz.Matrix(zoom, zoom)
-        pix = page.get_pixmap(matrix=mat)
-        
-        # Convert to numpy array
-        img_data = pix.tobytes("ppm")
-        nparr = np.frombuffer(img_data, np.uint8)
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
-        # Simple preprocessing
-        processed_image = simple_preprocess(image)
+        # Simple preprocessing (timed per step by the Preprocessor)
+        processed_image = simple_preprocess(image, page_num)
         
         # Run OCR with basic parameters
-        ocr_result = ocr.ocr(processed_image, cls=True, det=True, rec=True)
+        if roi:
+            ocr_result = detect_and_recognize_roi(processed_image, page_num, ocr, roi_stats)
+        else:
+            with span('ocr', page=page_num):
+                ocr_result = ocr.ocr(processed_image, cls=True, det=True, rec=True)
         
-        print(f"DEBUG: Page {page_num + 1} OCR result type: {type(ocr_result)}", file=sys.stderr)
-        print(f"DEBUG: Page {page_num + 1} OCR result length: {len(ocr_result) if ocr_result else 0}", file=sys.stderr)
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            logger.debug("Page %d OCR result type: %s", page_num + 1, type(ocr_result))
+            logger.debug("Page %d OCR result length: %d", page_num + 1, len(ocr_result) if ocr_result else 0)
         
         # Extract text with simple layout
         text_lines = []
         if ocr_result and ocr_result[0]:
-            print(f"DEBUG: Page {page_num + 1} has {len(ocr_result[0])} detections", file=sys.stderr)
+            if debug:
+                logger.debug("Page %d has %d detections", page_num + 1, len(ocr_result[0]))
+                # First few detections
+                for i, (_, (text, confidence)) in enumerate(ocr_result[0][:5]):
+                    logger.debug("Detection %d: '%s' (confidence: %.2f)", i, text, confidence)
             
-            for i, detection in enumerate(ocr_result[0]):
-                bbox, (text, confidence) = detection
-                
-                # Debug output for first few detections
-                if i < 5:
-                    print(f"DEBUG: Detection {i}: '{text}' (confidence: {confidence:.2f})", file=sys.stderr)
-                
+            for bbox, (text, confidence) in ocr_result[0]:
                 # Filter and collect text
                 if confidence > 0.5 and len(text.strip()) > 1:
                     # Get bounding box coordinates
@@ -81,123 +128,391 @@ def process_pdf_page_simple(pdf_path, page_num, ocr):
                     
                     text_lines.append({
                         'text': text.strip(),
-                        'y': center_y,
-                        'x': center_x,
-                        'confidence': confidence
+                        'y': float(center_y),
+                        'x': float(center_x),
+                        'confidence': float(confidence),
+                        'box': [float(v) for v in box_rect(bbox)]
                     })
         
-        doc.close()
-        print(f"DEBUG: Page {page_num + 1} extracted {len(text_lines)} text elements", file=sys.stderr)
+        logger.debug("Page %d extracted %d text elements", page_num + 1, len(text_lines))
         return text_lines
         
     except Exception as e:
         print(f"ERROR processing page {page_num}: {e}", file=sys.stderr)
-        return []
+        return None
+
+def element_boxes(text_elements):
+    """
+    (N, 4) array of the elements' boxes
+    """
+    return np.fromiter(
+        chain.from_iterable(element['box'] for element in text_elements),
+        dtype=np.float64, count=4 * len(text_elements)
+    ).reshape(-1, 4)
 
 def simple_text_reconstruction(text_elements):
     """
-    Simple text reconstruction that preserves readability
+    Simple text reconstruction that preserves readability: the elements of
+    one page grouped into lines by their boxes
     """
     if not text_elements:
         return ""
     
-    # Sort by y-coordinate (top to bottom) then x-coordinate (left to right)
-    text_elements.sort(key=lambda x: (x['y'], x['x']))
-    
-    # Group into lines based on y-coordinate
+    lines = reconstruct_lines(element_boxes(text_elements), [element['text'] for element in text_elements])
+    return '\n'.join(lines)
+
+def layout_elements(text_elements):
+    """
+    Copies of one page's text elements with their line and table column
+    (-1 outside table rows) added
+    """
+    if not text_elements:
+        return []
+    boxes = element_boxes(text_elements)
+    line = assign_lines(boxes)
+    column = assign_columns(boxes, line)
+    return [
+        dict(element, line=int(line_index), column=int(column_index))
+        for element, line_index, column_index in zip(text_elements, line, column)
+    ]
+
+def text_layer_elements(words):
+    """
+    Text elements of a page read from the PDF's text layer, one per line,
+    in the same form process_pdf_page_simple returns
+    """
+    return [
+        {
+            'text': line.text,
+            'y': (line.y0 + line.y1) / 2,
+            'x': (line.x0 + line.x1) / 2,
+            'confidence': 1.0,
+            'box': [line.x0, line.y0, line.x1, line.y1]
+        }
+        for line in group_lines(words)
+    ]
+
+def collect_page_elements(document_pages, page_elements, page_num):
+    """
+    Append one page's text elements to the document's pages
+    """
+    if page_elements:
+        document_pages.append((page_num, page_elements))
+
+def reconstruct_document(document_pages):
+    """
+    Text of the whole document: each page reconstructed on its own, with a
+    page break line before every page after the first
+    """
     lines = []
-    current_line = []
-    current_y = None
-    y_threshold = 20  # Pixels
-    
-    for element in text_elements:
-        y = element['y']
-        
-        if current_y is None or abs(y - current_y) > y_threshold:
-            # Start new line
-            if current_line:
-                # Sort current line by x-coordinate and join
-                current_line.sort(key=lambda x: x['x'])
-                line_text = ' '.join([elem['text'] for elem in current_line])
-                lines.append(line_text)
-            current_line = [element]
-            current_y = y
-        else:
-            # Add to current line
-            current_line.append(element)
-    
-    # Don't forget the last line
-    if current_line:
-        current_line.sort(key=lambda x: x['x'])
-        line_text = ' '.join([elem['text'] for elem in current_line])
-        lines.append(line_text)
+    with span('reconstruct'):
+        for page_num, page_elements in document_pages:
+            if page_num > 0:
+                lines.append(f'--- Page {page_num + 1} ---')
+            lines.append(simple_text_reconstruction(page_elements))
+        result = '\n'.join(lines)
     
-    result = '\n'.join(lines)
-    
-    # Debug output
-    print(f"DEBUG: Reconstructed {len(lines)} lines of text", file=sys.stderr)
-    print(f"DEBUG: First 200 chars: {result[:200]}", file=sys.stderr)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Reconstructed %d lines of text", result.count('\n') + 1)
+        logger.debug("First 200 chars: %s", result[:200])
     
     return result
 
-def process_pdf_simple(pdf_path):
+def create_ocr(cpu_threads=None):
     """
-    Simplified PDF processing with extensive debugging
+    Initialize PaddleOCR with basic parameters
     """
-    try:
-        # Initialize PaddleOCR with basic parameters
-        print("DEBUG: Initializing PaddleOCR...", file=sys.stderr)
+    logger.debug("Initializing PaddleOCR...")
+    # Imported here so cache hits don't pay for loading Paddle
+    from paddleocr import PaddleOCR
+    options = {}
+    if cpu_threads:
+        options['cpu_threads'] = cpu_threads
+    with span('load'):
         ocr = PaddleOCR(
             use_angle_cls=False,     # Disable angle classification for simplicity
             lang='en',
             show_log=False,
             use_gpu=False,
             det_db_thresh=0.5,       # Higher threshold for cleaner detection
-            det_db_box_thresh=0.6
+            det_db_box_thresh=0.6,
+            **options
         )
-        print("DEBUG: PaddleOCR initialized successfully", file=sys.stderr)
+    logger.debug("PaddleOCR initialized successfully")
+    return ocr
+
+# Per-process state of page-parallel pool workers
+_pool_ocr = None
+_pool_doc = None
+_pool_cache = None
+
+def init_pool_worker(threads):
+    """
+    Load the model once in each pool worker
+    """
+    global _pool_ocr, _pool_cache
+    setup_logging()
+    _pool_ocr = create_ocr(cpu_threads=threads)
+    _pool_cache = open_cache()
+
+def ocr_pool_page(task):
+    """
+    Read a single page's text layer, or render and OCR it, inside a pool
+    worker. Returns a dict with the page number, its elements, where they
+    came from (source), the zoom, ROI box counts and timings.
+    """
+    global _pool_doc
+    pdf_path, page_num, zoom, roi = task
+    result = {'page_num': page_num, 'elements': None, 'source': 'error', 'zoom': None,
+              'roi': {}, 'timings': {}}
+    started = time.perf_counter()
+    
+    # Any error is this page's alone: it is reported as source 'error'
+    # rather than raised, which would abort the whole document's imap
+    try:
+        # Keep the current document open across its pages
+        stat = os.stat(pdf_path)
+        key = (pdf_path, stat.st_mtime_ns, stat.st_size)
+        if _pool_doc is None or _pool_doc[0] != key:
+            if _pool_doc is not None:
+                _pool_doc[1].close()
+                _pool_doc = None
+            _pool_doc = (key, open_pdf(pdf_path))
+        
+        if TEXT_LAYER_ENABLED:
+            page_zoom = resolve_zoom(_pool_doc[1], page_num, zoom, default=PAGE_ZOOM, text_layer=True)
+            words = extract_words(_pool_doc[1][page_num], page_zoom)
+            if words is not None:
+                result.update(elements=text_layer_elements(words), source='text_layer', zoom=page_zoom)
+                result['timings']['text_layer_ms'] = (time.perf_counter() - started) * 1000
+                return result
+        
+        page_zoom = resolve_zoom(_pool_doc[1], page_num, zoom, default=PAGE_ZOOM)
+        image = render_page(_pool_doc[1], page_num, page_zoom, gray=True)
+        rendered = time.perf_counter()
+        
+        page_elements, hit = ocr_page_cached(image, page_num, _pool_ocr, _pool_cache, roi, result['roi'])
+    except Exception as e:
+        print(f"ERROR on page {page_num}: {e}", file=sys.stderr)
+        return result
+    result.update(elements=page_elements, source='cache' if hit else 'ocr', zoom=page_zoom)
+    result['timings'].update(render_ms=(rendered - started) * 1000, ocr_ms=(time.perf_counter() - rendered) * 1000)
+    return result
+
+def create_page_pool(workers, threads=None):
+    """
+    Start worker processes that OCR pages in parallel, each with its own model
+    """
+    logger.debug("Starting %d OCR worker processes", workers)
+    return PagePool(workers, init_pool_worker, threads=threads)
+
+def cache_settings(roi=False):
+    """
+    Engine version and settings that affect OCR output
+    """
+    return package_version('paddleocr'), {
+        'pipeline': PIPELINE_VERSION,
+        'roi': roi,
+        'preprocess': PREPROCESS.setting,
+        'det_db_thresh': 0.5,
+        'det_db_box_thresh': 0.6,
+        'min_confidence': 0.5,
+    }
+
+def cache_key(content_hash, zoom=DEFAULT_ZOOM, roi=ROI_ENABLED):
+    """
+    Cache key for a document under the current engine version and settings
+    """
+    version, settings = cache_settings(roi)
+    settings.update(zoom=zoom, text_layer=TEXT_LAYER_ENABLED, text_layer_min_chars=MIN_TEXT_CHARS)
+    return make_key(content_hash, 'paddleocr', version, settings)
+
+def ocr_page_cached(image, page_num, ocr, cache, roi=False, roi_stats=None):
+    """
+    OCR one rendered page, reusing the stored text elements when the same
+    page image has been seen before. Returns (elements, cache_hit).
+    """
+    if cache is None:
+        return process_pdf_page_simple(image, page_num, ocr, roi, roi_stats), False
+    
+    version, settings = cache_settings(roi)
+    key = make_key(hash_array(image), 'paddleocr-page', version, settings)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached, True
+    
+    page_elements = process_pdf_page_simple(image, page_num, ocr, roi, roi_stats)
+    if page_elements is not None:
+        cache.put(key, page_elements)
+    return page_elements, False
+
+def page_record(page_num, page_elements, source, zoom, timings):
+    """
+    Streaming record for one finished page: its text, text elements with
+    boxes (in pixels of the page rendered at ``zoom``), line and table
+    column, confidence and timings
+    """
+    page_elements = page_elements or []
+    confidences = [element['confidence'] for element in page_elements]
+    with span('reconstruct', page=page_num):
+        text = simple_text_reconstruction(page_elements)
+        words = layout_elements(page_elements)
+    return {
+        'type': 'page',
+        'page': page_num + 1,
+        'text': text,
+        'words': words,
+        'confidence': sum(confidences) / len(confidences) if confidences else 0.0,
+        'source': source,
+        'zoom': zoom,
+        'timings': {name: round(value, 1) for name, value in timings.items()},
+    }
+
+def process_pdf_simple(pdf_path, ocr=None, pool=None, cache=None, report=None, zoom=DEFAULT_ZOOM,
+                       roi=ROI_ENABLED, on_page=None):
+    """
+    Simplified PDF processing with extensive debugging
+
+    Pass an already initialized ``ocr`` to reuse a loaded model (worker mode),
+    or a ``pool`` from create_page_pool to OCR pages in parallel processes.
+    Pages with an embedded text layer are read directly instead of being
+    OCR'd (disable with OCR_TEXT_LAYER=0). ``zoom`` is the render scale, or
+    'auto' to choose it per page from the size of the text. With ``roi``,
+    only text in the results table is recognized.
+    With a ``cache``, a document seen before is answered without running OCR
+    and pages seen before (e.g. in an earlier report that had fewer pages)
+    reuse their stored results. Cache statistics are added to ``report``.
+    ``on_page`` is called with a page_record as soon as each page is done,
+    or, on a document cache hit, with each stored page (source 'cache').
+    """
+    report = {} if report is None else report
+    try:
+        key = None
+        if cache is not None:
+            key = cache_key(hash_file(pdf_path), zoom, roi)
+            cached = cache.get(key)
+            # Entries stored before the pages were kept can't be streamed
+            if cached is not None and (on_page is None or 'page_elements' in cached):
+                print(f"TOTAL_PAGES:{cached['pages']}", file=sys.stderr)
+                logger.debug("OCR cache hit")
+                report.update(document_cache_hit=True, pages=cached['pages'], zoom=cached.get('zoom'))
+                if on_page is not None:
+                    # Replay the pages so streaming callers get the same records as on a cold run
+                    for page_num, page_elements, page_zoom in cached['page_elements']:
+                        on_page(page_record(page_num, page_elements, 'cache', page_zoom, {}))
+                return cached['text']
         
-        # Get page count
-        doc = fitz.open(pdf_path)
+        # Open the PDF once; a background thread renders pages into a
+        # bounded queue while the OCR stage drains it
+        doc = open_pdf(pdf_path)
         total_pages = len(doc)
-        doc.close()
         
         print(f"TOTAL_PAGES:{total_pages}", file=sys.stderr)
-        print(f"DEBUG: Processing {total_pages} pages", file=sys.stderr)
+        logger.debug("Processing %d pages", total_pages)
         
-        all_text_elements = []
+        document_pages = []
+        sources = {'text_layer': 0, 'cache': 0, 'ocr': 0, 'error': 0}
+        zooms = [None] * total_pages
+        roi_stats = {'boxes': 0, 'recognized': 0}
+        # (page_num, elements, zoom) of every page streamed, for the cache
+        emitted = []
+        pages = None
         
-        for page_num in range(total_pages):
-            print(f"CURRENT_PAGE:{page_num + 1}", file=sys.stderr)
-            
-            page_elements = process_pdf_page_simple(pdf_path, page_num, ocr)
-            
-            if page_elements:
-                # Add page break for multi-page documents
-                if page_num > 0:
-                    all_text_elements.append({
-                        'text': f'--- Page {page_num + 1} ---',
-                        'y': page_num * 1000,  # Ensure pages are separated
-                        'x': 0,
-                        'confidence': 1.0
-                    })
-                
-                # Offset y-coordinates for different pages
-                for element in page_elements:
-                    element['y'] += page_num * 1000
-                
-                all_text_elements.extend(page_elements)
+        try:
+            if pool is not None:
+                # Pages are OCR'd in parallel; results come back in page order
+                tasks = [(pdf_path, page_num, zoom, roi) for page_num in range(total_pages)]
+                for result in pool.imap(ocr_pool_page, tasks):
+                    page_num, page_zoom = result['page_num'], result['zoom']
+                    print(f"CURRENT_PAGE:{page_num + 1}", file=sys.stderr)
+                    print(f"PAGE_ZOOM:{page_num + 1}:{page_zoom}", file=sys.stderr)
+                    sources[result['source']] += 1
+                    add_count('pages', source=result['source'])
+                    add_count('words', len(result['elements'] or ()))
+                    # The stages ran in the worker process; add them to this request's trace
+                    for name, value in result['timings'].items():
+                        record_span(name[:-len('_ms')], value / 1000, page=page_num)
+                    zooms[page_num] = page_zoom
+                    for name, count in result['roi'].items():
+                        roi_stats[name] += count
+                    collect_page_elements(document_pages, result['elements'], page_num)
+                    if result['source'] != 'error':
+                        emitted.append((page_num, result['elements'], page_zoom))
+                        if on_page is not None:
+                            on_page(page_record(page_num, result['elements'], result['source'], page_zoom,
+                                                result['timings']))
+            else:
+                pages = prefetch(iter_pdf_pages(doc, zoom=zoom, text_layer=TEXT_LAYER_ENABLED, default_zoom=PAGE_ZOOM,
+                                                gray=True))
+                while True:
+                    # Time spent waiting here is rendering the OCR stage couldn't overlap
+                    started = time.perf_counter()
+                    page = next(pages, None)
+                    if page is None:
+                        break
+                    timings = {'wait_ms': (time.perf_counter() - started) * 1000}
+                    
+                    print(f"CURRENT_PAGE:{page.number + 1}", file=sys.stderr)
+                    print(f"PAGE_ZOOM:{page.number + 1}:{page.zoom}", file=sys.stderr)
+                    zooms[page.number] = page.zoom
+                    
+                    if page.words is not None:
+                        page_elements, source = text_layer_elements(page.words), 'text_layer'
+                    elif page.image is None:
+                        sources['error'] += 1
+                        add_count('pages', source='error')
+                        continue
+                    else:
+                        # The model is only loaded once a page actually needs OCR
+                        if ocr is None:
+                            ocr = create_ocr()
+                        started = time.perf_counter()
+                        page_elements, hit = ocr_page_cached(page.image, page.number, ocr, cache, roi, roi_stats)
+                        source = 'cache' if hit else 'ocr'
+                        timings['ocr_ms'] = (time.perf_counter() - started) * 1000
+                    
+                    sources[source] += 1
+                    add_count('pages', source=source)
+                    add_count('words', len(page_elements or ()))
+                    collect_page_elements(document_pages, page_elements, page.number)
+                    emitted.append((page.number, page_elements, page.zoom))
+                    if on_page is not None:
+                        on_page(page_record(page.number, page_elements, source, page.zoom, timings))
+        finally:
+            if pages is not None:
+                pages.close()
+            doc.close()
         
-        print(f"DEBUG: Total text elements collected: {len(all_text_elements)}", file=sys.stderr)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Total text elements collected: %d", sum(len(elements) for _, elements in document_pages))
+        
+        print(f"TEXT_LAYER:{sources['text_layer']}/{total_pages}", file=sys.stderr)
+        if cache is not None:
+            print(f"PAGE_CACHE:{sources['cache']}/{total_pages}", file=sys.stderr)
+        if roi:
+            skipped = roi_stats['boxes'] - roi_stats['recognized']
+            print(f"ROI_SKIPPED:{skipped}/{roi_stats['boxes']}", file=sys.stderr)
+            report['roi_skipped_fraction'] = skipped / roi_stats['boxes'] if roi_stats['boxes'] else 0.0
+        report.update(
+            document_cache_hit=False,
+            pages=total_pages,
+            text_layer_pages=sources['text_layer'],
+            page_cache_hits=sources['cache'],
+            zoom=zooms
+        )
         
         # Reconstruct text
-        if all_text_elements:
-            result = simple_text_reconstruction(all_text_elements)
-            print(f"DEBUG: Final text length: {len(result)} characters", file=sys.stderr)
-            return result
+        if document_pages:
+            result = reconstruct_document(document_pages)
+            logger.debug("Final text length: %d characters", len(result))
         else:
-            print("DEBUG: No text elements found", file=sys.stderr)
-            return ""
+            logger.debug("No text elements found")
+            result = ""
+        
+        if key is not None:
+            cache.put(key, {'text': result, 'pages': total_pages, 'zoom': zooms, 'page_elements': emitted})
+        
+        return result
         
     except Exception as e:
         print(f"ERROR in process_pdf_simple: {e}", file=sys.stderr)
@@ -205,16 +520,127 @@ def process_pdf_simple(pdf_path):
         traceback.print_exc(file=sys.stderr)
         return ""
 
+def write_record(record):
+    """
+    Write one JSON record as a line on stdout and flush it so the reader
+    sees it right away
+    """
+    with span('serialize'):
+        sys.stdout.write(json.dumps(record) + "\n")
+    sys.stdout.flush()
+
+def process_job(job, ocr, pool=None, cache=None, zoom=DEFAULT_ZOOM, roi=ROI_ENABLED):
+    """
+    Run a single worker job and build its JSON response. Jobs with
+    "stream": true also get a page record line as each page finishes.
+    """
+    job_id = job.get('id')
+    file_path = job.get('file')
+    
+    if not file_path or not os.path.exists(file_path):
+        return {'id': job_id, 'error': f"File not found: {file_path}"}
+    
+    file_extension = os.path.splitext(file_path)[1].lower()
+    if file_extension != '.pdf':
+        return {'id': job_id, 'error': f"Unsupported file type: {file_extension}"}
+    
+    on_page = None
+    if job.get('stream'):
+        def on_page(record):
+            write_record(dict(record, id=job_id))
+    
+    report = {}
+    with start_trace('paddle_ocr', job=job_id, file=os.path.basename(file_path)):
+        text = process_pdf_simple(file_path, ocr, pool, cache, report, zoom, roi, on_page)
+    return dict(report, id=job_id, text=text)
+
+def run_worker(pool=None, cache=None, zoom=DEFAULT_ZOOM, roi=ROI_ENABLED):
+    """
+    Long-lived worker: load the model once, then read line-delimited JSON jobs
+    ({"id": ..., "file": ..., "stream": false}) from stdin and answer each with
+    one JSON line on stdout (preceded by its page records when streaming).
+    Progress lines (TOTAL_PAGES:/CURRENT_PAGE:) keep going to stderr,
+    jobs are handled one at a time so they always belong to the current job.
+    """
+    ocr = create_ocr() if pool is None else None
+    print("WORKER_READY", file=sys.stderr, flush=True)
+    
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        
+        try:
+            job = json.loads(line)
+        except ValueError as e:
+            response = {'id': None, 'error': f"Invalid job: {e}"}
+        else:
+            if not isinstance(job, dict):
+                response = {'id': None, 'error': f"Invalid job: expected a JSON object, got {type(job).__name__}"}
+            else:
+                try:
+                    response = process_job(job, ocr, pool, cache, zoom, roi)
+                except Exception as e:
+                    print(f"ERROR in worker job: {e}", file=sys.stderr)
+                    response = {'id': job.get('id'), 'error': str(e)}
+        
+        sys.stderr.flush()
+        write_record(response)
+
 def main():
     """
     Main function with debug output
     """
-    if len(sys.argv) != 2:
-        print("Usage: python paddle_ocr.py <file_path>", file=sys.stderr)
+    parser = argparse.ArgumentParser(description="Extract text from lab PDFs with PaddleOCR")
+    parser.add_argument('file_path', nargs='?', help="PDF file to process")
+    parser.add_argument('--worker', action='store_true',
+                        help="Keep the model loaded and read JSON jobs from stdin")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help="OCR pages in parallel across this many processes (env OCR_WORKERS)")
+    parser.add_argument('--threads-per-worker', type=int, default=DEFAULT_THREADS_PER_WORKER,
+                        help="BLAS/OpenMP threads per worker process, 0 = cores / workers "
+                             "(env OCR_THREADS_PER_WORKER)")
+    parser.add_argument('--zoom', type=lambda value: parse_zoom(value, PAGE_ZOOM), default=DEFAULT_ZOOM,
+                        help=f"Render scale for PDF pages, or 'auto' to pick the smallest scale that keeps "
+                             f"text legible within a pixel budget (env OCR_ZOOM, default {PAGE_ZOOM})")
+    parser.add_argument('--format', choices=('text', 'ndjson'), default='text',
+                        help="Print the text once at the end (text), or one JSON record per page as it "
+                             "finishes followed by a summary record (ndjson)")
+    parser.add_argument('--roi', action='store_true', default=ROI_ENABLED,
+                        help="Detect text first and only recognize the results table rows (env OCR_ROI)")
+    parser.add_argument('-v', '--verbose', action='count', default=0,
+                        help="Log more to stderr: -v for INFO, -vv for DEBUG (env OCR_LOG_LEVEL, default WARNING)")
+    args = parser.parse_args()
+    setup_logging(verbose=args.verbose)
+    
+    pool = None
+    if args.workers > 1:
+        pool = create_page_pool(args.workers, args.threads_per_worker)
+    
+    cache = open_cache()
+    
+    try:
+        run(args, pool, cache)
+    finally:
+        if pool is not None:
+            pool.close()
+        if cache is not None:
+            cache.close()
+
+def run(args, pool=None, cache=None):
+    """
+    Run either the long-lived worker or a single file
+    """
+    if args.worker:
+        run_worker(pool, cache, args.zoom, args.roi)
+        return
+    
+    if not args.file_path:
+        print("Usage: python paddle_ocr.py <file_path> | --worker", file=sys.stderr)
         sys.exit(1)
     
-    file_path = sys.argv[1]
-    print(f"DEBUG: Processing file: {file_path}", file=sys.stderr)
+    file_path = args.file_path
+    logger.debug("Processing file: %s", file_path)
     
     if not os.path.exists(file_path):
         print(f"ERROR: File not found: {file_path}", file=sys.stderr)
@@ -222,16 +648,25 @@ def main():
     
     try:
         file_extension = os.path.splitext(file_path)[1].lower()
-        print(f"DEBUG: File extension: {file_extension}", file=sys.stderr)
+        logger.debug("File extension: %s", file_extension)
         
-        if file_extension == '.pdf':
-            extracted_text = process_pdf_simple(file_path)
-        else:
+        if file_extension != '.pdf':
             print(f"ERROR: Unsupported file type: {file_extension}", file=sys.stderr)
             sys.exit(1)
         
-        # Output the extracted text
-        print(extracted_text)
+        with start_trace('paddle_ocr', file=os.path.basename(file_path)):
+            if args.format == 'ndjson':
+                report = {}
+                text = process_pdf_simple(file_path, pool=pool, cache=cache, report=report, zoom=args.zoom,
+                                          roi=args.roi, on_page=write_record)
+                write_record(dict(report, type='summary', text=text))
+                return
+            
+            extracted_text = process_pdf_simple(file_path, pool=pool, cache=cache, zoom=args.zoom, roi=args.roi)
+            
+            # Output the extracted text
+            with span('serialize'):
+                print(extracted_text)
         
     except Exception as e:
         print(f"ERROR in main: {e}", file=sys.stderr)
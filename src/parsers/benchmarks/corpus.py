@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Synthetic lab report corpus for the OCR benchmarks
+
+Every document is a results table (analyte, value, unit, reference range)
+under a short report header, drawn with PyMuPDF and then rasterized at a
+given DPI with a given amount of scan noise, so the PDFs are image-only
+like a scanned report and every engine has to OCR them. The text that was
+drawn is kept as the ground truth of each page.
+
+Generation is seeded: the same arguments always produce the same files,
+and the manifest records a hash of each one so benchmark results can tell
+whether two runs read the same corpus.
+
+    python src/parsers/benchmarks/corpus.py OUT_DIR [--pages 1 5 20] [--dpi 150 300] [--noise clean light heavy]
+"""
+
+import os
+import json
+import random
+import hashlib
+import argparse
+
+import cv2
+import fitz
+import numpy as np
+
+MANIFEST = 'manifest.json'
+
+# Bump when a change to the generator alters the documents it draws
+CORPUS_VERSION = 1
+
+# (analyte, unit, low, high, decimals)
+ANALYTES = [
+    ('Hemoglobin', 'g/L', 120, 160, 0),
+    ('Hematocrit', 'L/L', 0.36, 0.46, 2),
+    ('RBC', 'x10E12/L', 4.2, 5.4, 1),
+    ('WBC', 'x10E9/L', 4.0, 11.0, 1),
+    ('Platelets', 'x10E9/L', 150, 400, 0),
+    ('MCV', 'fL', 80, 100, 0),
+    ('MCH', 'pg', 27, 32, 1),
+    ('Neutrophils', 'x10E9/L', 2.0, 7.5, 1),
+    ('Lymphocytes', 'x10E9/L', 1.0, 3.5, 1),
+    ('Glucose Fasting', 'mmol/L', 3.6, 6.0, 1),
+    ('Hemoglobin A1C', '%', 4.0, 6.0, 1),
+    ('Sodium', 'mmol/L', 135, 145, 0),
+    ('Potassium', 'mmol/L', 3.5, 5.0, 1),
+    ('Chloride', 'mmol/L', 98, 107, 0),
+    ('Creatinine', 'umol/L', 60, 110, 0),
+    ('eGFR', 'mL/min/1.73m2', 60, 120, 0),
+    ('Urea', 'mmol/L', 2.5, 7.1, 1),
+    ('ALT', 'U/L', 7, 56, 0),
+    ('AST', 'U/L', 10, 40, 0),
+    ('Alkaline Phosphatase', 'U/L', 44, 147, 0),
+    ('Bilirubin Total', 'umol/L', 5, 21, 0),
+    ('Albumin', 'g/L', 35, 50, 0),
+    ('Cholesterol Total', 'mmol/L', 3.0, 5.2, 2),
+    ('HDL Cholesterol', 'mmol/L', 1.0, 2.0, 2),
+    ('LDL Cholesterol', 'mmol/L', 1.5, 3.4, 2),
+    ('Triglycerides', 'mmol/L', 0.5, 1.7, 2),
+    ('TSH', 'mIU/L', 0.32, 4.0, 2),
+    ('Free T4', 'pmol/L', 9, 19, 0),
+    ('Ferritin', 'ug/L', 30, 400, 0),
+    ('Vitamin B12', 'pmol/L', 148, 616, 0),
+    ('Vitamin D 25-OH', 'nmol/L', 75, 250, 0),
+    ('CRP', 'mg/L', 0.0, 8.0, 1),
+]
+
+COLUMNS = ('Test', 'Result', 'Units', 'Reference Range')
+# Left edge of each column in points on a US Letter page
+COLUMN_X = (54, 260, 350, 450)
+FONT_SIZE = 10
+ROW_HEIGHT = 18
+ROWS_TOP = 170
+PAGE_WIDTH, PAGE_HEIGHT = fitz.paper_size('letter')
+
+# Scan noise: Gaussian pixel noise (sigma, 0-255), speckle (fraction of
+# pixels flipped), blur kernel and the largest skew in degrees
+NOISE_LEVELS = {
+    'clean': {'sigma': 0, 'speckle': 0.0, 'blur': 0, 'skew': 0.0},
+    'light': {'sigma': 12, 'speckle': 0.002, 'blur': 0, 'skew': 0.5},
+    'heavy': {'sigma': 30, 'speckle': 0.01, 'blur': 3, 'skew': 1.5},
+}
+
+
+def format_value(value, decimals):
+    return f'{value:.{decimals}f}'
+
+
+def report_rows(rng, count):
+    """
+    ``count`` result rows of (analyte, value, unit, range) cells, a value
+    now and then outside its range
+    """
+    rows = []
+    for index in range(count):
+        name, unit, low, high, decimals = ANALYTES[index % len(ANALYTES)]
+        spread = high - low
+        value = rng.uniform(low - spread * 0.2, high + spread * 0.2)
+        rows.append((
+            name,
+            format_value(value, decimals),
+            unit,
+            f'{format_value(low, decimals)} - {format_value(high, decimals)}',
+        ))
+    return rows
+
+
+def header_lines(rng, document, page_num, pages):
+    return [
+        'LABORATORY REPORT',
+        f'Patient: Synthetic Patient {document:03d}    Page {page_num + 1} of {pages}',
+        f'Collected: 2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}    '
+        f'Accession: {rng.randint(10000000, 99999999)}',
+    ]
+
+
+def draw_page(page, header, rows):
+    """
+    Draw a report page; returns its ground truth, one line per printed line
+    """
+    y = 60
+    for index, line in enumerate(header):
+        page.insert_text((54, y), line, fontsize=16 if index == 0 else FONT_SIZE, fontname='helv')
+        y += 28 if index == 0 else 18
+
+    truth = list(header)
+    for y, cells in [(ROWS_TOP - ROW_HEIGHT, COLUMNS)] + [
+        (ROWS_TOP + index * ROW_HEIGHT, row) for index, row in enumerate(rows)
+    ]:
+        for x, cell in zip(COLUMN_X, cells):
+            page.insert_text((x, y), cell, fontsize=FONT_SIZE, fontname='helv')
+        truth.append(' '.join(cells))
+    return '\n'.join(truth)
+
+
+def add_noise(gray, noise, rng):
+    """
+    ``gray`` (uint8) as scanned with NOISE_LEVELS[``noise``]
+    """
+    settings = NOISE_LEVELS[noise]
+    if settings['skew']:
+        angle = rng.uniform(-settings['skew'], settings['skew'])
+        height, width = gray.shape
+        matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+        gray = cv2.warpAffine(gray, matrix, (width, height), flags=cv2.INTER_LINEAR,
+                              borderMode=cv2.BORDER_CONSTANT, borderValue=255)
+    if settings['blur']:
+        gray = cv2.GaussianBlur(gray, (settings['blur'], settings['blur']), 0)
+    if settings['sigma'] or settings['speckle']:
+        np_rng = np.random.default_rng(rng.randrange(2 ** 32))
+        noisy = gray.astype(np.float32)
+        if settings['sigma']:
+            noisy += np_rng.normal(0, settings['sigma'], gray.shape)
+        if settings['speckle']:
+            flipped = np_rng.random(gray.shape) < settings['speckle']
+            noisy[flipped] = 255 - noisy[flipped]
+        gray = np.clip(noisy, 0, 255).astype(np.uint8)
+    return gray
+
+
+def scanned_page(out, source_page, dpi, noise, rng):
+    """
+    Add ``source_page`` to ``out`` as an image-only page rasterized at ``dpi``
+    """
+    pix = source_page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY)
+    gray = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width)
+    # Noisy pages are stored as JPEG like most scanners do; noise makes PNG
+    # several times larger
+    if NOISE_LEVELS[noise]['sigma']:
+        ok, data = cv2.imencode('.jpg', add_noise(gray.copy(), noise, rng), [cv2.IMWRITE_JPEG_QUALITY, 85])
+    else:
+        ok, data = cv2.imencode('.png', add_noise(gray.copy(), noise, rng))
+    if not ok:
+        raise RuntimeError("Could not encode page image")
+    page = out.new_page(width=source_page.rect.width, height=source_page.rect.height)
+    page.insert_image(page.rect, stream=data.tobytes())
+
+
+def build_document(path, document, pages, dpi, noise, rows_per_page, seed):
+    """
+    Write one scanned report to ``path``; returns the ground truth of each page
+    """
+    rng = random.Random(f'{seed}-{document}-{pages}-{dpi}-{noise}')
+    source = fitz.open()
+    out = fitz.open()
+    truth = []
+    try:
+        for page_num in range(pages):
+            page = source.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+            truth.append(draw_page(page, header_lines(rng, document, page_num, pages), report_rows(rng, rows_per_page)))
+            scanned_page(out, page, dpi, noise, rng)
+        # Fixed metadata so the bytes only depend on the arguments
+        out.set_metadata({'producer': 'health-tracker benchmark corpus', 'creationDate': '', 'modDate': ''})
+        out.save(path, garbage=3, deflate=True, no_new_id=True)
+    finally:
+        out.close()
+        source.close()
+    return truth
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def build_corpus(out_dir, page_counts=(1, 5, 20), dpis=(150, 300), noise_levels=('clean', 'light', 'heavy'),
+                 rows_per_page=30, seed=0):
+    """
+    Generate one document per combination of page count, DPI and noise
+    level in ``out_dir`` and write its manifest; returns the manifest
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    documents = []
+    for pages in page_counts:
+        for dpi in dpis:
+            for noise in noise_levels:
+                name = f'report_p{pages}_d{dpi}_{noise}'
+                path = os.path.join(out_dir, name + '.pdf')
+                truth = build_document(path, len(documents), pages, dpi, noise, rows_per_page, seed)
+                documents.append({
+                    'name': name,
+                    'file': name + '.pdf',
+                    'pages': pages,
+                    'dpi': dpi,
+                    'noise': noise,
+                    'sha256': file_hash(path),
+                    'truth': truth,
+                })
+
+    manifest = {
+        'version': CORPUS_VERSION,
+        'seed': seed,
+        'rows_per_page': rows_per_page,
+        'documents': documents,
+    }
+    with open(os.path.join(out_dir, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def load_corpus(corpus_dir):
+    """
+    The manifest of a generated corpus
+    """
+    with open(os.path.join(corpus_dir, MANIFEST)) as f:
+        return json.load(f)
+
+
+def corpus_fingerprint(manifest):
+    """
+    One hash for the whole corpus, from the hashes of its files
+    """
+    digest = hashlib.sha256()
+    for document in manifest['documents']:
+        digest.update(document['sha256'].encode())
+    return digest.hexdigest()[:16]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('out_dir', help="Directory to write the PDFs and manifest.json to")
+    parser.add_argument('--pages', type=int, nargs='+', default=[1, 5, 20], help="Page counts")
+    parser.add_argument('--dpi', type=int, nargs='+', default=[150, 300], help="Scan resolutions")
+    parser.add_argument('--noise', nargs='+', choices=sorted(NOISE_LEVELS), default=['clean', 'light', 'heavy'],
+                        help="Scan noise levels")
+    parser.add_argument('--rows', type=int, default=30, help="Result rows per page")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    manifest = build_corpus(args.out_dir, args.pages, args.dpi, args.noise, args.rows, args.seed)
+    print(f"{len(manifest['documents'])} documents, fingerprint {corpus_fingerprint(manifest)}")
+
+
+if __name__ == '__main__':
+    main()
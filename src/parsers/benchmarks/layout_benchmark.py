@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark: line reconstruction of ocr_common.layout against the
+per-element loop paddle_ocr.py used before it
+
+Pages are synthetic results tables (rows of analyte, value, unit and
+reference range cells with a little vertical jitter), so both versions
+see the same elements and their output can be compared. ``--scale``
+changes the render scale of the page: the old fixed 20 pixel threshold
+merges table rows once they are rendered closer than that.
+
+"layout ms" includes pulling the boxes out of the element dicts; "core ms"
+is the layout itself on boxes that are already an array.
+
+    python src/parsers/benchmarks/layout_benchmark.py [--sizes 500 2000 10000] [--repeat 5] [--scale 0.6]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from itertools import chain
+
+from ocr_common.layout import assign_lines, assign_columns, reconstruct_lines
+
+ROW_HEIGHT = 28
+BOX_HEIGHT = 18
+CELL_X = (40, 420, 560, 700)
+
+
+def legacy_text_reconstruction(text_elements):
+    """
+    simple_text_reconstruction as it was in paddle_ocr.py: fixed 20 pixel
+    threshold against the first element of the line, debug output removed
+    """
+    if not text_elements:
+        return ""
+
+    text_elements.sort(key=lambda x: (x['y'], x['x']))
+
+    lines = []
+    current_line = []
+    current_y = None
+    y_threshold = 20  # Pixels
+
+    for element in text_elements:
+        y = element['y']
+
+        if current_y is None or abs(y - current_y) > y_threshold:
+            if current_line:
+                current_line.sort(key=lambda x: x['x'])
+                lines.append(' '.join([elem['text'] for elem in current_line]))
+            current_line = [element]
+            current_y = y
+        else:
+            current_line.append(element)
+
+    if current_line:
+        current_line.sort(key=lambda x: x['x'])
+        lines.append(' '.join([elem['text'] for elem in current_line]))
+
+    return '\n'.join(lines)
+
+
+def layout_text_reconstruction(text_elements):
+    """
+    The same elements through ocr_common.layout, as paddle_ocr.py now does
+    """
+    boxes = np.fromiter(
+        chain.from_iterable(element['box'] for element in text_elements),
+        dtype=np.float64, count=4 * len(text_elements)
+    ).reshape(-1, 4)
+    return '\n'.join(reconstruct_lines(boxes, [element['text'] for element in text_elements]))
+
+
+def synthetic_page(detections, scale=1.0, seed=0):
+    """
+    Text elements of a results table with about ``detections`` boxes at
+    render ``scale``, in shuffled (detector) order
+    """
+    rng = random.Random(seed)
+    elements = []
+    for row in range(max(1, detections // len(CELL_X))):
+        top = (60 + row * ROW_HEIGHT) * scale
+        for cell, x in enumerate(CELL_X):
+            y0 = top + rng.uniform(-2, 2) * scale
+            width = rng.uniform(40, 120) * scale
+            box = [x * scale, y0, (x * scale) + width, y0 + BOX_HEIGHT * scale]
+            elements.append({
+                'text': f'r{row}c{cell}',
+                'x': (box[0] + box[2]) / 2,
+                'y': (box[1] + box[3]) / 2,
+                'confidence': 0.9,
+                'box': box,
+            })
+    rng.shuffle(elements)
+    return elements
+
+
+def best_time(func, items, repeat):
+    """
+    Fastest of ``repeat`` runs, in milliseconds, and the last result
+    """
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        # The legacy function sorts its input in place
+        copy = list(items)
+        started = time.perf_counter()
+        result = func(copy)
+        best = min(best, time.perf_counter() - started)
+    return best * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[500, 2000, 10000, 50000],
+                        help="Detections per synthetic page")
+    parser.add_argument('--repeat', type=int, default=5, help="Runs per size; the fastest is reported")
+    parser.add_argument('--scale', type=float, default=1.0, help="Render scale of the synthetic page")
+    args = parser.parse_args()
+
+    print(f"{'boxes':>8} {'rows':>6} {'legacy ms':>10} {'layout ms':>10} {'core ms':>8} "
+          f"{'legacy lines':>13} {'layout lines':>13} {'columns':>8}")
+    for size in args.sizes:
+        elements = synthetic_page(size, args.scale)
+        rows = len(elements) // len(CELL_X)
+        legacy_ms, legacy = best_time(legacy_text_reconstruction, elements, args.repeat)
+        layout_ms, layout = best_time(layout_text_reconstruction, elements, args.repeat)
+
+        boxes = np.array([element['box'] for element in elements])
+        texts = [element['text'] for element in elements]
+        core_ms, _ = best_time(lambda _: reconstruct_lines(boxes, texts), [], args.repeat)
+
+        line = assign_lines(boxes)
+        columns = assign_columns(boxes, line).max() + 1
+        print(f"{len(elements):>8} {rows:>6} {legacy_ms:>10.2f} {layout_ms:>10.2f} {core_ms:>8.2f} "
+              f"{len(legacy.splitlines()):>13} {len(layout.splitlines()):>13} {columns:>8}")
+
+
+if __name__ == '__main__':
+    main()
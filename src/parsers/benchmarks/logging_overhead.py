@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Cost of paddle_ocr.py's debug logging at each log level
+
+Runs the per-page code of paddle_ocr.py (preprocessing, reading the
+detections, building text elements) and the document reconstruction over a
+synthetic lab report, by default 20 pages, once with the logger at WARNING
+(the default, where the debug paths are skipped) and once at DEBUG (what
+every run paid before OCR_LOG_LEVEL existed). The model is replaced by the
+words of each page as PaddleOCR would return them, so the timings are the
+pipeline's own work and the difference between the levels is the logging.
+
+Log output goes to os.devnull unless --stderr is given, so the terminal's
+speed doesn't count; the Node callers read and re-log every stderr line,
+which costs more on top.
+
+    python src/parsers/benchmarks/logging_overhead.py [--pages 20] [--repeat 5] [--stderr]
+"""
+
+import os
+import sys
+import time
+import random
+import logging
+import argparse
+
+import fitz
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'PaddleOCR'))
+
+import paddle_ocr
+from benchmarks.corpus import PAGE_WIDTH, PAGE_HEIGHT, draw_page, header_lines, report_rows
+from ocr_common.render import render_page
+
+
+class ReplayOCR:
+    """
+    Stands in for the PaddleOCR model: answers each page with its words in
+    the form ``ocr.ocr(...)`` returns
+    """
+
+    def __init__(self, detections):
+        self.detections = detections
+        self.page = 0
+
+    def ocr(self, image, **kwargs):
+        return [self.detections[self.page]]
+
+
+def build_pages(pages, rows, zoom, seed=0):
+    """
+    Rendered images and PaddleOCR-style detections of a ``pages`` page report
+    """
+    rng = random.Random(seed)
+    doc = fitz.open()
+    try:
+        for page_num in range(pages):
+            page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+            draw_page(page, header_lines(rng, 0, page_num, pages), report_rows(rng, rows))
+        images, detections = [], []
+        for page_num in range(pages):
+            images.append(render_page(doc, page_num, zoom))
+            detections.append([
+                [[[x0 * zoom, y0 * zoom], [x1 * zoom, y0 * zoom], [x1 * zoom, y1 * zoom], [x0 * zoom, y1 * zoom]],
+                 (text, rng.uniform(0.8, 1.0))]
+                for x0, y0, x1, y1, text, *_ in doc[page_num].get_text('words')
+            ])
+    finally:
+        doc.close()
+    return images, detections
+
+
+def run_document(images, ocr):
+    """
+    The per-page and document steps of process_pdf_simple, without rendering
+    """
+    document_pages = []
+    for page_num, image in enumerate(images):
+        ocr.page = page_num
+        page_elements = paddle_ocr.process_pdf_page_simple(image, page_num, ocr)
+        paddle_ocr.collect_page_elements(document_pages, page_elements, page_num)
+    return paddle_ocr.reconstruct_document(document_pages)
+
+
+def best_time(images, ocr, repeat):
+    """
+    Fastest of ``repeat`` runs over the document, in milliseconds
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run_document(images, ocr)
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--pages', type=int, default=20, help="Pages in the document")
+    parser.add_argument('--rows', type=int, default=30, help="Result rows per page")
+    parser.add_argument('--repeat', type=int, default=5, help="Runs per level; the fastest is reported")
+    parser.add_argument('--stderr', action='store_true', help="Write the debug output to stderr instead of os.devnull")
+    args = parser.parse_args()
+
+    images, detections = build_pages(args.pages, args.rows, paddle_ocr.PAGE_ZOOM)
+    ocr = ReplayOCR(detections)
+
+    logger = logging.getLogger('ocr.paddle')
+    logger.propagate = False
+    sink = sys.stderr if args.stderr else open(os.devnull, 'w')
+    logger.addHandler(logging.StreamHandler(sink))
+
+    words = sum(len(page) for page in detections)
+    print(f"{args.pages} pages, {words} detections")
+    print(f"{'level':>8} {'document ms':>12} {'per page ms':>12} {'overhead':>9}")
+    baseline = None
+    for level in (logging.WARNING, logging.DEBUG):
+        logger.setLevel(level)
+        # One untimed pass so both levels start warm
+        run_document(images, ocr)
+        document_ms = best_time(images, ocr, args.repeat)
+        baseline = document_ms if baseline is None else baseline
+        print(f"{logging.getLevelName(level):>8} {document_ms:>12.2f} {document_ms / args.pages:>12.3f} "
+              f"{(document_ms - baseline) / baseline:>9.1%}")
+
+
+if __name__ == '__main__':
+    main()
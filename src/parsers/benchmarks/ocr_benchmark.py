@@ -0,0 +1,668 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark of the Python OCR entry points on a synthetic corpus
+
+Each target is run the way it is deployed, in its own process, on every
+document of a corpus written by corpus.py:
+
+- paddle: PaddleOCR/paddle_ocr.py --format ndjson
+- easyocr: EasyOCR/run_easyocr.py --format ndjson
+- doctr: the DocTR server, POST /process_document/stream
+- service-paddle, service-easyocr, service-doctr: ocr_service, POST /ocr
+- api-paddle: the serverless handler api/ocr/process.py, raw PDF body
+
+Command line targets start a new process per run, so every run includes
+loading the model. Servers are started once per document: they are timed
+until they answer (startup_ms), and then each request is timed on its own.
+The first request to ocr_service and api-paddle also loads the model.
+
+Each run records its wall time, the time to the first page when the target
+streams pages, and its stage timings: targets run with OCR_TRACE=1, and the
+stages come from the TRACE line each run or request logs (or the timings
+the target returns, when it logs none). Per target
+and document the results keep the median run, pages per second, the peak
+RSS of the process (from wait4; worker processes a target starts are not
+included) and the character accuracy against the corpus ground truth.
+Targets run on CPU and with the OCR cache off. Targets whose engine isn't
+installed are skipped.
+
+    python src/parsers/benchmarks/corpus.py /tmp/ocr-corpus
+    python src/parsers/benchmarks/ocr_benchmark.py run /tmp/ocr-corpus --output before.json
+    python src/parsers/benchmarks/ocr_benchmark.py run /tmp/ocr-corpus --output after.json --env OCR_ZOOM=auto
+    python src/parsers/benchmarks/ocr_benchmark.py compare before.json after.json
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import signal
+import socket
+import platform
+import argparse
+import statistics
+import subprocess
+import importlib.util
+import urllib.error
+import urllib.request
+from tempfile import TemporaryFile
+
+PARSERS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_DIR = os.path.dirname(os.path.dirname(PARSERS_DIR))
+
+sys.path.insert(0, PARSERS_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from ocr_common.cache import package_version
+from corpus import load_corpus, corpus_fingerprint, CORPUS_VERSION
+
+RESULTS_VERSION = 1
+
+# Packages whose versions are recorded with the results
+PACKAGES = ('paddleocr', 'paddlepaddle', 'easyocr', 'python-doctr', 'torch', 'pymupdf', 'opencv-python', 'numpy')
+
+
+def edit_distance(a, b):
+    """
+    Levenshtein distance between strings ``a`` and ``b``, with the
+    bit-parallel algorithm of Myers (1999) as formulated by Hyyrö: one
+    pass over ``b`` with ``len(a)``-bit integers as bit vectors, fast
+    enough for whole documents
+    """
+    if not a:
+        return len(b)
+    if not b:
+        return len(a)
+    peq = {}
+    for index, char in enumerate(a):
+        peq[char] = peq.get(char, 0) | (1 << index)
+    full = (1 << len(a)) - 1
+    last = 1 << (len(a) - 1)
+    pv, mv, score = full, 0, len(a)
+    for char in b:
+        eq = peq.get(char, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = (mv | ~(xh | pv)) & full
+        mh = pv & xh
+        if ph & last:
+            score += 1
+        elif mh & last:
+            score -= 1
+        # The carried-in 1 is the growing distance along the first row
+        ph = ((ph << 1) | 1) & full
+        mh = (mh << 1) & full
+        pv = (mh | ~(xv | ph)) & full
+        mv = ph & xv
+    return score
+
+
+def normalize_text(text):
+    """
+    Text with all whitespace runs collapsed, so line breaks and column gaps
+    don't count as errors
+    """
+    return ' '.join(text.split())
+
+
+def char_accuracy(truth, text):
+    """
+    1 - character error rate of ``text`` against ``truth``, floored at 0
+    """
+    truth = normalize_text(truth)
+    text = normalize_text(text)
+    if not truth:
+        return 1.0 if not text else 0.0
+    return max(0.0, 1.0 - edit_distance(truth, text) / len(truth))
+
+
+def median(values):
+    values = [value for value in values if value is not None]
+    return statistics.median(values) if values else None
+
+
+def add_stages(stages, timings):
+    """
+    Add the stage timings a target reported (``*_ms`` values) to ``stages``
+    """
+    for name, value in (timings or {}).items():
+        if name.endswith('_ms') and isinstance(value, (int, float)):
+            stages[name] = stages.get(name, 0.0) + value
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def reap(proc, timeout=None):
+    """
+    Wait for ``proc`` with wait4 to get its resource usage; returns its
+    exit code and peak RSS in bytes. Kills it after ``timeout`` seconds.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        pid, status, usage = os.wait4(proc.pid, os.WNOHANG if deadline is not None else 0)
+        if pid:
+            break
+        if time.monotonic() > deadline:
+            proc.kill()
+            deadline = None
+            continue
+        time.sleep(0.05)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = usage.ru_maxrss if sys.platform == 'darwin' else usage.ru_maxrss * 1024
+    return proc.returncode, peak
+
+
+def log_size(log):
+    return os.fstat(log.fileno()).st_size
+
+
+def read_log(log, offset=0):
+    """
+    What a target logged from ``offset`` on. pread leaves the file position
+    alone: a running server shares it and writes there.
+    """
+    data = os.pread(log.fileno(), max(log_size(log) - offset, 0), offset)
+    return data.decode('utf-8', errors='replace')
+
+
+def log_tail(log, lines=20):
+    return '\n'.join(read_log(log).splitlines()[-lines:])
+
+
+def trace_stages(output):
+    """
+    Stage timings (``<stage>_ms``) of the TRACE lines that OCR_TRACE=1 has
+    a target log, added up; empty when there are none
+    """
+    stages = {}
+    for line in output.splitlines():
+        if line.startswith('TRACE:'):
+            trace = json.loads(line[len('TRACE:'):])
+            add_stages(stages, {f'{stage}_ms': ms for stage, ms in trace['stages'].items()})
+    return stages
+
+
+def multipart_body(path, field='file'):
+    """
+    multipart/form-data body with the file at ``path``; returns the body
+    and its Content-Type
+    """
+    boundary = uuid.uuid4().hex
+    with open(path, 'rb') as f:
+        data = f.read()
+    body = (
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"; '
+        f'filename="{os.path.basename(path)}"\r\nContent-Type: application/pdf\r\n\r\n'
+    ).encode() + data + f'\r\n--{boundary}--\r\n'.encode()
+    return body, f'multipart/form-data; boundary={boundary}'
+
+
+class Target:
+    """
+    One way of running OCR over a PDF. ``requires`` names the module that
+    has to be importable for the target to run.
+    """
+
+    requires = None
+
+    def __init__(self, name):
+        self.name = name
+
+    def missing(self):
+        """
+        Why the target can't run here, or None
+        """
+        if self.requires and importlib.util.find_spec(self.requires) is None:
+            return f"{self.requires} is not installed"
+        return None
+
+    def benchmark(self, path, pages, repeat, env):
+        """
+        ``repeat`` runs over the PDF at ``path``; returns the runs (dicts
+        with ``wall_ms``, ``first_page_ms``, ``stages`` and ``texts``), the
+        peak RSS in bytes and the server startup time (None for commands)
+        """
+        raise NotImplementedError
+
+
+class CommandTarget(Target):
+    """
+    A command line script, one process per run. ``parse`` turns its stdout
+    lines (with the seconds since start each arrived) into the page texts
+    (or the whole text as one item) and stage timings; the TRACE line on
+    stderr replaces those timings when there is one.
+    """
+
+    def __init__(self, name, script, requires, parse, args=()):
+        super().__init__(name)
+        self.script = script
+        self.requires = requires
+        self.parse = parse
+        self.args = list(args)
+
+    def benchmark(self, path, pages, repeat, env):
+        runs = []
+        peak = 0
+        for _ in range(repeat):
+            with TemporaryFile() as log:
+                started = time.perf_counter()
+                proc = subprocess.Popen(
+                    [sys.executable, os.path.join(REPO_DIR, self.script), path] + self.args,
+                    stdout=subprocess.PIPE, stderr=log, env=env, cwd=os.path.dirname(os.path.join(REPO_DIR, self.script))
+                )
+                lines = [(time.perf_counter() - started, line) for line in proc.stdout]
+                proc.stdout.close()
+                code, rss = reap(proc)
+                wall = time.perf_counter() - started
+                if code != 0:
+                    raise RuntimeError(f"{self.script} exited with {code}:\n{log_tail(log)}")
+                traced = trace_stages(read_log(log))
+            peak = max(peak, rss)
+            texts, stages, first_page = self.parse(lines)
+            runs.append({
+                'wall_ms': wall * 1000,
+                'first_page_ms': None if first_page is None else first_page * 1000,
+                'stages': traced or stages,
+                'texts': texts,
+            })
+        return runs, peak, None
+
+
+def parse_pages(lines):
+    """
+    Page records of a script's --format ndjson output
+    """
+    texts = []
+    stages = {}
+    first_page = None
+    for seconds, line in lines:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if record.get('type') == 'page':
+            if first_page is None:
+                first_page = seconds
+            texts.append(record.get('text', ''))
+            add_stages(stages, record.get('timings'))
+    return texts, stages, first_page
+
+
+class ServerTarget(Target):
+    """
+    An HTTP server started once per document. ``request`` sends one PDF to
+    it and returns (page texts, stage timings, seconds to the first page).
+    Without stage timings in the response, they are taken from the TRACE
+    line the server logs for the request.
+    """
+
+    def __init__(self, name, argv, cwd, requires, request, ready_path=None, env=None):
+        super().__init__(name)
+        self.argv = argv
+        self.cwd = cwd
+        self.requires = requires
+        self.request = request
+        self.ready_path = ready_path
+        self.env = env or {}
+
+    def wait_ready(self, proc, port, timeout, log):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if proc.poll() is not None:
+                raise RuntimeError(f"{self.name} server exited with {proc.returncode}:\n{log_tail(log)}")
+            try:
+                if self.ready_path is None:
+                    socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                else:
+                    urllib.request.urlopen(f'http://127.0.0.1:{port}{self.ready_path}', timeout=5).close()
+                return
+            except OSError:
+                time.sleep(0.2)
+        raise RuntimeError(f"{self.name} server did not start within {timeout} s:\n{log_tail(log)}")
+
+    def wait_trace(self, log, offset, timeout=5):
+        """
+        Stage timings of the TRACE line logged after ``offset``; a streamed
+        response can end just before the server logs it
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            stages = trace_stages(read_log(log, offset))
+            if stages or time.monotonic() > deadline:
+                return stages
+            time.sleep(0.05)
+
+    def benchmark(self, path, pages, repeat, env, startup_timeout=600):
+        port = free_port()
+        env = dict(env, PORT=str(port), **self.env)
+        runs = []
+        with TemporaryFile() as log:
+            started = time.perf_counter()
+            proc = subprocess.Popen(
+                [sys.executable] + [arg.format(port=port) for arg in self.argv],
+                stdout=log, stderr=subprocess.STDOUT, env=env, cwd=self.cwd
+            )
+            try:
+                self.wait_ready(proc, port, startup_timeout, log)
+                startup = time.perf_counter() - started
+                for _ in range(repeat):
+                    logged = log_size(log)
+                    started = time.perf_counter()
+                    try:
+                        texts, stages, first_page = self.request(f'http://127.0.0.1:{port}', path)
+                    except urllib.error.HTTPError as e:
+                        raise RuntimeError(f"{e}: {e.read().decode('utf-8', errors='replace')[:500]}")
+                    wall = time.perf_counter() - started
+                    if not stages:
+                        stages = self.wait_trace(log, logged)
+                    runs.append({
+                        'wall_ms': wall * 1000,
+                        'first_page_ms': None if first_page is None else first_page * 1000,
+                        'stages': stages,
+                        'texts': texts,
+                    })
+            finally:
+                if proc.poll() is None:
+                    proc.send_signal(signal.SIGINT)
+                _, peak = reap(proc, timeout=15)
+        return runs, peak, startup * 1000
+
+
+def request_doctr(url, path):
+    body, content_type = multipart_body(path)
+    request = urllib.request.Request(
+        f'{url}/process_document/stream?format=ndjson&geometry=none', data=body,
+        headers={'Content-Type': content_type}
+    )
+    started = time.perf_counter()
+    texts = []
+    first_page = None
+    with urllib.request.urlopen(request) as response:
+        for line in response:
+            record = json.loads(line)
+            if record.get('type') == 'page':
+                if first_page is None:
+                    first_page = time.perf_counter() - started
+                texts.append(record.get('text', ''))
+            elif record.get('type') == 'error':
+                raise RuntimeError(record.get('detail'))
+    return texts, {}, first_page
+
+
+def request_service(engine):
+    def request(url, path):
+        body, content_type = multipart_body(path)
+        request = urllib.request.Request(
+            f'{url}/ocr?engine={engine}&geometry=none', data=body, headers={'Content-Type': content_type}
+        )
+        with urllib.request.urlopen(request) as response:
+            result = json.load(response)
+        stages = {}
+        add_stages(stages, result.get('timings'))
+        return [page['text'] for page in result['pages']], stages, None
+    return request
+
+
+def request_api(url, path):
+    with open(path, 'rb') as f:
+        request = urllib.request.Request(url, data=f.read(), headers={'Content-Type': 'application/pdf'})
+    with urllib.request.urlopen(request) as response:
+        result = json.load(response)
+    if not result.get('success'):
+        raise RuntimeError(result.get('error'))
+    stages = {}
+    add_stages(stages, result.get('timings'))
+    return [result['text']], stages, None
+
+
+def serve_api(port):
+    """
+    Serve api/ocr/process.py's handler the way the serverless runtime does,
+    one request at a time
+    """
+    from http.server import HTTPServer
+    sys.path.insert(0, os.path.join(REPO_DIR, 'api', 'ocr'))
+    from process import handler
+    HTTPServer(('127.0.0.1', port), handler).serve_forever()
+
+
+def service_target(engine, requires):
+    return ServerTarget(
+        f'service-{engine}', ['-m', 'ocr_service.app'], PARSERS_DIR, requires, request_service(engine),
+        ready_path='/status'
+    )
+
+
+TARGETS = {
+    target.name: target for target in (
+        CommandTarget('paddle', 'src/parsers/PaddleOCR/paddle_ocr.py', 'paddleocr', parse_pages,
+                      args=['--format', 'ndjson']),
+        CommandTarget('easyocr', 'src/parsers/EasyOCR/run_easyocr.py', 'easyocr', parse_pages,
+                      args=['--format', 'ndjson']),
+        ServerTarget('doctr', ['server.py'], os.path.join(PARSERS_DIR, 'DocTR'), 'doctr', request_doctr,
+                     ready_path='/status'),
+        service_target('paddle', 'paddleocr'),
+        service_target('easyocr', 'easyocr'),
+        service_target('doctr', 'doctr'),
+        ServerTarget('api-paddle', [os.path.abspath(__file__), 'serve-api', '{port}'], REPO_DIR, 'paddleocr',
+                     request_api),
+    )
+}
+
+
+def document_result(target, document, runs, peak, startup):
+    """
+    Summary of a target's runs on one document
+    """
+    truth = '\n'.join(document['truth'])
+    accuracy = [char_accuracy(truth, '\n'.join(run.pop('texts'))) for run in runs]
+    wall = median([run['wall_ms'] for run in runs])
+    stages = {}
+    for name in sorted({name for run in runs for name in run['stages']}):
+        stages[name] = median([run['stages'].get(name) for run in runs])
+    return {
+        'target': target.name,
+        'document': document['name'],
+        'pages': document['pages'],
+        'dpi': document['dpi'],
+        'noise': document['noise'],
+        'startup_ms': startup,
+        'wall_ms': wall,
+        'first_page_ms': median([run['first_page_ms'] for run in runs]),
+        'stages': stages,
+        'pages_per_sec': document['pages'] / (wall / 1000) if wall else None,
+        'peak_rss_mb': peak / (1024 * 1024),
+        'char_accuracy': median(accuracy),
+        'runs': runs,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(args):
+    manifest = load_corpus(args.corpus)
+    if manifest.get('version') != CORPUS_VERSION:
+        print(f"WARNING: corpus version {manifest.get('version')} differs from the generator's "
+              f"{CORPUS_VERSION}; regenerate it for comparable results", file=sys.stderr)
+    documents = [
+        document for document in manifest['documents']
+        if not args.documents or any(pattern in document['name'] for pattern in args.documents)
+    ]
+
+    overrides = dict(item.split('=', 1) for item in args.env)
+    env = dict(os.environ, OCR_CACHE='0', OCR_TRACE='1', PYTHONUNBUFFERED='1', **overrides)
+    if not args.gpu:
+        env['CUDA_VISIBLE_DEVICES'] = ''
+
+    results = []
+    skipped = {}
+    for name in args.targets:
+        target = TARGETS[name]
+        reason = target.missing()
+        if reason:
+            print(f"Skipping {name}: {reason}", file=sys.stderr)
+            skipped[name] = reason
+            continue
+        for document in documents:
+            path = os.path.join(args.corpus, document['file'])
+            print(f"{name}: {document['name']}", file=sys.stderr)
+            try:
+                runs, peak, startup = target.benchmark(path, document['pages'], args.repeat, env)
+            except Exception as e:
+                print(f"ERROR: {name} on {document['name']}: {e}", file=sys.stderr)
+                results.append({'target': name, 'document': document['name'], 'error': str(e)})
+                continue
+            result = document_result(target, document, runs, peak, startup)
+            results.append(result)
+            print(f"  {result['wall_ms']:.0f} ms, {result['pages_per_sec']:.2f} pages/s, "
+                  f"{result['peak_rss_mb']:.0f} MB, accuracy {result['char_accuracy']:.3f}", file=sys.stderr)
+
+    return {
+        'version': RESULTS_VERSION,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'commit': git_commit(),
+        'machine': {
+            'platform': platform.platform(),
+            'python': platform.python_version(),
+            'cpus': os.cpu_count(),
+            'gpu': args.gpu,
+        },
+        'packages': {package: package_version(package) for package in PACKAGES},
+        'settings': {'repeat': args.repeat, 'env': overrides},
+        'corpus': {
+            'path': os.path.abspath(args.corpus),
+            'version': manifest.get('version'),
+            'seed': manifest.get('seed'),
+            'fingerprint': corpus_fingerprint(manifest),
+        },
+        'skipped': skipped,
+        'results': results,
+    }
+
+
+def print_results(report):
+    print(f"{'target':<16} {'document':<26} {'wall ms':>9} {'1st page':>9} {'pages/s':>8} "
+          f"{'RSS MB':>7} {'accuracy':>8}")
+    for result in report['results']:
+        if 'error' in result:
+            print(f"{result['target']:<16} {result['document']:<26} error: {result['error'].splitlines()[0]}")
+            continue
+        first_page = result['first_page_ms']
+        print(f"{result['target']:<16} {result['document']:<26} {result['wall_ms']:>9.0f} "
+              f"{'-' if first_page is None else f'{first_page:.0f}':>9} {result['pages_per_sec']:>8.2f} "
+              f"{result['peak_rss_mb']:>7.0f} {result['char_accuracy']:>8.3f}")
+
+
+# (field, label, whether higher is better)
+COMPARED = (
+    ('wall_ms', 'wall ms', False),
+    ('first_page_ms', '1st page ms', False),
+    ('pages_per_sec', 'pages/s', True),
+    ('peak_rss_mb', 'RSS MB', False),
+)
+
+
+def compare_results(base, new, threshold, accuracy_drop):
+    """
+    Print the change of every metric between two result files; returns the
+    regressions: timings or memory worse by more than ``threshold``
+    (relative) and accuracy lower by more than ``accuracy_drop``
+    """
+    if base['corpus']['fingerprint'] != new['corpus']['fingerprint']:
+        print("WARNING: the results are for different corpora", file=sys.stderr)
+    if base['settings'] != new['settings']:
+        print(f"NOTE: settings differ: {base['settings']} -> {new['settings']}", file=sys.stderr)
+
+    index = {(result['target'], result['document']): result for result in base['results'] if 'error' not in result}
+    regressions = []
+    print(f"{'target':<16} {'document':<26} {'metric':<12} {'base':>10} {'new':>10} {'change':>8}")
+    for result in new['results']:
+        key = (result['target'], result['document'])
+        old = index.get(key)
+        if old is None or 'error' in result:
+            continue
+        for field, label, higher_is_better in COMPARED:
+            before, after = old.get(field), result.get(field)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            worse = -change if higher_is_better else change
+            flag = ''
+            if worse > threshold:
+                regressions.append((key, label, before, after))
+                flag = ' !'
+            print(f"{key[0]:<16} {key[1]:<26} {label:<12} {before:>10.1f} {after:>10.1f} {change:>+8.1%}{flag}")
+        before, after = old['char_accuracy'], result['char_accuracy']
+        flag = ''
+        if before - after > accuracy_drop:
+            regressions.append((key, 'accuracy', before, after))
+            flag = ' !'
+        print(f"{key[0]:<16} {key[1]:<26} {'accuracy':<12} {before:>10.3f} {after:>10.3f} "
+              f"{after - before:>+8.3f}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help="Benchmark targets on a corpus")
+    run.add_argument('corpus', help="Directory written by corpus.py")
+    run.add_argument('--targets', nargs='+', choices=list(TARGETS), default=list(TARGETS))
+    run.add_argument('--documents', nargs='+', help="Only documents whose name contains one of these")
+    run.add_argument('--repeat', type=int, default=3, help="Runs per document; medians are reported")
+    run.add_argument('--env', action='append', default=[], metavar='KEY=VALUE',
+                     help="Setting for the targets, e.g. OCR_ZOOM=auto (repeatable)")
+    run.add_argument('--gpu', action='store_true', help="Let the targets use a GPU")
+    run.add_argument('--output', help="Write the results as JSON to this file")
+
+    compare = commands.add_parser('compare', help="Compare two result files")
+    compare.add_argument('base')
+    compare.add_argument('new')
+    compare.add_argument('--threshold', type=float, default=0.10,
+                         help="Relative change of a timing or memory figure that counts as a regression")
+    compare.add_argument('--accuracy-drop', type=float, default=0.005,
+                         help="Drop in character accuracy that counts as a regression")
+
+    serve = commands.add_parser('serve-api')
+    serve.add_argument('port', type=int)
+
+    args = parser.parse_args()
+
+    if args.command == 'serve-api':
+        serve_api(args.port)
+    elif args.command == 'run':
+        for item in args.env:
+            if not re.match(r'^\w+=', item):
+                parser.error(f"--env expects KEY=VALUE, got {item!r}")
+        report = run_benchmarks(args)
+        print_results(report)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(report, f, indent=2)
+    else:
+        with open(args.base) as f:
+            base = json.load(f)
+        with open(args.new) as f:
+            new = json.load(f)
+        regressions = compare_results(base, new, args.threshold, args.accuracy_drop)
+        if regressions:
+            print(f"\n{len(regressions)} regressions")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
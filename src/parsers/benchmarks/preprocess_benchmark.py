@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark: page preprocessing of ocr_common.preprocess against the
+RGB render and copies paddle_ocr.py made before it
+
+Pages are synthetic lab reports from benchmarks/corpus.py, tilted a little
+so deskew has work to do. "legacy" renders RGB, converts to gray and
+thresholds into a new array for every page. The other rows render straight
+to grayscale and run the given steps in the Preprocessor's reused buffers.
+
+Times are per page (the fastest of ``--repeat`` passes over the document).
+"page MB" is the most memory a page allocates at once while it is rendered
+and preprocessed, as tracemalloc sees it (NumPy arrays, rendered samples),
+once the first page has been processed. "kept MB" is the Preprocessor's
+work buffers, allocated on the first page and reused by every later one.
+
+    python src/parsers/benchmarks/preprocess_benchmark.py [--dpi 150 300] [--pages 5] [--steps otsu denoise,deskew,otsu]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tracemalloc
+
+import cv2
+import fitz
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.corpus import PAGE_WIDTH, PAGE_HEIGHT, draw_page, header_lines, report_rows, add_noise
+from ocr_common.render import render_page, pixmap_to_array
+from ocr_common.preprocess import Preprocessor
+
+
+def scanned_document(pages, noise='light', seed=0):
+    """
+    Image-only report of ``pages`` pages with scan noise and skew
+    """
+    rng = random.Random(seed)
+    source = fitz.open()
+    out = fitz.open()
+    try:
+        for page_num in range(pages):
+            page = source.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+            draw_page(page, header_lines(rng, 0, page_num, pages), report_rows(rng, 30))
+            pix = page.get_pixmap(dpi=300, colorspace=fitz.csGRAY)
+            gray = add_noise(pixmap_to_array(pix)[:, :, 0].copy(), noise, rng)
+            ok, data = cv2.imencode('.png', gray)
+            scanned = out.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+            scanned.insert_image(scanned.rect, stream=data.tobytes())
+        return fitz.open('pdf', out.tobytes())
+    finally:
+        out.close()
+        source.close()
+
+
+def legacy_page(doc, page_num, zoom):
+    """
+    simple_preprocess as it was: RGB render, gray copy, binary copy
+    """
+    started = time.perf_counter()
+    image = render_page(doc, page_num, zoom)
+    rendered = time.perf_counter()
+    gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return binary, {'render': rendered - started, 'preprocess': time.perf_counter() - rendered}, 0
+
+
+def preprocessor_page(preprocessor):
+    def run(doc, page_num, zoom):
+        started = time.perf_counter()
+        image = render_page(doc, page_num, zoom, gray=True)
+        rendered = time.perf_counter()
+        processed, report = preprocessor.process(image, page_num)
+        timings = {'render': rendered - started, 'preprocess': time.perf_counter() - rendered}
+        timings.update((step, ms / 1000) for step, ms in report['steps'].items())
+        return processed, timings, report['peak_bytes'] - image.nbytes
+    return run
+
+
+def measure(func, doc, zoom, repeat):
+    """
+    Best per-page timings over ``repeat`` passes, the peak allocation of a
+    warm page and the bytes kept between pages
+    """
+    # Warm up (buffers, caches), then measure memory on a warm page
+    func(doc, 0, zoom)
+    tracemalloc.start()
+    _, _, kept = func(doc, 0, zoom)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    best = {}
+    for _ in range(repeat):
+        totals = {}
+        for page_num in range(len(doc)):
+            _, timings, _ = func(doc, page_num, zoom)
+            for stage, seconds in timings.items():
+                totals[stage] = totals.get(stage, 0.0) + seconds
+        for stage, seconds in totals.items():
+            best[stage] = min(best.get(stage, float('inf')), seconds / len(doc) * 1000)
+    return best, peak, kept
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--dpi', type=int, nargs='+', default=[150, 300], help="Render resolutions")
+    parser.add_argument('--pages', type=int, default=5, help="Pages in the document")
+    parser.add_argument('--steps', nargs='+', default=['otsu', 'denoise,deskew,otsu', 'adaptive'],
+                        help="Preprocessor step lists to compare with the legacy path")
+    parser.add_argument('--repeat', type=int, default=3, help="Passes; the fastest is reported")
+    args = parser.parse_args()
+
+    doc = scanned_document(args.pages)
+    print(f"{'dpi':>5} {'pipeline':>20} {'render ms':>10} {'prep ms':>8} {'page MB':>8} {'kept MB':>8}  steps (ms)")
+    for dpi in args.dpi:
+        runs = [('legacy', legacy_page)] + [(steps, preprocessor_page(Preprocessor(steps))) for steps in args.steps]
+        for name, func in runs:
+            best, peak, kept = measure(func, doc, dpi / 72, args.repeat)
+            steps = ' '.join(f'{stage} {ms:.1f}' for stage, ms in best.items() if stage not in ('render', 'preprocess'))
+            print(f"{dpi:>5} {name:>20} {best['render']:>10.1f} {best['preprocess']:>8.1f} "
+                  f"{peak / 2 ** 20:>8.1f} {kept / 2 ** 20:>8.1f}  {steps}")
+    doc.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,6 @@
+"""
+Shared helpers for the Python OCR scripts (PaddleOCR, EasyOCR, DocTR).
+
+The scripts are run directly (``python paddle_ocr.py ...``), so each one puts
+``src/parsers`` on ``sys.path`` before importing from this package.
+"""
@@ -0,0 +1,72 @@
+"""
+Merging OCR detections by box overlap
+
+Detections are (box, text, confidence) tuples as returned by EasyOCR's
+readtext, where box is a list of four [x, y] corner points.
+"""
+
+from . import layout
+
+LOW_CONFIDENCE = 0.5
+MERGE_IOU = 0.3
+
+
+def box_rect(box):
+    """
+    Axis-aligned (x0, y0, x1, y1) bounds of a four-point box
+    """
+    xs = [point[0] for point in box]
+    ys = [point[1] for point in box]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def iou(a, b):
+    """
+    Intersection over union of two (x0, y0, x1, y1) rectangles
+    """
+    width = min(a[2], b[2]) - max(a[0], b[0])
+    height = min(a[3], b[3]) - max(a[1], b[1])
+    if width <= 0 or height <= 0:
+        return 0.0
+    intersection = width * height
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - intersection
+    return intersection / union if union > 0 else 0.0
+
+
+def merge_detections(primary, secondary, threshold=MERGE_IOU):
+    """
+    Merge two passes over the same page. A secondary detection overlapping
+    a primary one replaces it only if it is more confident; one that
+    overlaps nothing is added. Each region therefore appears once.
+    """
+    merged = list(primary)
+    rects = [box_rect(detection[0]) for detection in merged]
+
+    for detection in secondary:
+        rect = box_rect(detection[0])
+        best, best_iou = None, 0.0
+        for index, other in enumerate(rects):
+            overlap = iou(rect, other)
+            if overlap > best_iou:
+                best, best_iou = index, overlap
+
+        if best is None or best_iou < threshold:
+            merged.append(detection)
+            rects.append(rect)
+        elif detection[2] > merged[best][2]:
+            merged[best] = detection
+            rects[best] = rect
+
+    return reading_order(merged)
+
+
+def reading_order(detections):
+    """
+    Sort detections into lines top to bottom (layout.assign_lines), left to
+    right within a line
+    """
+    if not detections:
+        return []
+
+    rects = [box_rect(detection[0]) for detection in detections]
+    return [detections[i] for i in layout.reading_order(rects, layout.assign_lines(rects)).tolist()]
@@ -0,0 +1,206 @@
+"""
+On-disk OCR result cache keyed by document content hash
+
+Entries live in a single SQLite file shared by every engine. Keys combine
+the document's SHA-256 with the engine name, engine version and the
+settings that affect the output, so a change to any of them is a miss.
+The file is kept under a size budget by evicting least recently used
+entries.
+"""
+
+import os
+import sys
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import threading
+
+CACHE_ENABLED = os.environ.get('OCR_CACHE', '1').lower() not in ('0', 'false', 'off')
+DEFAULT_CACHE_PATH = os.environ.get(
+    'OCR_CACHE_PATH',
+    os.path.join(os.path.expanduser('~'), '.cache', 'health-tracker', 'ocr_cache.sqlite3')
+)
+DEFAULT_MAX_BYTES = int(float(os.environ.get('OCR_CACHE_MAX_MB', 256)) * 1024 * 1024)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+def hash_bytes(data):
+    """
+    SHA-256 of in-memory document bytes
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_array(array):
+    """
+    SHA-256 of a rendered page (numpy array), including its shape
+    """
+    if not array.flags['C_CONTIGUOUS']:
+        array = array.copy()
+    digest = hashlib.sha256(repr((array.shape, str(array.dtype))).encode('utf-8'))
+    digest.update(memoryview(array).cast('B'))
+    return digest.hexdigest()
+
+
+def hash_file(path, chunk_size=1 << 20):
+    """
+    SHA-256 of a file, read in chunks
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def package_version(name):
+    """
+    Installed version of a package, read from its metadata so the (slow to
+    import) engine itself doesn't have to be loaded on a cache hit
+    """
+    try:
+        from importlib.metadata import version, PackageNotFoundError
+    except ImportError:
+        return 'unknown'
+    try:
+        return version(name)
+    except PackageNotFoundError:
+        return 'unknown'
+
+
+def make_key(content_hash, engine, version, settings=None):
+    """
+    Cache key for one document processed by one engine configuration
+    """
+    payload = json.dumps({
+        'content': content_hash,
+        'engine': engine,
+        'version': str(version),
+        'settings': settings or {},
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class OCRCache:
+    """
+    SQLite-backed key/value store for JSON-serializable OCR results with
+    size-based LRU eviction and persistent hit/miss counters.
+
+    Safe to share between threads; several processes may also use the same
+    file. Storage errors are reported on stderr and treated as misses so a
+    broken cache never fails an OCR request.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(_SCHEMA)
+
+    def get(self, key):
+        """
+        Return the cached value for ``key`` or None
+        """
+        try:
+            with self._lock:
+                row = self._conn.execute('SELECT value FROM entries WHERE key = ?', (key,)).fetchone()
+                if row is None:
+                    self._count('misses')
+                    return None
+                self._conn.execute('UPDATE entries SET accessed = ? WHERE key = ?', (time.time(), key))
+                self._count('hits')
+            return json.loads(zlib.decompress(row[0]).decode('utf-8'))
+        except (sqlite3.Error, zlib.error, ValueError) as e:
+            print(f"WARNING: OCR cache read failed: {e}", file=sys.stderr)
+            return None
+
+    def put(self, key, value):
+        """
+        Store a JSON-serializable value and evict old entries past the budget
+        """
+        blob = zlib.compress(json.dumps(value).encode('utf-8'))
+        try:
+            with self._lock:
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO entries (key, value, size, accessed) VALUES (?, ?, ?, ?)',
+                    (key, blob, len(blob), time.time())
+                )
+                self._evict()
+        except sqlite3.Error as e:
+            print(f"WARNING: OCR cache write failed: {e}", file=sys.stderr)
+
+    def stats(self):
+        """
+        Hit/miss counters and current size
+        """
+        with self._lock:
+            counters = dict(self._conn.execute('SELECT name, value FROM counters').fetchall())
+            entries, size = self._conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries').fetchone()
+        return {
+            'hits': counters.get('hits', 0),
+            'misses': counters.get('misses', 0),
+            'entries': entries,
+            'bytes': size,
+            'max_bytes': self.max_bytes,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _count(self, name):
+        self._conn.execute(
+            'INSERT INTO counters (name, value) VALUES (?, 1) '
+            'ON CONFLICT(name) DO UPDATE SET value = value + 1',
+            (name,)
+        )
+
+    def _evict(self):
+        total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        while total > self.max_bytes:
+            oldest = self._conn.execute(
+                'SELECT key, size FROM entries ORDER BY accessed LIMIT 64'
+            ).fetchall()
+            if not oldest:
+                break
+            for key, size in oldest:
+                self._conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+                total -= size
+                if total <= self.max_bytes:
+                    break
+
+
+def open_cache():
+    """
+    Open the shared cache, or return None when it is disabled (OCR_CACHE=0)
+    or can't be opened
+    """
+    if not CACHE_ENABLED:
+        return None
+    try:
+        return OCRCache()
+    except (sqlite3.Error, OSError) as e:
+        print(f"WARNING: OCR cache unavailable: {e}", file=sys.stderr)
+        return None
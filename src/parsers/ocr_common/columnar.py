@@ -0,0 +1,240 @@
+"""
+Columnar word results
+
+A dense page has hundreds of words, and a dict with nested box lists per
+word is slow to build and to serialize. WordTable keeps a document's words
+as parallel NumPy arrays (corner points, confidence, page index) plus one
+UTF-8 text buffer with offsets. The per-word dict shapes the scripts and
+the DocTR server have always returned are produced from it as views, and
+the columns themselves serialize to JSON as a few flat arrays.
+"""
+
+import numpy as np
+
+# Word box forms: "quad" four [x, y] corner points (EasyOCR's bbox), "rect"
+# [[x0, y0], [x1, y1]] (DocTR's geometry), "flat" [x0, y0, x1, y1]
+BOX_FORMS = ('quad', 'rect', 'flat')
+
+
+class WordTable:
+    """
+    Words of one or more pages as parallel arrays:
+
+    - ``quads``: (N, 4, 2) float64 corner points, clockwise from top left
+    - ``confidence``: (N,) float64
+    - ``page``: (N,) int32 page index
+    - ``text``: UTF-8 bytes of all words; word i is
+      ``text[offsets[i]:offsets[i + 1]]``
+    """
+
+    __slots__ = ('quads', 'confidence', 'page', 'text', 'offsets')
+
+    def __init__(self, quads, confidence, page, text, offsets):
+        self.quads = quads
+        self.confidence = confidence
+        self.page = page
+        self.text = text
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.confidence)
+
+    @classmethod
+    def empty(cls):
+        return cls(
+            np.zeros((0, 4, 2), dtype=np.float64),
+            np.zeros(0, dtype=np.float64),
+            np.zeros(0, dtype=np.int32),
+            b'',
+            np.zeros(1, dtype=np.int64),
+        )
+
+    @classmethod
+    def from_words(cls, texts, confidences, quads, page=0):
+        """
+        Table for one page from a list of word strings, their confidences
+        and their (N, 4, 2) corner points
+        """
+        encoded = [text.encode('utf-8') for text in texts]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(text) for text in encoded], out=offsets[1:])
+        return cls(
+            np.asarray(quads, dtype=np.float64).reshape(len(encoded), 4, 2),
+            np.asarray(confidences, dtype=np.float64),
+            np.full(len(encoded), page, dtype=np.int32),
+            b''.join(encoded),
+            offsets,
+        )
+
+    @classmethod
+    def from_rects(cls, texts, confidences, rects, page=0):
+        """
+        Table for one page from (N, 4) x0, y0, x1, y1 rectangles
+        """
+        rects = np.asarray(rects, dtype=np.float64).reshape(-1, 4)
+        x0, y0, x1, y1 = rects.T
+        quads = np.stack([x0, y0, x1, y0, x1, y1, x0, y1], axis=1)
+        return cls.from_words(texts, confidences, quads, page)
+
+    @classmethod
+    def from_detections(cls, detections, page=0):
+        """
+        Table for one page from EasyOCR-style (box, text, confidence) tuples
+        """
+        return cls.from_words(
+            [text for _, text, _ in detections],
+            [confidence for _, _, confidence in detections],
+            [box for box, _, _ in detections],
+            page,
+        )
+
+    @classmethod
+    def concat(cls, tables):
+        """
+        One table holding the words of ``tables`` in order
+        """
+        tables = [table for table in tables if len(table)]
+        if not tables:
+            return cls.empty()
+        if len(tables) == 1:
+            return tables[0]
+
+        starts = np.cumsum([0] + [len(table.text) for table in tables[:-1]])
+        offsets = np.concatenate(
+            [table.offsets[:-1] + start for table, start in zip(tables, starts)]
+            + [[starts[-1] + len(tables[-1].text)]]
+        ).astype(np.int64)
+        return cls(
+            np.concatenate([table.quads for table in tables]),
+            np.concatenate([table.confidence for table in tables]),
+            np.concatenate([table.page for table in tables]),
+            b''.join(table.text for table in tables),
+            offsets,
+        )
+
+    def with_page(self, page):
+        """
+        The same words assigned to page ``page``
+        """
+        return self.with_page_array(np.full(len(self), page, dtype=np.int32))
+
+    def with_page_array(self, page):
+        """
+        The same words with per-word page indexes ``page``
+        """
+        return WordTable(self.quads, self.confidence, np.asarray(page, dtype=np.int32),
+                         self.text, self.offsets)
+
+    def scaled(self, x, y):
+        """
+        The same words with x coordinates multiplied by ``x`` and y by ``y``
+        """
+        return WordTable(self.quads * (x, y), self.confidence, self.page, self.text, self.offsets)
+
+    def select(self, mask):
+        """
+        Table of the words where the boolean ``mask`` is set
+        """
+        indexes = np.flatnonzero(mask)
+        texts = self.texts()
+        return WordTable.from_words(
+            [texts[i] for i in indexes], self.confidence[indexes], self.quads[indexes]
+        ).with_page_array(self.page[indexes])
+
+    def pages(self, count):
+        """
+        Split into one table per page index, for ``count`` pages
+        """
+        return [self.select(self.page == index) for index in range(count)]
+
+    def texts(self):
+        """
+        Word strings as a list
+        """
+        text, offsets = self.text, self.offsets.tolist()
+        return [text[start:end].decode('utf-8') for start, end in zip(offsets, offsets[1:])]
+
+    def mean_confidence(self):
+        return float(self.confidence.mean()) if len(self) else 0.0
+
+    def rects(self):
+        """
+        (N, 4) x0, y0, x1, y1 bounds of the words
+        """
+        return np.concatenate([self.quads.min(axis=1), self.quads.max(axis=1)], axis=1)
+
+    def boxes(self, form='quad', scale=None, decimals=None):
+        """
+        Word boxes as nested lists in one of BOX_FORMS. With ``scale`` the
+        coordinates are multiplied and rounded to integers, otherwise
+        optionally rounded to ``decimals``.
+        """
+        if form == 'quad':
+            values = self.quads
+        elif form == 'rect':
+            values = self.rects().reshape(-1, 2, 2)
+        elif form == 'flat':
+            values = self.rects()
+        else:
+            raise ValueError(f"Unknown box form: {form}")
+
+        if scale is not None:
+            return np.rint(values * scale).astype(np.int64).tolist()
+        if decimals is not None:
+            values = values.round(decimals)
+        return values.tolist()
+
+    def records(self, box_key='box', form='rect', page=False, scale=None, decimals=None):
+        """
+        Per-word dicts (text, confidence, box and optionally page), the
+        shape the scripts have always returned. ``box_key`` None leaves the
+        box out.
+        """
+        texts = self.texts()
+        confidence = self.confidence
+        if decimals is not None:
+            confidence = confidence.round(decimals)
+        confidence = confidence.tolist()
+
+        if box_key is None:
+            words = [{'text': text, 'confidence': conf} for text, conf in zip(texts, confidence)]
+        else:
+            boxes = self.boxes(form, scale, decimals)
+            words = [
+                {'text': text, 'confidence': conf, box_key: box}
+                for text, conf, box in zip(texts, confidence, boxes)
+            ]
+        if page:
+            for word, index in zip(words, self.page.tolist()):
+                word['page'] = index
+        return words
+
+    def columns(self, form='flat', scale=None, decimals=None):
+        """
+        JSON-ready array-of-arrays form: one list per field. ``form`` None
+        leaves the boxes out.
+        """
+        confidence = self.confidence
+        if decimals is not None:
+            confidence = confidence.round(decimals)
+        result = {
+            'text': self.texts(),
+            'confidence': confidence.tolist(),
+            'page': self.page.tolist(),
+        }
+        if form is not None:
+            result['box'] = self.boxes(form, scale, decimals)
+        return result
+
+    @classmethod
+    def from_columns(cls, columns):
+        """
+        Rebuild a table from ``columns()`` output with quad or flat boxes
+        """
+        boxes = np.asarray(columns['box'], dtype=np.float64)
+        table = (
+            cls.from_words(columns['text'], columns['confidence'], boxes)
+            if boxes.ndim == 3 and boxes.shape[1:] == (4, 2)
+            else cls.from_rects(columns['text'], columns['confidence'], boxes)
+        )
+        return table.with_page_array(columns['page'])
@@ -0,0 +1,46 @@
+"""
+Log levels for the OCR scripts and servers
+
+Diagnostic output (per-page detection dumps, text previews) is logged at
+DEBUG through the ``ocr`` logger namespace. At the default level those
+calls return before formatting anything, and callers guard output that is
+costly to compute with ``logger.isEnabledFor(logging.DEBUG)``, so none of
+it is built in production.
+
+OCR_LOG_LEVEL sets the level (DEBUG, INFO, WARNING, ...); each -v on a
+script's command line lowers it one step. Third-party loggers (Paddle,
+PIL, ...) stay at the root logger's level.
+"""
+
+import os
+import sys
+import logging
+
+LOG_LEVEL_SETTING = 'OCR_LOG_LEVEL'
+
+
+def log_level(default='WARNING', verbose=0):
+    """
+    The level named by OCR_LOG_LEVEL (or ``default``), lowered by one step
+    per ``verbose``
+    """
+    name = os.environ.get(LOG_LEVEL_SETTING, '').strip().upper() or default
+    level = logging.getLevelName(name)
+    if not isinstance(level, int):
+        raise ValueError(f"Unknown {LOG_LEVEL_SETTING}: {name}")
+    return max(level - 10 * verbose, logging.DEBUG)
+
+
+def setup_logging(default='WARNING', verbose=0, logger='ocr'):
+    """
+    Send log records to stderr as ``LEVEL: message`` lines and set the level
+    of ``logger`` (and the loggers below it). Returns the level.
+
+    The level is written back to OCR_LOG_LEVEL so that child processes
+    (page pool workers) log at the same level.
+    """
+    level = log_level(default, verbose)
+    logging.basicConfig(level=logging.WARNING, format='%(levelname)s: %(message)s', stream=sys.stderr)
+    logging.getLogger(logger).setLevel(level)
+    os.environ[LOG_LEVEL_SETTING] = logging.getLevelName(level)
+    return level
@@ -0,0 +1,140 @@
+"""
+Page-parallel OCR across a pool of worker processes (CPU-only hosts)
+"""
+
+import os
+import time
+import queue
+import multiprocessing
+from contextlib import contextmanager
+
+# Worker processes for page-parallel OCR; 0 or 1 keeps the single-process path
+DEFAULT_WORKERS = int(os.environ.get('OCR_WORKERS', 0))
+
+# Native thread count per worker; 0 splits the CPU cores evenly between workers
+DEFAULT_THREADS_PER_WORKER = int(os.environ.get('OCR_THREADS_PER_WORKER', 0))
+
+# Seconds to wait for every worker to load its model (a first run may
+# download it)
+DEFAULT_START_TIMEOUT = float(os.environ.get('OCR_WORKER_START_TIMEOUT', 300))
+
+# Thread-pool knobs read by OpenMP, the BLAS backends and numexpr at import time
+THREAD_ENV_VARS = (
+    'OMP_NUM_THREADS',
+    'OPENBLAS_NUM_THREADS',
+    'MKL_NUM_THREADS',
+    'NUMEXPR_NUM_THREADS',
+    'VECLIB_MAXIMUM_THREADS',
+)
+
+
+def threads_per_worker(workers, threads=None):
+    """
+    Native threads each worker may use so the pool doesn't oversubscribe cores
+    """
+    if threads:
+        return threads
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+
+@contextmanager
+def limited_threads(threads):
+    """
+    Temporarily set the BLAS/OpenMP thread env vars; processes started
+    inside the block inherit them before they import any native library
+    """
+    saved = {name: os.environ.get(name) for name in THREAD_ENV_VARS}
+    try:
+        for name in THREAD_ENV_VARS:
+            os.environ[name] = str(threads)
+        yield
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def _init_worker(initializer, threads, initargs, started):
+    # Each worker reports whether it started to the parent: a Pool
+    # initializer that raises only gets the worker replaced by a new one,
+    # which fails the same way, forever
+    try:
+        try:
+            import cv2
+            cv2.setNumThreads(threads)
+        except ImportError:
+            pass
+        initializer(threads, *initargs)
+    except BaseException as e:
+        started.put(f"{type(e).__name__}: {e}")
+        raise
+    started.put(None)
+
+
+class PagePool:
+    """
+    Pool of worker processes that each load the OCR model once (through
+    ``initializer(threads, *initargs)``) and then OCR single pages.
+
+    Workers are spawned rather than forked so no model, thread or open
+    document state leaks in from the parent. The constructor waits until
+    every worker has loaded its model, and raises RuntimeError (after
+    stopping the pool) if one of them fails to, or they haven't all
+    reported within ``start_timeout`` seconds (e.g. a worker that died
+    while it was spawned or importing, which the pool silently replaces).
+    """
+
+    def __init__(self, workers, initializer, initargs=(), threads=None, start_timeout=None):
+        self.workers = workers
+        self.threads = threads_per_worker(workers, threads)
+
+        context = multiprocessing.get_context('spawn')
+        started = context.Queue()
+        with limited_threads(self.threads):
+            self._pool = context.Pool(
+                workers,
+                initializer=_init_worker,
+                initargs=(initializer, self.threads, tuple(initargs), started),
+            )
+
+        start_timeout = DEFAULT_START_TIMEOUT if start_timeout is None else start_timeout
+        deadline = time.monotonic() + start_timeout
+        try:
+            for _ in range(workers):
+                try:
+                    error = started.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    raise RuntimeError(f"OCR workers did not start within {start_timeout:g} s") from None
+                if error is not None:
+                    raise RuntimeError(f"OCR worker failed to start: {error}")
+        except BaseException:
+            self.terminate()
+            raise
+        finally:
+            started.close()
+
+    def imap(self, func, tasks):
+        """
+        Run ``func`` over ``tasks`` in the pool, yielding results in task
+        order as soon as each one (and every one before it) is done
+        """
+        return self._pool.imap(func, tasks)
+
+    def close(self):
+        self._pool.close()
+        self._pool.join()
+
+    def terminate(self):
+        self._pool.terminate()
+        self._pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.terminate()
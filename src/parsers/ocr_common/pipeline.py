@@ -0,0 +1,76 @@
+"""
+Producer/consumer helpers so page rendering overlaps with OCR
+"""
+
+import os
+import queue
+import threading
+import contextvars
+
+# How many rendered pages may wait for the OCR stage at once
+DEFAULT_PREFETCH = int(os.environ.get('OCR_PREFETCH_PAGES', 2))
+
+_DONE = object()
+
+
+class _Failure:
+    """Wraps an exception raised by the producer so the consumer can re-raise it"""
+
+    def __init__(self, error):
+        self.error = error
+
+
+def prefetch(iterable, depth=None):
+    """
+    Iterate ``iterable`` on a background thread, keeping at most ``depth``
+    items ready in a bounded queue.
+
+    The consumer gets items in the original order. Memory stays capped at
+    ``depth`` queued items plus the one being produced and the one being
+    consumed. Exceptions raised by the producer are re-raised in the
+    consumer, and abandoning the iteration stops the producer. The producer
+    runs in a copy of the caller's context, so its work (e.g. rendering)
+    is traced as part of the current request.
+    """
+    depth = DEFAULT_PREFETCH if depth is None else depth
+    items = queue.Queue(maxsize=max(1, depth))
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        iterator = iter(iterable)
+        try:
+            for item in iterator:
+                if not put(item):
+                    return
+            put(_DONE)
+        except BaseException as e:
+            put(_Failure(e))
+        finally:
+            close = getattr(iterator, 'close', None)
+            if close is not None:
+                close()
+
+    context = contextvars.copy_context()
+    thread = threading.Thread(target=context.run, args=(produce,), name='ocr-prefetch', daemon=True)
+    thread.start()
+
+    try:
+        while True:
+            item = items.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+        thread.join()
@@ -0,0 +1,210 @@
+"""
+Page image preprocessing shared by the OCR engines
+
+Pages are rendered straight to grayscale (``render_page(..., gray=True)``)
+and each step then runs in place in a work buffer that the Preprocessor
+keeps per thread and reuses from page to page. Preprocessing a page of the
+usual size allocates nothing, and the only full-page copy is the first
+step writing the read-only render into the buffer.
+
+Steps, in the order they run:
+
+- denoise: 3x3 median filter, removes scan speckle
+- deskew: rotates the page level, by the angle estimate_skew finds
+- otsu or adaptive: binarize with one global (Otsu) or a local (Gaussian
+  adaptive) threshold
+
+Each engine picks its steps; OCR_PREPROCESS_<ENGINE> (e.g.
+OCR_PREPROCESS_PADDLE=denoise,deskew,otsu, or none) overrides them. Every
+step is timed as a ``preprocess_<step>`` span, and the whole page as
+``preprocess`` with the page's peak working memory.
+"""
+
+import os
+import time
+import logging
+import threading
+
+import cv2
+import numpy as np
+
+from .trace import METRICS, record_span
+
+STEPS = ('denoise', 'deskew', 'otsu', 'adaptive')
+BINARIZE_STEPS = ('otsu', 'adaptive')
+
+# Pages skewed by more than this (degrees) are left alone: they are more
+# likely rotated on purpose or mis-detected than scanned crooked
+MAX_SKEW = float(os.environ.get('OCR_DESKEW_MAX_DEGREES', 5))
+# Smaller corrections than this are not worth resampling the page for
+MIN_SKEW = 0.1
+# Skew is estimated on the page scaled down to about this width
+SKEW_SAMPLE_WIDTH = 800
+
+ADAPTIVE_BLOCK_SIZE = 11
+ADAPTIVE_C = 2
+
+logger = logging.getLogger('ocr.preprocess')
+
+
+def parse_steps(value):
+    """
+    Steps from a comma-separated setting ('deskew,otsu'), in the order they
+    run; '' or 'none' for no preprocessing
+    """
+    names = [name.strip().lower() for name in (value or '').split(',') if name.strip()]
+    if names == ['none']:
+        return ()
+    unknown = [name for name in names if name not in STEPS]
+    if unknown:
+        raise ValueError(f"Unknown preprocessing step(s): {', '.join(unknown)}. Use: {', '.join(STEPS)}")
+    if len([name for name in names if name in BINARIZE_STEPS]) > 1:
+        raise ValueError("Choose one of otsu and adaptive")
+    return tuple(step for step in STEPS if step in names)
+
+
+def engine_steps(engine, default):
+    """
+    Preprocessing steps of ``engine``: OCR_PREPROCESS_<ENGINE> when set,
+    otherwise ``default``
+    """
+    return parse_steps(os.environ.get(f'OCR_PREPROCESS_{engine.upper()}', default))
+
+
+def to_gray(image, out=None):
+    """
+    Single-channel version of an RGB or grayscale uint8 image; a grayscale
+    image is returned as it is (a view for one-channel (h, w, 1) arrays)
+    """
+    if image.ndim == 2:
+        return image
+    if image.shape[2] == 1:
+        return image[:, :, 0]
+    return cv2.cvtColor(image, cv2.COLOR_RGB2GRAY, dst=out)
+
+
+def estimate_skew(gray, max_angle=MAX_SKEW):
+    """
+    Angle in degrees (counter-clockwise) the text lines of a grayscale page
+    are tilted by, within +-``max_angle``; 0.0 for a page without text.
+
+    Projection profile on a downscaled copy: the ink pixels' rows are
+    counted along each candidate angle, and the angle whose profile is most
+    peaked (text lines and gaps cleanly separated) wins. Coarse 0.5 degree
+    steps first, then 0.05 degree steps around the best.
+    """
+    height, width = gray.shape
+    scale = min(1.0, SKEW_SAMPLE_WIDTH / width)
+    small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1 else gray
+    _, ink = cv2.threshold(small, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    points = cv2.findNonZero(ink)
+    if points is None or len(points) < 100:
+        return 0.0
+    points = points.reshape(-1, 2)
+    x = points[:, 0].astype(np.float32) - small.shape[1] / 2
+    y = points[:, 1].astype(np.float32)
+    rows = small.shape[0] + small.shape[1]
+
+    def sharpness(angle):
+        # Row of each point once the page is rotated by ``angle``
+        shifted = y + x * np.float32(np.tan(np.radians(angle))) + small.shape[1] / 2
+        profile = np.bincount(shifted.astype(np.int32).clip(0, rows - 1), minlength=rows)
+        return float(np.dot(profile, profile))
+
+    best = max(np.arange(-max_angle, max_angle + 0.25, 0.5), key=sharpness)
+    best = max(np.arange(best - 0.5, best + 0.5 + 0.025, 0.05), key=sharpness)
+    # + 0.0 turns -0.0 into 0.0
+    return float(np.clip(best, -max_angle, max_angle)) + 0.0
+
+
+class Preprocessor:
+    """
+    Runs the chosen steps on page images. ``process`` returns the processed
+    page and a report of the time per step and the peak working memory.
+    The returned image lives in this thread's work buffer: it is valid
+    until the next page is processed on the same thread.
+    """
+
+    def __init__(self, steps=('otsu',), max_skew=MAX_SKEW):
+        self.steps = parse_steps(steps if isinstance(steps, str) else ','.join(steps))
+        self.max_skew = max_skew
+        self._local = threading.local()
+
+    @property
+    def setting(self):
+        """
+        The steps as one string, for cache keys and settings
+        """
+        return ','.join(self.steps) or 'none'
+
+    def _buffer(self, name, shape, report):
+        """
+        This thread's work buffer ``name``, reallocated only when the page
+        size changes
+        """
+        buffers = self._local.__dict__.setdefault('buffers', {})
+        buffer = buffers.get(name)
+        if buffer is None or buffer.shape != shape:
+            buffer = buffers[name] = np.empty(shape, dtype=np.uint8)
+            report['allocated_bytes'] += buffer.nbytes
+        return buffer
+
+    def process(self, image, page=None):
+        """
+        ``image`` (RGB or grayscale uint8, not modified) with the steps
+        applied; returns (image, report). Without steps a grayscale image
+        comes back as it is.
+        """
+        started = time.perf_counter()
+        report = {'steps': {}, 'allocated_bytes': 0, 'peak_bytes': image.nbytes}
+        if not self.steps:
+            return to_gray(image), report
+
+        shape = image.shape[:2]
+        work = self._buffer('work', shape, report)
+        if image.ndim == 3 and image.shape[2] == 3:
+            current = to_gray(image, out=work)
+        else:
+            current = to_gray(image)
+        spare = None
+
+        for step in self.steps:
+            step_started = time.perf_counter()
+            # Median, thresholds and the colour conversion run in place, so
+            # only the first step reading the caller's image writes to work
+            if step == 'denoise':
+                current = cv2.medianBlur(current, 3, dst=work)
+            elif step == 'deskew':
+                angle = estimate_skew(current, self.max_skew)
+                report['skew'] = round(angle, 2)
+                if abs(angle) >= MIN_SKEW:
+                    # Rotation can't run in place; the two buffers swap roles
+                    spare = self._buffer('spare', shape, report)
+                    target = spare if current is work else work
+                    matrix = cv2.getRotationMatrix2D((shape[1] / 2, shape[0] / 2), -angle, 1.0)
+                    current = cv2.warpAffine(current, matrix, (shape[1], shape[0]), dst=target,
+                                             flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT,
+                                             borderValue=255)
+                    if target is spare:
+                        self._local.buffers['work'], self._local.buffers['spare'] = spare, work
+                        work, spare = spare, work
+            elif step == 'otsu':
+                _, current = cv2.threshold(current, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU, dst=work)
+            elif step == 'adaptive':
+                current = cv2.adaptiveThreshold(current, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY,
+                                                ADAPTIVE_BLOCK_SIZE, ADAPTIVE_C, dst=work)
+            seconds = time.perf_counter() - step_started
+            report['steps'][step] = round(seconds * 1000, 3)
+            record_span(f'preprocess_{step}', seconds, step_started, page=page)
+
+        report['peak_bytes'] += work.nbytes + (spare.nbytes if spare is not None else 0)
+        seconds = time.perf_counter() - started
+        record_span('preprocess', seconds, started, page=page, peak_bytes=report['peak_bytes'],
+                    allocated_bytes=report['allocated_bytes'])
+        METRICS.set('ocr_preprocess_peak_bytes', report['peak_bytes'])
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Page %s preprocessed in %.1f ms (%s), peak %.1f MB, allocated %.1f MB",
+                         page + 1 if page is not None else '-', seconds * 1000,
+                         ', '.join(f'{step} {ms:.1f} ms' for step, ms in report['steps'].items()),
+                         report['peak_bytes'] / 2 ** 20, report['allocated_bytes'] / 2 ** 20)
+        return current, report
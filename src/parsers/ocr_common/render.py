@@ -0,0 +1,189 @@
+"""
+PDF page rendering with PyMuPDF
+"""
+
+import os
+import sys
+from collections import namedtuple
+
+import fitz  # PyMuPDF
+import numpy as np
+
+from .textlayer import extract_words, page_size
+from .trace import span
+
+# One page: zero-based page number and its image (None if rendering failed
+# or the page wasn't rendered). Pages answered from the PDF's text layer
+# carry their words instead of an image, plus the size the image would have.
+# ``zoom`` is the scale the page was rendered (or its words scaled) at.
+RenderedPage = namedtuple('RenderedPage', ['number', 'image', 'words', 'size', 'zoom'],
+                          defaults=[None, None, None])
+
+# Render scale: a number, or 'auto' to pick one per page with choose_zoom.
+# Scripts fall back to their own fixed scale when this is unset.
+ZOOM_SETTING = os.environ.get('OCR_ZOOM')
+
+# Adaptive zoom picks the smallest scale that renders body text at least
+# this many pixels tall (font size), within the bounds and pixel budget
+TARGET_TEXT_PX = float(os.environ.get('OCR_TARGET_TEXT_PX', 18))
+MIN_ZOOM = 1.0
+MAX_ZOOM = 300 / 72
+MAX_PAGE_PIXELS = int(float(os.environ.get('OCR_MAX_PAGE_PIXELS', 6e6)))
+
+# Scale of the throwaway render used to measure text on scanned pages
+PROBE_ZOOM = 0.75
+
+# Glyph components are about this fraction of the font size tall (mix of
+# x-height and cap height)
+GLYPH_TO_FONT_SIZE = 0.8
+
+
+def open_pdf(source):
+    """
+    Open a PDF from a file path or from in-memory bytes
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return fitz.open(stream=bytes(source), filetype='pdf')
+    return fitz.open(source)
+
+
+def pixmap_to_array(pix):
+    """
+    View a PyMuPDF pixmap as a (height, width, channels) uint8 array without
+    re-encoding it
+    """
+    samples = np.frombuffer(pix.samples, dtype=np.uint8)
+    rows = samples.reshape(pix.height, pix.stride)
+    return rows[:, :pix.width * pix.n].reshape(pix.height, pix.width, pix.n)
+
+
+def parse_zoom(value, default):
+    """
+    Zoom setting from a command-line/env value: 'auto' or a number, with
+    ``default`` when unset
+    """
+    if value is None or value == '':
+        return default
+    if str(value).lower() == 'auto':
+        return 'auto'
+    return float(value)
+
+
+def font_text_size(page):
+    """
+    Size in points of the smaller body text of a page, from its font
+    metadata, or None when the page has no text layer
+    """
+    sizes = []
+    for block in page.get_text('dict')['blocks']:
+        for line in block.get('lines', []):
+            for span in line['spans']:
+                chars = len(span['text'].strip())
+                if chars and span['size'] > 0:
+                    sizes.append((span['size'], chars))
+    if not sizes:
+        return None
+
+    # 20th percentile by character count: small table text counts, a
+    # stray footnote doesn't
+    sizes.sort()
+    threshold = sum(chars for _, chars in sizes) * 0.2
+    seen = 0
+    for size, chars in sizes:
+        seen += chars
+        if seen >= threshold:
+            return size
+
+
+def rendered_text_size(page, probe_zoom=PROBE_ZOOM):
+    """
+    Estimate the text size in points of a page without a text layer from
+    the glyph heights in a cheap low-resolution grayscale render
+    """
+    import cv2
+
+    pix = page.get_pixmap(matrix=fitz.Matrix(probe_zoom, probe_zoom), colorspace=fitz.csGRAY, alpha=False)
+    gray = pixmap_to_array(pix)[:, :, 0]
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    _, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+
+    # Skip the background, specks, rules and table borders
+    widths = stats[1:, cv2.CC_STAT_WIDTH]
+    heights = stats[1:, cv2.CC_STAT_HEIGHT]
+    glyphs = heights[(heights >= 2) & (heights <= pix.height * 0.05) & (widths <= heights * 4)]
+    if len(glyphs) < 20:
+        return None
+
+    return float(np.median(glyphs)) / GLYPH_TO_FONT_SIZE / probe_zoom
+
+
+def choose_zoom(page, target_px=TARGET_TEXT_PX, max_pixels=MAX_PAGE_PIXELS,
+                min_zoom=MIN_ZOOM, max_zoom=MAX_ZOOM, default=2.0):
+    """
+    Smallest render scale that makes the page's text at least ``target_px``
+    tall, capped so the page stays within ``max_pixels``. The text size
+    comes from the font metadata, or a low-resolution render for scans;
+    ``default`` is used when neither finds text.
+    """
+    text_size = font_text_size(page) or rendered_text_size(page)
+    zoom = target_px / text_size if text_size else default
+    zoom = min(max(zoom, min_zoom), max_zoom)
+
+    area = page.rect.width * page.rect.height
+    if area > 0:
+        zoom = min(zoom, (max_pixels / area) ** 0.5)
+    return round(zoom, 2)
+
+
+def resolve_zoom(doc, page_num, zoom, default=2.0, text_layer=False):
+    """
+    Render scale for a page: ``zoom`` itself, or choose_zoom when it is
+    'auto'. Text-layer words don't depend on resolution, so with
+    ``text_layer`` they are simply scaled by ``default``.
+    """
+    if zoom != 'auto':
+        return zoom
+    if text_layer:
+        return default
+    return choose_zoom(doc[page_num], default=default)
+
+
+def render_page(doc, page_num, zoom=1.3, gray=False):
+    """
+    Render one page of an open document as an RGB numpy array, or with
+    ``gray`` as a (height, width) grayscale one, rendered in that colorspace
+    rather than converted afterwards
+    """
+    with span('render', page=page_num):
+        if gray:
+            pix = doc[page_num].get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csGRAY, alpha=False)
+            return pixmap_to_array(pix)[:, :, 0]
+        pix = doc[page_num].get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+        return pixmap_to_array(pix)
+
+
+def iter_pdf_pages(doc, zoom=1.3, text_layer=False, default_zoom=2.0, gray=False):
+    """
+    Render the pages of an open document one at a time, yielding a
+    RenderedPage with the image as an RGB (or with ``gray``, grayscale)
+    numpy array
+
+    ``zoom`` may be 'auto' to choose the scale per page (see choose_zoom,
+    ``default_zoom`` is its fallback). With ``text_layer``, pages that have
+    an embedded text layer are not rendered; their RenderedPage carries the
+    words instead.
+    """
+    for page_num in range(len(doc)):
+        if text_layer:
+            page_zoom = resolve_zoom(doc, page_num, zoom, default_zoom, text_layer=True)
+            with span('text_layer', page=page_num):
+                words = extract_words(doc[page_num], page_zoom)
+            if words is not None:
+                yield RenderedPage(page_num, None, words, page_size(doc[page_num], page_zoom), page_zoom)
+                continue
+        try:
+            page_zoom = resolve_zoom(doc, page_num, zoom, default_zoom)
+            yield RenderedPage(page_num, render_page(doc, page_num, page_zoom, gray), zoom=page_zoom)
+        except Exception as e:
+            print(f"ERROR rendering page {page_num}: {e}", file=sys.stderr)
+            yield RenderedPage(page_num, None)
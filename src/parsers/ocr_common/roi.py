@@ -0,0 +1,60 @@
+"""
+Region-of-interest selection for two-stage OCR
+
+Lab reports are mostly letterhead, patient details, disclaimers and
+footers; the values we parse sit in a results table. After a cheap
+detection-only pass, the text boxes that form table rows (several boxes
+side by side on a line, over several consecutive lines) are kept for
+recognition and the rest are skipped.
+"""
+
+import os
+
+from .layout import assign_lines, line_members
+
+ROI_ENABLED = os.environ.get('OCR_ROI', '0').lower() in ('1', 'true', 'on')
+
+# A table row has at least this many boxes side by side (analyte, value,
+# unit, reference range), and a table at least this many rows
+MIN_ROW_BOXES = 2
+MIN_TABLE_ROWS = 3
+
+# Single-box lines (a wrapped analyte name, a section heading) tolerated
+# inside a table before it is considered to have ended
+MAX_ROW_GAP = 2
+
+
+def select_table_boxes(rects, min_row_boxes=MIN_ROW_BOXES, min_table_rows=MIN_TABLE_ROWS,
+                       max_row_gap=MAX_ROW_GAP):
+    """
+    Indexes of the rectangles that belong to table-like regions, in their
+    original order. When a page has no such region every box is kept, so a
+    page laid out differently loses nothing.
+    """
+    rows = line_members(assign_lines(rects))
+    is_table_row = [len(row) >= min_row_boxes for row in rows]
+
+    keep = set()
+    start = None
+    table_rows = 0
+    gap = 0
+    for index, table_row in enumerate(is_table_row + [False] * (max_row_gap + 1)):
+        if table_row:
+            if start is None:
+                start, table_rows = index, 0
+            table_rows += 1
+            gap = 0
+            end = index
+            continue
+        if start is None:
+            continue
+        gap += 1
+        if gap > max_row_gap:
+            if table_rows >= min_table_rows:
+                for row in rows[start:end + 1]:
+                    keep.update(row)
+            start = None
+
+    if not keep:
+        return list(range(len(rects)))
+    return sorted(keep)
@@ -0,0 +1,92 @@
+"""
+Embedded text of digitally generated PDFs
+
+Pages that already carry a text layer don't need to be rasterized and run
+through a model: PyMuPDF returns their words with boxes directly. Scanned
+or image-only pages have no (or too little) text and still go to OCR.
+"""
+
+import os
+from collections import namedtuple
+
+import fitz  # PyMuPDF
+
+TEXT_LAYER_ENABLED = os.environ.get('OCR_TEXT_LAYER', '1').lower() not in ('0', 'false', 'off')
+MIN_TEXT_CHARS = int(os.environ.get('OCR_TEXT_LAYER_MIN_CHARS', 50))
+
+# A page mostly covered by images is a scan; a handful of words on it (a
+# stamped header, a page number) doesn't make it a text page
+SCAN_IMAGE_COVERAGE = 0.5
+SCAN_MIN_TEXT_CHARS = 500
+
+# Fonts without a usable encoding come out as U+FFFD; such text is useless
+MAX_UNMAPPED_FRACTION = 0.1
+
+# One word or line of the text layer in rendered-image pixels; ``line``
+# identifies the text line it belongs to (block number, line number)
+Word = namedtuple('Word', ['x0', 'y0', 'x1', 'y1', 'text', 'line'])
+
+
+def image_coverage(page):
+    """
+    Fraction of the page area covered by images (overlaps counted twice,
+    capped at 1)
+    """
+    page_area = abs(page.rect)
+    if not page_area:
+        return 0.0
+    covered = sum(abs(fitz.Rect(info['bbox']) & page.rect) for info in page.get_image_info())
+    return min(covered / page_area, 1.0)
+
+
+def extract_words(page, zoom=1.0, min_chars=MIN_TEXT_CHARS):
+    """
+    Words of a page's text layer in reading order, with boxes scaled to the
+    image the page would render to at ``zoom``. Returns None when the page
+    has too little usable text and needs OCR.
+    """
+    words = page.get_text('words', sort=True)
+    chars = sum(len(w[4]) for w in words)
+    if chars < min_chars:
+        return None
+    if sum(w[4].count('\ufffd') for w in words) > chars * MAX_UNMAPPED_FRACTION:
+        return None
+    if chars < SCAN_MIN_TEXT_CHARS and image_coverage(page) > SCAN_IMAGE_COVERAGE:
+        return None
+
+    # Text coordinates ignore /Rotate; the rendered image doesn't
+    matrix = page.rotation_matrix * fitz.Matrix(zoom, zoom)
+    result = []
+    for x0, y0, x1, y1, text, block_no, line_no, _ in words:
+        rect = fitz.Rect(x0, y0, x1, y1) * matrix
+        result.append(Word(rect.x0, rect.y0, rect.x1, rect.y1, text, (block_no, line_no)))
+    return result
+
+
+def group_lines(words):
+    """
+    Merge words into text lines (as Words whose box spans the line), in the
+    order the lines first appear
+    """
+    lines = {}
+    for word in words:
+        lines.setdefault(word.line, []).append(word)
+
+    return [
+        Word(
+            min(w.x0 for w in line_words),
+            min(w.y0 for w in line_words),
+            max(w.x1 for w in line_words),
+            max(w.y1 for w in line_words),
+            ' '.join(w.text for w in line_words),
+            line,
+        )
+        for line, line_words in lines.items()
+    ]
+
+
+def page_size(page, zoom=1.0):
+    """
+    (width, height) of the image the page would render to at ``zoom``
+    """
+    return page.rect.width * zoom, page.rect.height * zoom
@@ -0,0 +1,376 @@
+"""
+Per-request timing spans, counters and an opt-in profiler
+
+Code in the OCR pipeline wraps its stages in ``span('render')``,
+``span('ocr')`` and so on, and counts things with ``add_count('pages',
+source='ocr')``. Both always feed the process-wide METRICS, which the
+servers expose in Prometheus text format. Inside ``start_trace`` they are
+also recorded on that request's Trace: the CLIs print it as one
+``TRACE:{json}`` line on stderr when OCR_TRACE=1.
+
+Stage names used across the scripts: load, render, preprocess, detect,
+recognize (or ocr where an engine does both in one call), reconstruct and
+serialize.
+
+The current trace follows the request through contextvars, so spans in
+helper functions need no extra arguments. Threads don't inherit it on their
+own; ocr_common.pipeline.prefetch and ``in_context`` pass it on.
+
+OCR_PROFILE=cprofile or OCR_PROFILE=sample profiles each traced request and
+keeps the profile of those slower than OCR_PROFILE_SLOW_MS in
+OCR_PROFILE_DIR: a pstats file for cprofile (only the thread that started
+the request), or folded stacks of all threads for sample, the text format
+py-spy's raw output, flamegraph.pl and speedscope read.
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import bisect
+import tempfile
+import threading
+import contextvars
+from collections import Counter
+from contextlib import contextmanager
+
+TRACE_ENABLED = os.environ.get('OCR_TRACE', '0').lower() in ('1', 'true', 'on')
+
+PROFILE_MODE = os.environ.get('OCR_PROFILE', '').lower()
+PROFILE_SLOW_MS = float(os.environ.get('OCR_PROFILE_SLOW_MS', 1000))
+PROFILE_DIR = os.environ.get('OCR_PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'ocr-profiles'))
+SAMPLE_INTERVAL_MS = float(os.environ.get('OCR_PROFILE_INTERVAL_MS', 5))
+
+# Histogram buckets (seconds) for stage and request durations
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+METRIC_HELP = {
+    'ocr_stage_seconds': 'Time spent in each OCR pipeline stage',
+    'ocr_request_seconds': 'Time to process one request',
+    'ocr_pages_total': 'Pages processed, by where their result came from',
+    'ocr_words_total': 'Words returned',
+    'ocr_requests_total': 'Requests processed, by outcome',
+    'ocr_batch_pages_total': 'Pages run through the model in batches',
+    'ocr_active_requests': 'Documents being processed',
+    'ocr_queued_pages': 'Pages waiting for the model',
+    'ocr_engine_loaded': 'Whether an engine has its model loaded',
+    'ocr_cache_hits': 'Lookups answered from the OCR cache',
+    'ocr_cache_misses': 'Lookups not found in the OCR cache',
+    'ocr_cache_entries': 'Results stored in the OCR cache',
+    'ocr_cache_bytes': 'Size of the results stored in the OCR cache',
+    'ocr_cache_max_bytes': 'Size budget of the OCR cache',
+    'ocr_preprocess_peak_bytes': 'Working memory used to preprocess the last page',
+}
+
+_current = contextvars.ContextVar('ocr_trace', default=None)
+
+
+class Metrics:
+    """
+    Process-wide counters, gauges and histograms, rendered in Prometheus
+    text format. Metrics are keyed by name and a sorted tuple of labels.
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        with self.lock:
+            self.gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [[0] * len(self.buckets), 0.0, 0]
+            index = bisect.bisect_left(self.buckets, seconds)
+            if index < len(self.buckets):
+                histogram[0][index] += 1
+            histogram[1] += seconds
+            histogram[2] += 1
+
+    def prometheus(self):
+        """
+        All metrics in the Prometheus text exposition format
+        """
+        with self.lock:
+            counters = sorted(self.counters.items())
+            gauges = sorted(self.gauges.items())
+            histograms = sorted(self.histograms.items())
+
+        lines = []
+        described = set()
+
+        def describe(name, kind):
+            if name not in described:
+                described.add(name)
+                lines.append(f'# HELP {name} {METRIC_HELP.get(name, name)}')
+                lines.append(f'# TYPE {name} {kind}')
+
+        for (name, labels), value in counters:
+            describe(name, 'counter')
+            lines.append(f'{name}{format_labels(labels)} {value}')
+        for (name, labels), value in gauges:
+            describe(name, 'gauge')
+            lines.append(f'{name}{format_labels(labels)} {value}')
+        for (name, labels), (counts, total, count) in histograms:
+            describe(name, 'histogram')
+            cumulative = 0
+            for bound, bucket in zip(self.buckets, counts):
+                cumulative += bucket
+                lines.append(f'{name}_bucket{format_labels(labels + (("le", repr(bound)),))} {cumulative}')
+            lines.append(f'{name}_bucket{format_labels(labels + (("le", "+Inf"),))} {count}')
+            lines.append(f'{name}_sum{format_labels(labels)} {total}')
+            lines.append(f'{name}_count{format_labels(labels)} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+METRICS = Metrics()
+
+
+class Trace:
+    """
+    Spans and counters of one request. Spans are (stage, start offset,
+    duration) with optional attributes such as the page; they may be added
+    from several threads.
+    """
+
+    def __init__(self, name, **attrs):
+        self.name = name
+        self.id = uuid.uuid4().hex[:12]
+        self.attrs = attrs
+        self.started_at = time.time()
+        self.started = time.perf_counter()
+        self.duration = None
+        self.spans = []
+        self.counters = {}
+        self.profile = None
+        self.lock = threading.Lock()
+
+    def add_span(self, stage, start, duration, attrs=None):
+        span = {
+            'stage': stage,
+            'start_ms': round((start - self.started) * 1000, 3),
+            'duration_ms': round(duration * 1000, 3),
+        }
+        if attrs:
+            span.update(attrs)
+        with self.lock:
+            self.spans.append(span)
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def stages(self):
+        """
+        Total milliseconds per stage
+        """
+        totals = {}
+        with self.lock:
+            for span in self.spans:
+                totals[span['stage']] = totals.get(span['stage'], 0.0) + span['duration_ms']
+        return {stage: round(total, 3) for stage, total in totals.items()}
+
+    def to_dict(self):
+        duration = self.duration if self.duration is not None else time.perf_counter() - self.started
+        with self.lock:
+            spans = list(self.spans)
+            counters = dict(self.counters)
+        result = {
+            'trace': self.name,
+            'id': self.id,
+            'started_at': self.started_at,
+            'duration_ms': round(duration * 1000, 3),
+            'attrs': self.attrs,
+            'stages': self.stages(),
+            'counters': counters,
+            'spans': spans,
+        }
+        if self.profile is not None:
+            result['profile'] = self.profile
+        return result
+
+
+def current_trace():
+    """
+    The Trace of the request being processed, or None
+    """
+    return _current.get()
+
+
+@contextmanager
+def span(stage, **attrs):
+    """
+    Time the block as ``stage`` of the current request and in METRICS
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(stage, time.perf_counter() - started, started, **attrs)
+
+
+def record_span(stage, seconds, started=None, **attrs):
+    """
+    Record a stage duration measured elsewhere (e.g. in a worker process);
+    ``started`` is its perf_counter start, if known
+    """
+    METRICS.observe('ocr_stage_seconds', seconds, stage=stage)
+    trace = _current.get()
+    if trace is not None:
+        trace.add_span(stage, time.perf_counter() - seconds if started is None else started, seconds, attrs)
+
+
+def add_count(name, value=1, **labels):
+    """
+    Add ``value`` to the counter ocr_``name``_total and the current trace
+    (where labels become part of the name, e.g. pages.ocr)
+    """
+    METRICS.inc(f'ocr_{name}_total', value, **labels)
+    trace = _current.get()
+    if trace is not None:
+        trace.count('.'.join([name] + [str(label) for label in labels.values()]), value)
+
+
+def in_context(func):
+    """
+    ``func`` wrapped to run in a copy of the caller's context, so work
+    handed to another thread stays part of the current trace
+    """
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(func, *args, **kwargs)
+
+
+class SamplingProfiler:
+    """
+    Samples the Python stacks of all other threads every ``interval``
+    seconds and counts them as folded stacks ("thread;outer;...;inner").
+    Threads idling in a wait, select or queue get are left out.
+    """
+
+    IDLE_FILES = ('threading.py', 'selectors.py', 'queue.py')
+
+    def __init__(self, interval=SAMPLE_INTERVAL_MS / 1000):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='ocr-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own or os.path.basename(frame.f_code.co_filename) in self.IDLE_FILES:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            for stack, samples in self.stacks.most_common():
+                f.write(f'{stack} {samples}\n')
+
+
+# One profiled request at a time: cProfile can't run twice at once on
+# Python 3.12+, and the sampler already sees every thread
+_profile_slot = threading.Lock()
+
+
+@contextmanager
+def _profiled(trace, mode):
+    if mode not in ('cprofile', 'sample') or not _profile_slot.acquire(blocking=False):
+        yield
+        return
+    try:
+        if mode == 'cprofile':
+            import cProfile
+            profiler = cProfile.Profile()
+            profiler.enable()
+        else:
+            profiler = SamplingProfiler()
+            profiler.start()
+        try:
+            yield
+        finally:
+            if mode == 'cprofile':
+                profiler.disable()
+            else:
+                profiler.stop()
+            elapsed = (time.perf_counter() - trace.started) * 1000
+            if elapsed >= PROFILE_SLOW_MS:
+                os.makedirs(PROFILE_DIR, exist_ok=True)
+                suffix = 'prof' if mode == 'cprofile' else 'folded'
+                path = os.path.join(PROFILE_DIR, f'{trace.name}-{int(trace.started_at)}-{trace.id}.{suffix}')
+                if mode == 'cprofile':
+                    profiler.dump_stats(path)
+                else:
+                    profiler.save(path)
+                trace.profile = path
+                print(f"PROFILE:{path}", file=sys.stderr)
+    finally:
+        _profile_slot.release()
+
+
+@contextmanager
+def start_trace(name, emit=TRACE_ENABLED, profile=PROFILE_MODE, **attrs):
+    """
+    Trace the block as one request: yields its Trace, records its duration
+    in METRICS, profiles it when ``profile`` is set and, with ``emit``,
+    prints it as a TRACE line on stderr at the end
+    """
+    trace = Trace(name, **attrs)
+    token = _current.set(trace)
+    outcome = 'error'
+    try:
+        with _profiled(trace, profile):
+            yield trace
+        outcome = 'ok'
+    finally:
+        trace.duration = time.perf_counter() - trace.started
+        try:
+            _current.reset(token)
+        except ValueError:
+            # An async generator closed from another context
+            pass
+        METRICS.observe('ocr_request_seconds', trace.duration, trace=name)
+        METRICS.inc('ocr_requests_total', trace=name, outcome=outcome)
+        if emit:
+            print(f"TRACE:{json.dumps(trace.to_dict())}", file=sys.stderr, flush=True)
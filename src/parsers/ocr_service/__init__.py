@@ -0,0 +1,14 @@
+"""
+One OCR service for every engine
+
+The PaddleOCR, EasyOCR and DocTR entry points each load their own model
+and handle PDFs their own way. This package puts the engines behind one
+interface (ocr_service.engines), one ingestion layer for PDF and image
+uploads (ocr_service.ingest) and one result schema (ocr_service.schema).
+The FastAPI app in ocr_service.app chooses the engine per request and
+keeps loaded models warm in-process.
+
+Run from ``src/parsers`` so the ``ocr_common`` helpers are importable::
+
+    python -m ocr_service.app
+"""
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+OCR Service
+
+One HTTP API for every OCR engine. The engine is chosen per request and
+loaded models stay warm in this process.
+
+Run from src/parsers: python -m ocr_service.app
+"""
+
+import os
+import sys
+import math
+import logging
+import threading
+from typing import Optional
+
+import uvicorn
+from fastapi import FastAPI, File, UploadFile, HTTPException, Query
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ocr_common.cache import open_cache
+from ocr_common.render import parse_zoom
+from ocr_service.engines import ENGINES, DEFAULT_ENGINE, EngineRegistry
+from ocr_service.ingest import document_kind
+from ocr_service.schema import GEOMETRY_MODES, WORD_LAYOUTS
+from ocr_service.service import OCRService
+from ocr_common.trace import METRICS, start_trace
+from ocr_common.logs import log_level
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler(sys.stdout)]
+)
+logger = logging.getLogger(__name__)
+# OCR_LOG_LEVEL overrides the level (default: INFO)
+logger.setLevel(log_level("INFO"))
+
+# Documents processed at once; further uploads get 503 with Retry-After
+MAX_CONCURRENCY = int(os.environ.get("OCR_SERVICE_MAX_CONCURRENCY", 4))
+RETRY_AFTER_SECONDS = int(os.environ.get("OCR_SERVICE_RETRY_AFTER", 5))
+
+app = FastAPI(title="OCR Service")
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],  # Update with specific origins in production
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+registry = EngineRegistry()
+service = OCRService(registry, open_cache())
+slots = threading.BoundedSemaphore(max(1, MAX_CONCURRENCY))
+
+
+@app.on_event("startup")
+def preload_engines():
+    """Load the engines listed in OCR_PRELOAD_ENGINES before the first request."""
+    registry.preload()
+
+
+@app.get("/status")
+def status():
+    """Known engines, which are loaded, and the cache's counters."""
+    return {
+        "status": "ok",
+        "default_engine": DEFAULT_ENGINE,
+        "engines": registry.status(),
+        "cache": service.cache.stats() if service.cache is not None else None
+    }
+
+
+@app.get("/metrics")
+def metrics():
+    """Stage timings and page and request counters in Prometheus text format."""
+    for name, engine in registry.engines.items():
+        METRICS.set("ocr_engine_loaded", int(engine.loaded), engine=name)
+    if service.cache is not None:
+        for name, value in service.cache.stats().items():
+            METRICS.set(f"ocr_cache_{name}", value)
+    return PlainTextResponse(METRICS.prometheus(), media_type="text/plain; version=0.0.4")
+
+
+def valid_zoom(zoom):
+    """Whether a zoom parameter is unset, "auto" or a positive number."""
+    try:
+        value = parse_zoom(zoom, None)
+    except ValueError:
+        return False
+    return value is None or value == 'auto' or (math.isfinite(value) and value > 0)
+
+
+@app.post("/ocr")
+def ocr(
+    file: UploadFile = File(...),
+    engine: str = Query(DEFAULT_ENGINE),
+    geometry: str = Query("full"),
+    words: str = Query("records"),
+    min_confidence: Optional[float] = Query(None),
+    zoom: Optional[str] = Query(None)
+):
+    """
+    Read a document (PDF or image) with one engine
+
+    Args:
+        file: Uploaded file (PDF or image)
+        engine: One of ENGINES (default OCR_ENGINE)
+        geometry: Word box form, one of GEOMETRY_MODES
+        words: Word details as "records" (a dict per word) or "columns" (one array per field)
+        min_confidence: Drop words read with lower confidence (default OCR_MIN_CONFIDENCE)
+        zoom: PDF render scale or "auto" (default OCR_ZOOM, else the engine's own)
+
+    Returns:
+        The document result described in ocr_service.schema
+    """
+    engine = engine.lower()
+    if engine not in ENGINES:
+        raise HTTPException(status_code=400, detail=f"Unknown engine '{engine}'. Use one of: {', '.join(ENGINES)}")
+    if geometry not in GEOMETRY_MODES:
+        raise HTTPException(status_code=400, detail=f"Unsupported geometry '{geometry}'. Use one of: {', '.join(GEOMETRY_MODES)}")
+    if words not in WORD_LAYOUTS:
+        raise HTTPException(status_code=400, detail=f"Unsupported words layout '{words}'. Use one of: {', '.join(WORD_LAYOUTS)}")
+    if not valid_zoom(zoom):
+        raise HTTPException(status_code=400, detail=f"Unsupported zoom '{zoom}'. Use a positive number or 'auto'.")
+    kind = document_kind(file.filename)
+    if kind is None:
+        raise HTTPException(status_code=400, detail="Unsupported file format. Please upload a PDF or image file.")
+
+    if not slots.acquire(blocking=False):
+        logger.warning(f"Rejecting {file.filename}: {MAX_CONCURRENCY} documents already in progress")
+        raise HTTPException(
+            status_code=503,
+            detail="OCR service is busy, please retry later",
+            headers={"Retry-After": str(RETRY_AFTER_SECONDS)}
+        )
+
+    try:
+        data = file.file.read()
+        logger.info(f"Processing {file.filename} ({kind}) with {engine}")
+        options = {"geometry": geometry, "layout": words, "zoom": zoom}
+        if min_confidence is not None:
+            options["min_confidence"] = min_confidence
+        with start_trace("ocr", engine=engine, filename=file.filename, kind=kind):
+            result = service.process(data, kind, engine, **options)
+        logger.info(
+            f"Processed {file.filename}: {len(result['pages'])} pages, "
+            f"{result['cache']['page_hits']} from cache, {result['text_layer_pages']} from the text layer, "
+            f"{result['timings']['total_ms']:.0f} ms"
+        )
+        return result
+
+    except HTTPException:
+        raise
+    except ImportError as e:
+        logger.error(f"OCR engine {engine} is not installed: {str(e)}")
+        raise HTTPException(status_code=501, detail=f"OCR engine '{engine}' is not installed on this server")
+    except Exception as e:
+        logger.error(f"Error processing document with {engine}: {str(e)}")
+        logger.exception("Detailed traceback:")
+        raise HTTPException(status_code=500, detail=f"Error processing document: {str(e)}")
+    finally:
+        slots.release()
+
+
+if __name__ == "__main__":
+    port = int(os.environ.get("PORT", 8100))
+    uvicorn.run(app, host="0.0.0.0", port=port, reload=False)
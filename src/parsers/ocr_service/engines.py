@@ -0,0 +1,308 @@
+"""
+OCR engines behind a common interface
+
+Every engine takes page images as uint8 numpy arrays, RGB or for engines
+that set ``gray`` grayscale (pages are rendered that way), and returns
+detections as (quad, text, confidence) tuples, where quad is four [x, y]
+corner points in pixels of that image. The model libraries are imported
+in ``load`` only, so the service starts without them and an engine that
+isn't installed fails only the requests that ask for it.
+"""
+
+import os
+import sys
+import threading
+from abc import ABC, abstractmethod
+
+import cv2
+import numpy as np
+
+from ocr_common.boxes import box_rect
+from ocr_common.cache import package_version
+from ocr_common.preprocess import Preprocessor, engine_steps, to_gray
+
+DEFAULT_ENGINE = os.environ.get('OCR_ENGINE', 'doctr').lower()
+
+# Engines loaded when the service starts instead of on first use
+PRELOAD_ENGINES = [
+    name.strip().lower() for name in os.environ.get('OCR_PRELOAD_ENGINES', '').split(',') if name.strip()
+]
+
+
+def rect_quad(x0, y0, x1, y1):
+    """
+    Four corner points of a rectangle, clockwise from top left
+    """
+    return [[x0, y0], [x1, y0], [x1, y1], [x0, y1]]
+
+
+def crop(image, quad):
+    """
+    Axis-aligned crop of ``image`` around ``quad``
+    """
+    height, width = image.shape[:2]
+    x0, y0, x1, y1 = box_rect(quad)
+    return image[max(int(y0), 0):min(int(y1) + 1, height), max(int(x0), 0):min(int(x1) + 1, width)]
+
+
+class Engine(ABC):
+    """
+    Base class of the OCR engines. Subclasses implement ``load``,
+    ``detect`` and ``recognize``, and override ``batch`` when the model
+    reads several pages at once faster than one by one.
+
+    Calls into the model are serialized per engine, since none of the
+    libraries promise thread safety.
+    """
+
+    name = None
+    package = None
+    # Render scale for PDF pages this engine was tuned for
+    pdf_zoom = 2.0
+    # Whether the engine reads grayscale pages, so they are rendered in gray
+    gray = False
+    # Preprocessor run on each page before the model, if any
+    preprocess = None
+
+    def __init__(self):
+        self.model = None
+        self.lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    @property
+    def version(self):
+        return package_version(self.package)
+
+    @abstractmethod
+    def load(self):
+        """
+        Load the model; called once before the engine is first used
+        """
+
+    @abstractmethod
+    def detect(self, image):
+        """
+        Text regions of one image as a list of quads
+        """
+
+    @abstractmethod
+    def recognize(self, image, quads):
+        """
+        Read the text of the regions ``quads`` of one image; returns
+        (quad, text, confidence) detections
+        """
+
+    def batch(self, images):
+        """
+        Detect and recognize several images; returns one list of
+        detections per image
+        """
+        return [self.recognize(image, self.detect(image)) for image in images]
+
+    @property
+    def loaded(self):
+        return self.model is not None
+
+    def ensure_loaded(self):
+        """
+        Load the model unless it already is; returns True if this call loaded it
+        """
+        if self.model is not None:
+            return False
+        with self._load_lock:
+            if self.model is not None:
+                return False
+            print(f"Loading OCR engine {self.name}...", file=sys.stderr)
+            self.load()
+            print(f"OCR engine {self.name} loaded", file=sys.stderr)
+            return True
+
+    def read(self, images):
+        """
+        ``batch`` under the engine's lock, loading the model first if needed
+        """
+        self.ensure_loaded()
+        with self.lock:
+            return self.batch(images)
+
+
+class PaddleEngine(Engine):
+    """
+    PaddleOCR with the settings of PaddleOCR/paddle_ocr.py: Otsu-binarized
+    input, no angle classifier, stricter detection thresholds
+    """
+
+    name = 'paddle'
+    package = 'paddleocr'
+    pdf_zoom = 1.3
+    gray = True
+    preprocess = Preprocessor(engine_steps('paddle', 'otsu'))
+
+    def load(self):
+        from paddleocr import PaddleOCR
+        self.model = PaddleOCR(
+            use_angle_cls=False,
+            lang='en',
+            show_log=False,
+            use_gpu=False,
+            det_db_thresh=0.5,
+            det_db_box_thresh=0.6,
+        )
+
+    def binarize(self, image):
+        # Reuses the calling thread's buffer, so it's only good until the
+        # next page; the model reads it before then
+        binary, _ = self.preprocess.process(image)
+        return binary
+
+    def detect(self, image):
+        result = self.model.ocr(self.binarize(image), det=True, rec=False, cls=False)
+        boxes = result[0] if result and result[0] is not None else []
+        return [np.asarray(box, dtype=np.float64).tolist() for box in boxes]
+
+    def recognize(self, image, quads):
+        if not len(quads):
+            return []
+        # The recognizer expects 3-channel crops; only the crops are converted
+        binary = self.binarize(image)
+        crops = [crop(binary, quad) for quad in quads]
+        results, _ = self.model.text_recognizer([
+            cv2.cvtColor(page_crop, cv2.COLOR_GRAY2BGR) if page_crop.ndim == 2 else page_crop for page_crop in crops
+        ])
+        return [(quad, text, float(confidence)) for quad, (text, confidence) in zip(quads, results)]
+
+    def batch(self, images):
+        pages = []
+        for image in images:
+            result = self.model.ocr(self.binarize(image), det=True, rec=True, cls=False)
+            detections = result[0] if result and result[0] is not None else []
+            pages.append([(box, text, float(confidence)) for box, (text, confidence) in detections])
+        return pages
+
+
+class EasyOCREngine(Engine):
+    """
+    EasyOCR, English, on CPU like EasyOCR/run_easyocr.py
+    """
+
+    name = 'easyocr'
+    package = 'easyocr'
+    pdf_zoom = 300 / 72
+    gray = True
+
+    def load(self):
+        import easyocr
+        self.model = easyocr.Reader(['en'], gpu=False)
+
+    def detect(self, image):
+        horizontal_list, free_list = self.model.detect(image)
+        # Horizontal boxes are [x_min, x_max, y_min, y_max], free ones 4 points
+        quads = [rect_quad(x0, y0, x1, y1) for x0, x1, y0, y1 in horizontal_list[0]]
+        return quads + [[list(point) for point in box] for box in free_list[0]]
+
+    def recognize(self, image, quads):
+        if not len(quads):
+            return []
+        horizontal_list = []
+        free_list = []
+        for quad in quads:
+            x0, y0, x1, y1 = box_rect(quad)
+            if rect_quad(x0, y0, x1, y1) == [list(point) for point in quad]:
+                horizontal_list.append([int(x0), int(x1), int(y0), int(y1)])
+            else:
+                free_list.append(quad)
+        results = self.model.recognize(to_gray(image), horizontal_list=horizontal_list, free_list=free_list)
+        return [(box, text, float(confidence)) for box, text, confidence in results]
+
+    def batch(self, images):
+        return [
+            [(box, text, float(confidence)) for box, text, confidence in self.model.readtext(image)]
+            for image in images
+        ]
+
+
+class DocTREngine(Engine):
+    """
+    DocTR's pretrained OCR predictor, on the GPU when one is available, as
+    in DocTR/server.py. A batch runs all pages through the predictor at once.
+    """
+
+    name = 'doctr'
+    package = 'python-doctr'
+    pdf_zoom = 2.0
+
+    def load(self):
+        import torch
+        from doctr.models import ocr_predictor
+        device = torch.device('cuda:0' if torch.cuda.is_available() else 'cpu')
+        self.model = ocr_predictor(pretrained=True).to(device)
+
+    def detect(self, image):
+        height, width = image.shape[:2]
+        result = self.model.det_predictor([image])[0]
+        # Relative (x0, y0, x1, y1, score) rows, keyed by class in newer DocTR
+        boxes = result['words'] if isinstance(result, dict) else result
+        return [
+            rect_quad(x0 * width, y0 * height, x1 * width, y1 * height)
+            for x0, y0, x1, y1 in np.asarray(boxes, dtype=np.float64).reshape(-1, 5)[:, :4]
+        ]
+
+    def recognize(self, image, quads):
+        if not len(quads):
+            return []
+        results = self.model.reco_predictor([crop(image, quad) for quad in quads])
+        return [(quad, text, float(confidence)) for quad, (text, confidence) in zip(quads, results)]
+
+    def batch(self, images):
+        result = self.model(images)
+        pages = []
+        for image, page in zip(images, result.pages):
+            height, width = image.shape[:2]
+            detections = []
+            for block in page.blocks:
+                for line in block.lines:
+                    for word in line.words:
+                        (x0, y0), (x1, y1) = word.geometry
+                        quad = rect_quad(x0 * width, y0 * height, x1 * width, y1 * height)
+                        detections.append((quad, word.value, float(word.confidence)))
+            pages.append(detections)
+        return pages
+
+
+ENGINES = {engine.name: engine for engine in (PaddleEngine, EasyOCREngine, DocTREngine)}
+
+
+class EngineRegistry:
+    """
+    One instance of each engine for the life of the process. Models are
+    loaded on first use (or by ``preload``) and then stay warm.
+    """
+
+    def __init__(self, engines=ENGINES):
+        self.engines = {name: engine_class() for name, engine_class in engines.items()}
+
+    def get(self, name):
+        """
+        The engine ``name``; raises KeyError for an unknown engine
+        """
+        return self.engines[name]
+
+    def preload(self, names=PRELOAD_ENGINES):
+        """
+        Load ``names`` now; failures are reported and left for the first
+        request to retry
+        """
+        for name in names:
+            try:
+                self.get(name).ensure_loaded()
+            except Exception as e:
+                print(f"WARNING: could not preload OCR engine {name}: {e}", file=sys.stderr)
+
+    def status(self):
+        """
+        Known engines, whether each is loaded, and its installed version
+        """
+        return {
+            name: {'loaded': engine.loaded, 'version': engine.version}
+            for name, engine in self.engines.items()
+        }
@@ -0,0 +1,68 @@
+"""
+PDF and image uploads as a stream of pages
+
+Uploads are read from memory. PDF pages with an embedded text layer carry
+their words instead of an image; every other page is rendered (or
+decoded) to an RGB or grayscale numpy array, one page at a time.
+"""
+
+import os
+
+import cv2
+import numpy as np
+
+from ocr_common.render import RenderedPage, open_pdf, iter_pdf_pages
+from ocr_common.textlayer import TEXT_LAYER_ENABLED
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.tif')
+
+
+def document_kind(filename):
+    """
+    'pdf' or 'image' from an upload's file name, or None when unsupported
+    """
+    extension = os.path.splitext(filename or '')[1].lower()
+    if extension == '.pdf':
+        return 'pdf'
+    if extension in IMAGE_EXTENSIONS:
+        return 'image'
+    return None
+
+
+def decode_image(data, gray=False):
+    """
+    RGB (or with ``gray``, grayscale) array of an image upload; formats
+    OpenCV can't decode (e.g. multi-page TIFFs) fall back to Pillow's first
+    frame
+    """
+    flags = cv2.IMREAD_GRAYSCALE if gray else cv2.IMREAD_COLOR
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), flags)
+    if image is not None:
+        return image if gray else cv2.cvtColor(image, cv2.COLOR_BGR2RGB, dst=image)
+
+    import io
+    from PIL import Image
+    with Image.open(io.BytesIO(data)) as pil_image:
+        return np.asarray(pil_image.convert('L' if gray else 'RGB'))
+
+
+def iter_document_pages(data, kind, zoom, default_zoom, text_layer=TEXT_LAYER_ENABLED, gray=False):
+    """
+    RenderedPages of an upload of ``kind`` ('pdf' or 'image'). PDFs are
+    rendered at ``zoom`` ('auto' chooses per page, falling back to
+    ``default_zoom``), in grayscale with ``gray``. Every page has its
+    ``size`` set.
+    """
+    if kind == 'image':
+        image = decode_image(data, gray)
+        yield RenderedPage(0, image, size=(image.shape[1], image.shape[0]), zoom=1.0)
+        return
+
+    doc = open_pdf(data)
+    try:
+        for page in iter_pdf_pages(doc, zoom=zoom, text_layer=text_layer, default_zoom=default_zoom, gray=gray):
+            if page.size is None and page.image is not None:
+                page = page._replace(size=(page.image.shape[1], page.image.shape[0]))
+            yield page
+    finally:
+        doc.close()
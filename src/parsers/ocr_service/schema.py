@@ -0,0 +1,113 @@
+"""
+Result schema shared by every engine
+
+A document result is::
+
+    {
+        "engine": "doctr", "engine_version": "0.8.1",
+        "text": "...", "confidence": 0.93,
+        "pages": [
+            {"page": 0, "width": 1190, "height": 1684, "source": "ocr",
+             "text": "...", "confidence": 0.93, "words": [...]},
+        ],
+        "text_layer_pages": 0,
+        "cache": {"page_hits": 0, "pages": 1},
+        "timings": {"load_ms": 0.0, "total_ms": 812.4}
+    }
+
+Page ``source`` is "text_layer", "cache" or "ocr". Word boxes are
+fractions of the page size in the ``geometry`` form asked for: "full"
+[[x0, y0], [x1, y1]], "compact" [x0, y0, x1, y1] integers in thousandths,
+or "none". With ``words="columns"`` a page carries ``columns`` (one array
+per field, see ocr_common.columnar) instead of a ``words`` list.
+"""
+
+from ocr_common.columnar import WordTable
+from ocr_common.layout import reconstruct_lines
+
+GEOMETRY_MODES = ('full', 'compact', 'none')
+WORD_LAYOUTS = ('records', 'columns')
+COMPACT_SCALE = 1000
+
+
+def detections_table(detections, min_confidence=0.0):
+    """
+    WordTable of an engine's (quad, text, confidence) detections, without
+    empty or low-confidence ones
+    """
+    return WordTable.from_detections([
+        (quad, text.strip(), confidence)
+        for quad, text, confidence in detections
+        if text.strip() and confidence >= min_confidence
+    ])
+
+
+def text_layer_table(words):
+    """
+    WordTable of a page's text-layer Words (in rendered pixels)
+    """
+    return WordTable.from_rects(
+        [word.text for word in words],
+        [1.0] * len(words),
+        [(word.x0, word.y0, word.x1, word.y1) for word in words],
+    )
+
+
+def page_text(table):
+    """
+    Text of one page, its words grouped into lines
+    """
+    return '\n'.join(reconstruct_lines(table.rects(), table.texts()))
+
+
+def format_words(table, geometry, layout):
+    """
+    ``words`` or ``columns`` field of a page for a table in page fractions
+    """
+    if layout == 'columns':
+        if geometry == 'none':
+            return {'columns': table.columns(form=None)}
+        if geometry == 'compact':
+            return {'columns': table.columns(form='flat', scale=COMPACT_SCALE, decimals=3)}
+        return {'columns': table.columns(form='flat')}
+
+    if geometry == 'none':
+        return {'words': table.records(box_key=None)}
+    if geometry == 'compact':
+        return {'words': table.records(form='flat', scale=COMPACT_SCALE, decimals=3)}
+    return {'words': table.records(form='rect')}
+
+
+def page_result(number, table, size, source, geometry='full', layout='records'):
+    """
+    One page of a document result from its WordTable in pixels of an
+    image of ``size`` (width, height)
+    """
+    width, height = size
+    relative = table.scaled(1 / width, 1 / height).with_page(number)
+    return {
+        'page': number,
+        'width': round(width),
+        'height': round(height),
+        'source': source,
+        'text': page_text(table),
+        'confidence': table.mean_confidence(),
+        **format_words(relative, geometry, layout),
+    }
+
+
+def document_result(engine, pages, tables, page_hits, timings):
+    """
+    Document result of an engine from its page results and their
+    WordTables, in page order
+    """
+    return {
+        'engine': engine.name,
+        'engine_version': engine.version,
+        'text': '\n\n'.join(page['text'] for page in pages),
+        'confidence': WordTable.concat(tables).mean_confidence(),
+        'pages': pages,
+        'text_layer_pages': sum(1 for page in pages if page['source'] == 'text_layer'),
+        'cache': {'page_hits': page_hits, 'pages': len(pages)},
+        'timings': {name: round(value, 1) for name, value in timings.items()},
+    }
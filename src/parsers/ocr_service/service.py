@@ -0,0 +1,123 @@
+"""
+Running one upload through one engine
+
+Pages are rendered on a background thread while earlier ones are read.
+Text-layer pages and pages already in the shared OCR cache are answered
+directly; the rest are sent to the engine in batches of up to
+OCR_SERVICE_BATCH_PAGES pages.
+"""
+
+import os
+import time
+
+from ocr_common.pipeline import prefetch
+from ocr_common.render import parse_zoom, ZOOM_SETTING
+from ocr_common.cache import hash_array, make_key
+from ocr_common.columnar import WordTable
+from ocr_common.trace import span, record_span, add_count
+from ocr_service.ingest import iter_document_pages
+from ocr_service.schema import detections_table, text_layer_table, page_result, document_result
+
+BATCH_PAGES = int(os.environ.get('OCR_SERVICE_BATCH_PAGES', 4))
+MIN_CONFIDENCE = float(os.environ.get('OCR_MIN_CONFIDENCE', 0.0))
+
+# Bump when a change to the service alters its results, so cached pages
+# from the old version are not reused
+PIPELINE_VERSION = 2
+
+
+class OCRService:
+    """
+    Turns uploads into document results (see ocr_service.schema) with
+    engines from an EngineRegistry and an optional OCRCache
+    """
+
+    def __init__(self, registry, cache=None, batch_pages=BATCH_PAGES):
+        self.registry = registry
+        self.cache = cache
+        self.batch_pages = max(1, batch_pages)
+
+    def page_key(self, engine, image, min_confidence):
+        return make_key(hash_array(image), f'service-{engine.name}', engine.version, {
+            'pipeline': PIPELINE_VERSION,
+            'min_confidence': min_confidence,
+            'preprocess': engine.preprocess.setting if engine.preprocess is not None else None,
+        })
+
+    def process(self, data, kind, engine_name, geometry='full', layout='records',
+                min_confidence=MIN_CONFIDENCE, zoom=None):
+        """
+        Document result of upload bytes ``data`` of ``kind`` ('pdf' or
+        'image') read by engine ``engine_name``
+        """
+        started = time.perf_counter()
+        engine = self.registry.get(engine_name)
+        timings = {'load_ms': 0.0, 'ocr_ms': 0.0}
+
+        zoom = parse_zoom(zoom if zoom is not None else ZOOM_SETTING, engine.pdf_zoom)
+        tables = []
+        sizes = []
+        sources = []
+        pending = []
+        page_hits = 0
+
+        def flush():
+            # The model is only loaded once a page actually needs OCR
+            load_started = time.perf_counter()
+            if engine.ensure_loaded():
+                load_seconds = time.perf_counter() - load_started
+                timings['load_ms'] += load_seconds * 1000
+                record_span('load', load_seconds, load_started, engine=engine.name)
+            ocr_started = time.perf_counter()
+            images = [image for _, image, _ in pending]
+            with span('ocr', engine=engine.name, pages=len(images)):
+                batches = engine.read(images)
+            timings['ocr_ms'] += (time.perf_counter() - ocr_started) * 1000
+            for (index, _, key), detections in zip(pending, batches):
+                table = detections_table(detections, min_confidence)
+                tables[index] = table
+                if key is not None:
+                    self.cache.put(key, table.columns(form='quad'))
+            pending.clear()
+
+        pages = prefetch(iter_document_pages(data, kind, zoom, engine.pdf_zoom, gray=engine.gray))
+        try:
+            for page in pages:
+                index = len(tables)
+                if page.words is not None:
+                    tables.append(text_layer_table(page.words))
+                    source = 'text_layer'
+                elif page.image is None:
+                    # Rendering failed; the page is reported empty
+                    tables.append(WordTable.empty())
+                    source = 'error'
+                else:
+                    key = cached = None
+                    if self.cache is not None:
+                        key = self.page_key(engine, page.image, min_confidence)
+                        cached = self.cache.get(key)
+                    if cached is not None:
+                        tables.append(WordTable.from_columns(cached))
+                        source = 'cache'
+                        page_hits += 1
+                    else:
+                        tables.append(None)
+                        pending.append((index, page.image, key))
+                        source = 'ocr'
+                        if len(pending) >= self.batch_pages:
+                            flush()
+                sizes.append(page.size or (1, 1))
+                sources.append(source)
+                add_count('pages', source=source)
+            if pending:
+                flush()
+        finally:
+            pages.close()
+
+        with span('serialize'):
+            results = [
+                page_result(number, table, size, source, geometry, layout)
+                for number, (table, size, source) in enumerate(zip(tables, sizes, sources))
+            ]
+        timings['total_ms'] = (time.perf_counter() - started) * 1000
+        return document_result(engine, results, tables, page_hits, timings)
@@ -0,0 +1,23 @@
+"""
+Tests of the Python OCR scripts and shared helpers
+
+The scripts run directly from their own folders, so their directories are
+put on ``sys.path`` here the same way they put ``src/parsers`` on it.
+Tests that need an engine (torch for the DocTR server) are skipped when it
+isn't installed.
+
+    python -m pytest src/parsers/tests
+"""
+
+import os
+import sys
+
+PARSERS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The shared cache is off unless a test opens its own
+os.environ.setdefault('OCR_CACHE', '0')
+
+for directory in (PARSERS_DIR, os.path.join(PARSERS_DIR, 'DocTR'), os.path.join(PARSERS_DIR, 'PaddleOCR'),
+                  os.path.join(PARSERS_DIR, 'EasyOCR')):
+    if directory not in sys.path:
+        sys.path.insert(0, directory)
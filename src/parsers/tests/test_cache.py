@@ -0,0 +1,110 @@
+"""
+Shared on-disk OCR result cache
+"""
+
+import threading
+
+import numpy as np
+
+from ocr_common.cache import OCRCache, hash_array, hash_bytes, make_key
+
+
+def test_put_and_get_round_trip(tmp_path):
+    cache = OCRCache(str(tmp_path / 'cache.sqlite3'))
+    value = {'text': 'Glucose 5.2', 'words': {'text': ['Glucose', '5.2'], 'confidence': [0.9, 0.8]}}
+
+    cache.put('key', value)
+
+    assert cache.get('key') == value
+    assert cache.get('other') is None
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+    assert cache.stats()['entries'] == 1
+    cache.close()
+
+
+def test_uses_write_ahead_log(tmp_path):
+    cache = OCRCache(str(tmp_path / 'cache.sqlite3'))
+
+    assert cache._conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    cache.close()
+
+
+def test_counters_and_entries_are_shared_between_connections(tmp_path):
+    path = str(tmp_path / 'cache.sqlite3')
+    writer, reader = OCRCache(path), OCRCache(path)
+
+    writer.put('key', {'text': 'a'})
+
+    assert reader.get('key') == {'text': 'a'}
+    assert writer.stats()['hits'] == 1
+    writer.close()
+    reader.close()
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = OCRCache(str(tmp_path / 'cache.sqlite3'), max_bytes=3000)
+    rng = np.random.default_rng(0)
+    # Random text barely compresses, so each entry is about 1 KB
+    values = {f'key{i}': {'text': rng.integers(0, 10 ** 9, 120).tolist()} for i in range(6)}
+
+    for key, value in values.items():
+        cache.put(key, value)
+        # Reading key0 keeps it recently used
+        cache.get('key0')
+
+    stats = cache.stats()
+    assert stats['bytes'] <= 3000
+    assert cache.get('key0') is not None
+    assert cache.get('key1') is None
+    assert cache.get('key5') is not None
+    cache.close()
+
+
+def test_concurrent_threads(tmp_path):
+    cache = OCRCache(str(tmp_path / 'cache.sqlite3'))
+    errors = []
+
+    def work(worker):
+        try:
+            for i in range(50):
+                cache.put(f'{worker}-{i}', {'i': i})
+                assert cache.get(f'{worker}-{i}') == {'i': i}
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=work, args=(worker,)) for worker in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert cache.stats()['entries'] == 200
+    cache.close()
+
+
+def test_broken_entry_is_a_miss(tmp_path, capsys):
+    cache = OCRCache(str(tmp_path / 'cache.sqlite3'))
+    cache._conn.execute("INSERT INTO entries (key, value, size, accessed) VALUES ('bad', x'00', 1, 0)")
+
+    assert cache.get('bad') is None
+    assert 'OCR cache read failed' in capsys.readouterr().err
+    cache.close()
+
+
+def test_keys_change_with_content_engine_version_and_settings():
+    base = make_key(hash_bytes(b'pdf'), 'paddle', '2.7', {'zoom': 1.3})
+
+    assert base == make_key(hash_bytes(b'pdf'), 'paddle', '2.7', {'zoom': 1.3})
+    assert base != make_key(hash_bytes(b'pdf2'), 'paddle', '2.7', {'zoom': 1.3})
+    assert base != make_key(hash_bytes(b'pdf'), 'easyocr', '2.7', {'zoom': 1.3})
+    assert base != make_key(hash_bytes(b'pdf'), 'paddle', '2.8', {'zoom': 1.3})
+    assert base != make_key(hash_bytes(b'pdf'), 'paddle', '2.7', {'zoom': 2})
+
+
+def test_array_hash_includes_shape():
+    data = np.arange(12, dtype=np.uint8)
+
+    assert hash_array(data.reshape(3, 4)) != hash_array(data.reshape(4, 3))
+    assert hash_array(data.reshape(3, 4)[:, ::2]) == hash_array(data.reshape(3, 4)[:, ::2].copy())
@@ -0,0 +1,72 @@
+"""
+Columnar word results
+"""
+
+import json
+
+import numpy as np
+import pytest
+
+from ocr_common.columnar import WordTable
+
+
+def page_table(page=0):
+    return WordTable.from_rects(['Glucose', '5.2', 'µmol/L'], [0.9, 0.8, 0.7],
+                                [(10, 20, 60, 30), (70, 20, 90, 30), (100, 21, 140, 31)], page)
+
+
+def test_texts_round_trip_utf8():
+    table = page_table()
+
+    assert len(table) == 3
+    assert table.texts() == ['Glucose', '5.2', 'µmol/L']
+
+
+def test_rect_and_quad_boxes():
+    table = page_table()
+
+    assert table.boxes('flat')[0] == [10.0, 20.0, 60.0, 30.0]
+    assert table.boxes('rect')[0] == [[10.0, 20.0], [60.0, 30.0]]
+    assert table.boxes('quad')[0] == [[10.0, 20.0], [60.0, 20.0], [60.0, 30.0], [10.0, 30.0]]
+    with pytest.raises(ValueError):
+        table.boxes('polygon')
+
+
+def test_records_match_the_per_word_dicts():
+    records = page_table(2).records(page=True)
+
+    assert records[1] == {'text': '5.2', 'confidence': 0.8, 'box': [[70.0, 20.0], [90.0, 30.0]], 'page': 2}
+    assert page_table().records(box_key=None)[0] == {'text': 'Glucose', 'confidence': 0.9}
+
+
+def test_compact_boxes_are_scaled_integers():
+    table = page_table().scaled(1 / 200, 1 / 100)
+
+    assert table.boxes('flat', scale=1000)[0] == [50, 200, 300, 300]
+
+
+def test_concat_and_split_pages():
+    first = page_table()
+    second = WordTable.from_detections([([[0, 0], [5, 0], [5, 5], [0, 5]], 'WBC', 0.5)])
+    document = WordTable.concat([first.with_page(0), WordTable.empty(), second.with_page(1)])
+
+    assert document.texts() == ['Glucose', '5.2', 'µmol/L', 'WBC']
+    assert document.page.tolist() == [0, 0, 0, 1]
+    pages = document.pages(3)
+    assert [page.texts() for page in pages] == [['Glucose', '5.2', 'µmol/L'], ['WBC'], []]
+    assert pages[1].page.tolist() == [1]
+
+
+def test_columns_round_trip_through_json():
+    table = WordTable.concat([page_table(0), page_table(1)])
+
+    for form in ('flat', 'quad'):
+        restored = WordTable.from_columns(json.loads(json.dumps(table.columns(form=form))))
+        assert restored.texts() == table.texts()
+        np.testing.assert_allclose(restored.quads, table.quads)
+        assert restored.page.tolist() == table.page.tolist()
+
+
+def test_mean_confidence():
+    assert page_table().mean_confidence() == pytest.approx(0.8)
+    assert WordTable.empty().mean_confidence() == 0.0
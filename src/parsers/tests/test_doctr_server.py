@@ -0,0 +1,287 @@
+"""
+DocTR server: page batching and backpressure
+"""
+
+import time
+import asyncio
+from types import SimpleNamespace
+
+import fitz
+import numpy as np
+import pytest
+
+pytest.importorskip('torch')
+server = pytest.importorskip('server')
+
+from ocr_common.render import RenderedPage
+
+
+class SlowPredictor:
+    """
+    Stands in for the DocTR predictor: answers every image with an empty
+    page after a delay, and remembers the batch sizes
+    """
+
+    def __init__(self, delay=0.02):
+        self.delay = delay
+        self.batches = []
+
+    def __call__(self, images):
+        self.batches.append(len(images))
+        time.sleep(self.delay)
+        return SimpleNamespace(pages=[SimpleNamespace(blocks=[]) for _ in images])
+
+
+def run_pages(pages, predictor, depth):
+    """
+    Page numbers yielded for ``pages`` and the most page images that were
+    waiting for or running through the model at once
+    """
+    batcher = server.PageBatcher(predictor, window_ms=5, max_pages=16)
+    outstanding = {'now': 0, 'peak': 0}
+    submit = batcher.submit
+
+    def counting_submit(image):
+        outstanding['now'] += 1
+        outstanding['peak'] = max(outstanding['peak'], outstanding['now'])
+        future = submit(image)
+        future.add_done_callback(lambda _: outstanding.update(now=outstanding['now'] - 1))
+        return future
+
+    batcher.submit = counting_submit
+
+    async def main():
+        batcher.start()
+        numbers = []
+        try:
+            async for number, _, _ in server.iter_page_summaries(pages, depth=depth):
+                numbers.append(number)
+        finally:
+            await batcher.stop()
+        return numbers
+
+    original = server.batcher, server.cache
+    server.batcher, server.cache = batcher, None
+    try:
+        return asyncio.run(main()), outstanding['peak']
+    finally:
+        server.batcher, server.cache = original
+
+
+def test_pages_in_flight_are_capped_by_depth():
+    pages = [RenderedPage(i, np.full((8, 8, 3), i, dtype=np.uint8)) for i in range(30)]
+
+    numbers, peak = run_pages(pages, SlowPredictor(), depth=2)
+
+    assert numbers == list(range(30))
+    assert peak <= 2
+
+
+def test_batches_never_exceed_depth_for_one_document():
+    predictor = SlowPredictor()
+    pages = [RenderedPage(i, np.zeros((8, 8, 3), dtype=np.uint8)) for i in range(10)]
+
+    run_pages(pages, predictor, depth=3)
+
+    assert sum(predictor.batches) == 10
+    assert max(predictor.batches) <= 3
+
+
+def test_abandoned_iteration_stops_feeder():
+    pages = [RenderedPage(i, np.zeros((8, 8, 3), dtype=np.uint8)) for i in range(20)]
+    batcher = server.PageBatcher(SlowPredictor(), window_ms=5, max_pages=16)
+
+    async def main():
+        batcher.start()
+        try:
+            summaries = server.iter_page_summaries(iter(pages), depth=1)
+            async for number, _, _ in summaries:
+                if number == 2:
+                    break
+            # Closing must not hang on a feeder waiting for a slot
+            await asyncio.wait_for(summaries.aclose(), timeout=5)
+        finally:
+            await batcher.stop()
+
+    original = server.batcher, server.cache
+    server.batcher, server.cache = batcher, None
+    try:
+        asyncio.run(main())
+    finally:
+        server.batcher, server.cache = original
+
+
+def call_response(response, messages):
+    """
+    Run an ASGI response against a client that sends ``messages`` and then
+    waits; returns the messages the response sent
+    """
+    sent = []
+    incoming = list(messages)
+
+    async def receive():
+        if incoming:
+            return incoming.pop(0)
+        await asyncio.sleep(3600)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {'type': 'http', 'asgi': {'spec_version': '2.0'}, 'method': 'POST', 'path': '/'}
+    asyncio.run(asyncio.wait_for(response(scope, receive, send), timeout=5))
+    return sent
+
+
+def test_stream_slot_released_when_client_leaves_before_first_chunk():
+    limiter = server.RequestLimiter(1)
+    assert limiter.acquire()
+
+    async def body():
+        await asyncio.sleep(3600)
+        yield b'never sent'
+
+    response = server.LimitedStreamingResponse(body(), limiter, media_type='application/x-ndjson')
+    call_response(response, [{'type': 'http.disconnect'}])
+
+    assert limiter.active == 0
+    assert limiter.acquire()
+
+
+def test_stream_slot_released_once_after_full_body():
+    limiter = server.RequestLimiter(2)
+    assert limiter.acquire()
+
+    async def body():
+        yield b'{"type": "summary"}\n'
+
+    sent = call_response(server.LimitedStreamingResponse(body(), limiter), [])
+
+    assert sent[-1] == {'type': 'http.response.body', 'body': b'', 'more_body': False}
+    assert limiter.active == 0
+
+
+def test_stream_slot_released_when_body_fails():
+    limiter = server.RequestLimiter(1)
+    assert limiter.acquire()
+
+    async def body():
+        yield b'first\n'
+        raise RuntimeError('broken')
+
+    with pytest.raises(RuntimeError):
+        call_response(server.LimitedStreamingResponse(body(), limiter), [])
+
+    assert limiter.active == 0
+
+
+class LockedCache:
+    """
+    A cache whose counters take ``delay`` seconds to read, like a cache
+    file another process holds locked
+    """
+
+    def __init__(self, delay):
+        self.delay = delay
+
+    def stats(self):
+        time.sleep(self.delay)
+        return {'hits': 1, 'misses': 2}
+
+
+def get_status(cache, timeout):
+    """
+    /status response with ``cache`` in place, and how long the event loop
+    was blocked at most while it was answered
+    """
+    httpx = pytest.importorskip('httpx')
+
+    async def main():
+        blocked = 0.0
+        done = asyncio.Event()
+
+        async def watch():
+            nonlocal blocked
+            while not done.is_set():
+                started = time.perf_counter()
+                await asyncio.sleep(0.01)
+                blocked = max(blocked, time.perf_counter() - started - 0.01)
+
+        watcher = asyncio.ensure_future(watch())
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+            response = await client.get('/status')
+        done.set()
+        await watcher
+        return response.json(), blocked
+
+    original = server.cache, server.STATS_TIMEOUT_SECONDS
+    server.cache, server.STATS_TIMEOUT_SECONDS = cache, timeout
+    try:
+        return asyncio.run(main())
+    finally:
+        server.cache, server.STATS_TIMEOUT_SECONDS = original
+
+
+def test_status_reads_cache_stats_off_the_event_loop():
+    status, blocked = get_status(LockedCache(0.3), timeout=2)
+
+    assert status['cache'] == {'hits': 1, 'misses': 2}
+    assert blocked < 0.2
+
+
+def test_status_leaves_out_cache_stats_that_take_too_long():
+    started = time.perf_counter()
+    status, _ = get_status(LockedCache(1.0), timeout=0.1)
+
+    assert status['cache'] is None
+    assert time.perf_counter() - started < 0.9
+
+
+def test_closing_a_pdf_stream_leaves_the_event_loop_free(monkeypatch):
+    doc = fitz.open()
+    for _ in range(3):
+        doc.new_page()
+    content = doc.tobytes()
+    doc.close()
+
+    def slow_pages(doc, **kwargs):
+        for number in range(len(doc)):
+            time.sleep(0.3)
+            yield RenderedPage(number, np.zeros((8, 8, 3), dtype=np.uint8))
+
+    monkeypatch.setattr(server, 'iter_pdf_pages', slow_pages)
+    batcher = server.PageBatcher(SlowPredictor(), window_ms=5, max_pages=16)
+
+    async def main():
+        blocked = 0.0
+        done = asyncio.Event()
+
+        async def watch():
+            nonlocal blocked
+            while not done.is_set():
+                started = time.perf_counter()
+                await asyncio.sleep(0.01)
+                blocked = max(blocked, time.perf_counter() - started - 0.01)
+
+        batcher.start()
+        try:
+            summaries = server.summarize_pdf(content)
+            await summaries.__anext__()
+            # The render thread is now busy with the next page
+            await asyncio.sleep(0.05)
+            watcher = asyncio.ensure_future(watch())
+            await summaries.aclose()
+            done.set()
+            await watcher
+        finally:
+            await batcher.stop()
+        return blocked
+
+    original = server.batcher, server.cache
+    server.batcher, server.cache = batcher, None
+    try:
+        blocked = asyncio.run(main())
+    finally:
+        server.batcher, server.cache = original
+
+    assert blocked < 0.15
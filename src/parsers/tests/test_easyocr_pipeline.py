@@ -0,0 +1,95 @@
+"""
+EasyOCR script: PDF handling around the model
+"""
+
+import cv2
+import fitz
+import numpy as np
+import pytest
+
+import run_easyocr
+
+
+class FakeReader:
+    """
+    Stands in for easyocr.Reader: one word per page, read with confidence 0.9
+    """
+
+    def readtext(self, image):
+        return [([[1, 1], [30, 1], [30, 10], [1, 10]], f'WBC{image.shape[1]}', 0.9)]
+
+
+@pytest.fixture
+def scanned_pdf(tmp_path):
+    """
+    Three image-only pages (no text layer) and one page with a text layer
+    """
+    ok, png = cv2.imencode('.png', np.full((200, 150), 255, dtype=np.uint8))
+    doc = fitz.open()
+    for number in range(4):
+        page = doc.new_page(width=150, height=200)
+        if number == 2:
+            for line, text in enumerate(['Collected 2024-01-02', 'Glucose 5.2 mmol/L', 'Range 3.9-5.6 mmol/L',
+                                         'Hemoglobin A1c 5.4 %', 'Range 4.0-6.0 %']):
+                page.insert_text((10, 30 + 15 * line), text, fontsize=9)
+        else:
+            page.insert_image(page.rect, stream=png.tobytes())
+    path = tmp_path / 'report.pdf'
+    doc.save(str(path))
+    doc.close()
+    return str(path)
+
+
+def test_pdf_is_opened_once_per_run(monkeypatch, scanned_pdf):
+    opened = []
+    open_pdf = run_easyocr.open_pdf
+
+    def counting_open(source):
+        opened.append(source)
+        return open_pdf(source)
+
+    monkeypatch.setattr(run_easyocr, 'open_pdf', counting_open)
+    monkeypatch.setattr(run_easyocr, 'TEXT_LAYER_ENABLED', True)
+
+    records = list(run_easyocr.iter_pages(FakeReader(), scanned_pdf, enhance='off', dpi='auto', roi=False))
+
+    assert opened == [scanned_pdf]
+    assert [record['source'] for record in records] == ['ocr', 'ocr', 'text_layer', 'ocr']
+    assert records[0]['text'].startswith('WBC')
+
+
+def test_abandoned_pages_close_the_document(monkeypatch, scanned_pdf):
+    docs = []
+
+    def tracking_open(source):
+        docs.append(fitz.open(source))
+        return docs[-1]
+
+    monkeypatch.setattr(run_easyocr, 'open_pdf', tracking_open)
+
+    pages = run_easyocr.iter_pages(FakeReader(), scanned_pdf, enhance='off', dpi=72, roi=False)
+    next(pages)
+    pages.close()
+
+    assert docs[0].is_closed
+
+
+def test_unknown_enhance_mode_is_rejected(scanned_pdf):
+    with pytest.raises(ValueError, match="Unknown enhance mode 'gatd'"):
+        run_easyocr.extract_text(scanned_pdf, enhance='gatd')
+
+
+def test_unknown_enhance_setting_stops_the_script(monkeypatch, capsys, scanned_pdf):
+    monkeypatch.setattr(run_easyocr, 'DEFAULT_ENHANCE', 'gatd')
+    monkeypatch.setattr('sys.argv', ['run_easyocr.py', scanned_pdf])
+
+    with pytest.raises(SystemExit) as exit_info:
+        run_easyocr.main()
+
+    assert exit_info.value.code == 2
+    assert "OCR_ENHANCE must be one of: gated, always, off (got 'gatd')" in capsys.readouterr().err
+
+
+def test_unknown_preprocessing_step_is_rejected():
+    with pytest.raises(ValueError, match='Unknown preprocessing step'):
+        run_easyocr.Preprocessor('adaptiv')
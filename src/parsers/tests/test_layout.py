@@ -0,0 +1,92 @@
+"""
+Line and column reconstruction, reading order and detection merging
+"""
+
+import numpy as np
+
+from ocr_common.layout import assign_lines, assign_columns, line_members, reconstruct_lines
+from ocr_common.boxes import merge_detections, reading_order
+from ocr_common.roi import select_table_boxes
+
+
+def quad(x0, y0, x1, y1):
+    return [[x0, y0], [x1, y0], [x1, y1], [x0, y1]]
+
+
+def test_assign_lines_numbers_lines_top_to_bottom():
+    boxes = [(100, 52, 160, 72), (0, 0, 50, 20), (0, 50, 90, 70), (60, 3, 120, 23)]
+
+    assert assign_lines(boxes).tolist() == [1, 0, 1, 0]
+
+
+def test_assign_lines_splits_lines_closer_than_a_box_height():
+    boxes = [(0, 0, 50, 10), (0, 12, 50, 22), (60, 1, 90, 11)]
+
+    assert assign_lines(boxes).tolist() == [0, 1, 0]
+
+
+def test_assign_lines_scales_with_box_height():
+    boxes = np.array([(0, 0, 50, 20), (60, 4, 90, 24), (0, 40, 50, 60)], dtype=np.float64)
+
+    assert assign_lines(boxes).tolist() == assign_lines(boxes * 3).tolist() == [0, 0, 1]
+
+
+def test_assign_lines_empty():
+    assert assign_lines([]).tolist() == []
+    assert line_members(assign_lines([])) == []
+
+
+def test_line_members_groups_indexes_by_line():
+    assert line_members(np.array([1, 0, 2, 0, 1])) == [[1, 3], [0, 4], [2]]
+
+
+def test_assign_columns_in_table_rows_only():
+    boxes = [
+        (0, 0, 200, 10),                                        # heading, one box
+        (0, 20, 60, 30), (100, 20, 130, 30), (160, 20, 200, 30),
+        (0, 40, 80, 50), (100, 40, 125, 50), (160, 40, 210, 50),
+    ]
+    line = assign_lines(boxes)
+
+    assert assign_columns(boxes, line).tolist() == [-1, 0, 1, 2, 0, 1, 2]
+
+
+def test_reconstruct_lines_joins_boxes_left_to_right():
+    boxes = [(120, 1, 160, 21), (0, 0, 100, 20), (0, 40, 60, 60), (70, 41, 100, 61)]
+    texts = ['5.2', 'Glucose', 'HbA1c', '5.4']
+
+    assert reconstruct_lines(boxes, texts) == ['Glucose 5.2', 'HbA1c 5.4']
+    assert reconstruct_lines([], []) == []
+
+
+def test_reading_order_of_detections():
+    detections = [
+        (quad(70, 41, 100, 61), '5.4', 0.9),
+        (quad(120, 1, 160, 21), '5.2', 0.9),
+        (quad(0, 40, 60, 60), 'HbA1c', 0.9),
+        (quad(0, 0, 100, 20), 'Glucose', 0.9),
+    ]
+
+    assert [text for _, text, _ in reading_order(detections)] == ['Glucose', '5.2', 'HbA1c', '5.4']
+    assert reading_order([]) == []
+
+
+def test_merge_keeps_the_more_confident_overlapping_detection():
+    primary = [(quad(0, 0, 100, 20), 'Glucoso', 0.4), (quad(120, 0, 160, 20), '5.2', 0.95)]
+    secondary = [(quad(2, 1, 101, 21), 'Glucose', 0.9), (quad(120, 1, 161, 21), '5,2', 0.5),
+                 (quad(0, 40, 60, 60), 'HbA1c', 0.8)]
+
+    merged = merge_detections(primary, secondary)
+
+    assert [text for _, text, _ in merged] == ['Glucose', '5.2', 'HbA1c']
+
+
+def test_roi_rows_come_from_assign_lines():
+    # Rows slightly tilted: the right-hand boxes sit a little lower
+    rects = []
+    for row in range(4):
+        y = 100 + 20 * row
+        rects += [(0, y, 60, y + 12), (100, y + 2, 140, y + 14), (180, y + 4, 220, y + 16)]
+    heading = [(0, 0, 200, 14)]
+
+    assert select_table_boxes(heading + rects) == list(range(1, 13))
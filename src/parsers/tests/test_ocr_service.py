@@ -0,0 +1,157 @@
+"""
+OCR service: engine interface, per-engine detect/recognize and request
+validation
+"""
+
+import cv2
+import numpy as np
+import pytest
+
+pytest.importorskip('fastapi')
+from fastapi.testclient import TestClient
+
+from ocr_service import app as service_app
+from ocr_service.engines import Engine, PaddleEngine, EasyOCREngine, DocTREngine, rect_quad
+
+
+class FixedEngine(Engine):
+    """
+    Engine without a model that reads one word on every page
+    """
+
+    name = 'doctr'
+    package = 'python-doctr'
+
+    def load(self):
+        self.model = object()
+
+    def detect(self, image):
+        return [rect_quad(1, 1, 20, 8)]
+
+    def recognize(self, image, quads):
+        return [(quad, 'Glucose', 0.9) for quad in quads]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setitem(service_app.registry.engines, 'doctr', FixedEngine())
+    monkeypatch.setattr(service_app.service, 'cache', None)
+    return TestClient(service_app.app)
+
+
+def png_upload():
+    ok, data = cv2.imencode('.png', np.full((40, 60, 3), 255, dtype=np.uint8))
+    return {'file': ('page.png', data.tobytes(), 'image/png')}
+
+
+def test_engine_must_implement_load_detect_and_recognize():
+    class LoadOnly(Engine):
+        def load(self):
+            pass
+
+        def batch(self, images):
+            return [[] for _ in images]
+
+    with pytest.raises(TypeError):
+        LoadOnly()
+    # batch defaults to detect, then recognize, page by page
+    assert FixedEngine().read([np.zeros((4, 4), dtype=np.uint8)] * 2) == [
+        [(rect_quad(1, 1, 20, 8), 'Glucose', 0.9)]
+    ] * 2
+
+
+class FakePaddle:
+    """
+    PaddleOCR's det-only call and recognizer
+    """
+
+    def ocr(self, image, det, rec, cls):
+        assert det and not rec
+        return [[[[2, 3], [30, 3], [30, 12], [2, 12]]]]
+
+    def text_recognizer(self, crops):
+        assert all(crop.ndim == 3 for crop in crops)
+        return [('Glucose', 0.95) for _ in crops], 0.0
+
+
+class FakeEasyOCR:
+    """
+    easyocr.Reader's detect and recognize
+    """
+
+    def detect(self, image):
+        return [[[2, 30, 3, 12]]], [[[[40, 3], [60, 5], [59, 14], [39, 12]]]]
+
+    def recognize(self, image, horizontal_list, free_list):
+        self.regions = horizontal_list, free_list
+        boxes = [rect_quad(x0, y0, x1, y1) for x0, x1, y0, y1 in horizontal_list] + free_list
+        return [(box, 'mmol/L', 0.8) for box in boxes]
+
+
+class FakeDocTR:
+    """
+    DocTR's detection and recognition predictors
+    """
+
+    def det_predictor(self, images):
+        return [{'words': np.array([[0.1, 0.2, 0.5, 0.4, 0.9]])}]
+
+    def reco_predictor(self, crops):
+        self.shapes = [crop.shape for crop in crops]
+        return [('5.2', 0.7) for _ in crops]
+
+
+def test_paddle_detect_and_recognize():
+    engine = PaddleEngine()
+    engine.model = FakePaddle()
+    image = np.full((20, 40), 255, dtype=np.uint8)
+
+    quads = engine.detect(image)
+
+    assert quads == [[[2.0, 3.0], [30.0, 3.0], [30.0, 12.0], [2.0, 12.0]]]
+    assert engine.recognize(image, quads) == [(quads[0], 'Glucose', 0.95)]
+    assert engine.recognize(image, []) == []
+
+
+def test_easyocr_detect_and_recognize():
+    engine = EasyOCREngine()
+    engine.model = FakeEasyOCR()
+    image = np.full((20, 70), 255, dtype=np.uint8)
+
+    quads = engine.detect(image)
+    detections = engine.recognize(image, quads)
+
+    assert quads[0] == rect_quad(2, 3, 30, 12)
+    # Upright rectangles go back as horizontal boxes, the rest as free ones
+    assert engine.model.regions == ([[2, 30, 3, 12]], [[[40, 3], [60, 5], [59, 14], [39, 12]]])
+    assert [text for _, text, _ in detections] == ['mmol/L', 'mmol/L']
+
+
+def test_doctr_detect_and_recognize():
+    engine = DocTREngine()
+    engine.model = FakeDocTR()
+    image = np.zeros((100, 200, 3), dtype=np.uint8)
+
+    quads = engine.detect(image)
+    detections = engine.recognize(image, quads)
+
+    assert quads == [rect_quad(20.0, 20.0, 100.0, 40.0)]
+    assert engine.model.shapes == [(21, 81, 3)]
+    assert detections == [(quads[0], '5.2', 0.7)]
+
+
+@pytest.mark.parametrize('zoom', ['abc', '0', '-1', 'nan', 'inf'])
+def test_invalid_zoom_is_a_bad_request(client, zoom):
+    response = client.post('/ocr', params={'engine': 'doctr', 'zoom': zoom}, files=png_upload())
+
+    assert response.status_code == 400
+    assert 'zoom' in response.json()['detail']
+
+
+@pytest.mark.parametrize('zoom', ['auto', '1.5', None])
+def test_valid_zoom_is_accepted(client, zoom):
+    params = {'engine': 'doctr'} if zoom is None else {'engine': 'doctr', 'zoom': zoom}
+    response = client.post('/ocr', params=params, files=png_upload())
+
+    assert response.status_code == 200
+    assert 'Glucose' in response.json()['text']
@@ -0,0 +1,75 @@
+"""
+PaddleOCR worker mode (job lines that aren't usable jobs) and pool
+workers (pages that fail)
+"""
+
+import io
+import json
+
+import fitz
+import pytest
+
+import paddle_ocr
+
+
+def run_jobs(monkeypatch, capsys, lines):
+    """
+    Responses of a worker (without a model) to the given stdin lines
+    """
+    monkeypatch.setattr(paddle_ocr, 'create_ocr', lambda: None)
+    monkeypatch.setattr('sys.stdin', io.StringIO(''.join(line + '\n' for line in lines)))
+    paddle_ocr.run_worker()
+    return [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+
+@pytest.mark.parametrize('line', ['[1]', '"job"', '42', 'null'])
+def test_non_object_job_is_answered_with_an_error(monkeypatch, capsys, line):
+    responses = run_jobs(monkeypatch, capsys, [line, '{"id": 2, "file": "/missing.pdf"}'])
+
+    assert responses[0]['id'] is None
+    assert 'expected a JSON object' in responses[0]['error']
+    # The worker keeps serving jobs after a bad one
+    assert responses[1] == {'id': 2, 'error': 'File not found: /missing.pdf'}
+
+
+def test_invalid_json_is_answered_with_an_error(monkeypatch, capsys):
+    responses = run_jobs(monkeypatch, capsys, ['{"id": 1', '', '{"id": 3, "file": "scan.png"}'])
+
+    assert responses[0]['id'] is None
+    assert responses[0]['error'].startswith('Invalid job:')
+    assert responses[1] == {'id': 3, 'error': 'File not found: scan.png'}
+
+
+@pytest.fixture
+def scanned_pdf(tmp_path):
+    """
+    Two pages without a text layer
+    """
+    doc = fitz.open()
+    for _ in range(2):
+        doc.new_page(width=150, height=200)
+    path = tmp_path / 'scan.pdf'
+    doc.save(str(path))
+    doc.close()
+    return str(path)
+
+
+def test_pool_page_of_missing_file_is_an_error_page(tmp_path):
+    result = paddle_ocr.ocr_pool_page((str(tmp_path / 'gone.pdf'), 0, 1.0, False))
+
+    assert result['source'] == 'error'
+    assert result['elements'] is None
+
+
+def test_pool_page_ocr_failure_is_an_error_page(monkeypatch, scanned_pdf):
+    def broken_ocr(image, page_num, *args):
+        if page_num == 0:
+            raise ValueError('bad page')
+        return [], False
+
+    monkeypatch.setattr(paddle_ocr, 'ocr_page_cached', broken_ocr)
+    monkeypatch.setattr(paddle_ocr, '_pool_doc', None)
+
+    results = [paddle_ocr.ocr_pool_page((scanned_pdf, page, 1.0, False)) for page in range(2)]
+
+    assert [result['source'] for result in results] == ['error', 'ocr']
@@ -0,0 +1,49 @@
+"""
+Page pool: worker start-up and results
+"""
+
+import os
+
+import pytest
+
+from ocr_common.parallel import PagePool, threads_per_worker
+
+_offset = None
+
+
+def load_offset(threads, offset):
+    global _offset
+    _offset = offset
+
+
+def add_offset(value):
+    return value + _offset
+
+
+def fail_to_load(threads):
+    raise ImportError("No module named 'torch'")
+
+
+def test_pool_runs_tasks_in_order():
+    with PagePool(2, load_offset, initargs=(100,), threads=1) as pool:
+        assert list(pool.imap(add_offset, range(6))) == [100, 101, 102, 103, 104, 105]
+
+
+def test_worker_that_fails_to_load_raises_in_parent():
+    with pytest.raises(RuntimeError, match="No module named 'torch'"):
+        PagePool(2, fail_to_load, threads=1)
+
+
+def test_threads_split_cores_between_workers():
+    assert threads_per_worker(2, threads=3) == 3
+    assert threads_per_worker(os.cpu_count() or 1) == 1
+
+
+def die_while_loading(threads):
+    # Exits without reporting back, like a worker killed during start-up
+    os._exit(1)
+
+
+def test_worker_that_dies_while_starting_times_out():
+    with pytest.raises(RuntimeError, match="did not start within 3 s"):
+        PagePool(1, die_while_loading, threads=1, start_timeout=3)
@@ -0,0 +1,58 @@
+"""
+Background page prefetching
+"""
+
+import threading
+import time
+
+import pytest
+
+from ocr_common.pipeline import prefetch
+
+
+def test_items_come_in_order():
+    assert list(prefetch(iter(range(20)), depth=2)) == list(range(20))
+
+
+def test_producer_stays_at_most_depth_items_ahead():
+    produced = []
+
+    def pages():
+        for i in range(10):
+            produced.append(i)
+            yield i
+
+    consumed = 0
+    for item in prefetch(pages(), depth=2):
+        time.sleep(0.01)
+        consumed += 1
+        # Queued items plus the one being produced
+        assert len(produced) - consumed <= 3
+
+
+def test_producer_errors_reach_the_consumer():
+    def pages():
+        yield 1
+        raise RuntimeError('render failed')
+
+    items = prefetch(pages())
+    assert next(items) == 1
+    with pytest.raises(RuntimeError, match='render failed'):
+        next(items)
+
+
+def test_abandoning_stops_and_closes_the_producer():
+    closed = threading.Event()
+
+    def pages():
+        try:
+            for i in range(1000):
+                yield i
+        finally:
+            closed.set()
+
+    items = prefetch(pages(), depth=1)
+    next(items)
+    items.close()
+
+    assert closed.is_set()
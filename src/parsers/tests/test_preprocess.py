@@ -0,0 +1,99 @@
+"""
+Page preprocessing
+"""
+
+import cv2
+import numpy as np
+import pytest
+
+from ocr_common.preprocess import Preprocessor, engine_steps, estimate_skew, parse_steps, to_gray
+
+
+def text_page(angle=0.0, width=1200, height=1500):
+    """
+    White page with dark text-like lines, rotated by ``angle`` degrees
+    """
+    page = np.full((height, width), 255, dtype=np.uint8)
+    for y in range(150, height - 150, 60):
+        for x in range(100, width - 200, 140):
+            cv2.rectangle(page, (x, y), (x + 100, y + 18), 30, -1)
+    if angle:
+        matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+        page = cv2.warpAffine(page, matrix, (width, height), borderValue=255)
+    return page
+
+
+def test_parse_steps_orders_and_validates():
+    assert parse_steps('otsu, deskew,DENOISE') == ('denoise', 'deskew', 'otsu')
+    assert parse_steps('none') == parse_steps('') == ()
+    with pytest.raises(ValueError, match='Unknown preprocessing step'):
+        parse_steps('otsu,sharpen')
+    with pytest.raises(ValueError, match='one of otsu and adaptive'):
+        parse_steps('otsu,adaptive')
+
+
+def test_engine_steps_read_the_engine_setting(monkeypatch):
+    monkeypatch.setenv('OCR_PREPROCESS_PADDLE', 'deskew,adaptive')
+
+    assert engine_steps('paddle', 'otsu') == ('deskew', 'adaptive')
+    assert engine_steps('easyocr', 'otsu') == ('otsu',)
+
+
+def test_to_gray():
+    rgb = np.zeros((4, 5, 3), dtype=np.uint8)
+    rgb[..., 0] = 255
+    gray = np.zeros((4, 5), dtype=np.uint8)
+
+    assert to_gray(rgb).shape == (4, 5)
+    assert to_gray(gray) is gray
+    assert to_gray(gray[:, :, None]).shape == (4, 5)
+
+
+@pytest.mark.parametrize('angle', [-3.0, -1.2, 0.0, 2.0])
+def test_estimate_skew(angle):
+    assert estimate_skew(text_page(angle)) == pytest.approx(angle, abs=0.15)
+
+
+def test_blank_page_has_no_skew():
+    assert estimate_skew(np.full((500, 400), 255, dtype=np.uint8)) == 0.0
+
+
+def test_otsu_binarizes_without_touching_the_input():
+    page = cv2.cvtColor(text_page(), cv2.COLOR_GRAY2RGB)
+    original = page.copy()
+
+    binary, report = Preprocessor('otsu').process(page, page=0)
+
+    assert binary.shape == page.shape[:2]
+    assert set(np.unique(binary).tolist()) == {0, 255}
+    np.testing.assert_array_equal(page, original)
+    assert set(report['steps']) == {'otsu'}
+
+
+def test_buffers_are_reused_between_pages():
+    preprocessor = Preprocessor('denoise,deskew,otsu')
+
+    _, first = preprocessor.process(text_page(2.0))
+    _, second = preprocessor.process(text_page(-2.0))
+
+    assert first['allocated_bytes'] > 0
+    assert second['allocated_bytes'] == 0
+    assert second['skew'] == pytest.approx(-2.0, abs=0.15)
+
+
+def test_deskew_levels_the_page():
+    deskewed, report = Preprocessor('deskew').process(text_page(2.5))
+
+    assert report['skew'] == pytest.approx(2.5, abs=0.15)
+    assert abs(estimate_skew(deskewed)) < 0.2
+
+
+def test_no_steps_returns_the_page_as_it_is():
+    page = text_page()
+    preprocessor = Preprocessor('none')
+
+    processed, report = preprocessor.process(page)
+
+    assert processed is page
+    assert preprocessor.setting == 'none'
+    assert report['allocated_bytes'] == 0
@@ -0,0 +1,40 @@
+"""
+Results-table region selection
+"""
+
+from ocr_common.roi import select_table_boxes
+
+
+def row(y, xs, height=10):
+    return [(x, y, x + 40, y + height) for x in xs]
+
+
+def test_table_rows_are_kept_and_letterhead_skipped():
+    letterhead = row(0, [0]) + row(20, [200])
+    table = row(100, [0, 60, 120]) + row(115, [0, 60, 120]) + row(131, [0, 60]) + row(146, [0, 60, 120])
+    footer = row(400, [0])
+    rects = letterhead + table + footer
+
+    assert select_table_boxes(rects) == list(range(len(letterhead), len(letterhead) + len(table)))
+
+
+def test_wrapped_single_box_lines_inside_a_table_are_kept():
+    rects = row(0, [0, 60]) + row(15, [0, 60]) + row(30, [0]) + row(45, [0, 60]) + row(60, [0, 60])
+
+    assert select_table_boxes(rects) == list(range(len(rects)))
+
+
+def test_page_without_a_table_keeps_every_box():
+    rects = row(0, [0]) + row(20, [0]) + row(40, [0, 60]) + row(60, [0])
+
+    assert select_table_boxes(rects) == list(range(len(rects)))
+
+
+def test_too_few_table_rows_is_not_a_table():
+    rects = row(0, [0]) + row(20, [0, 60]) + row(35, [0, 60]) + row(200, [0]) + row(300, [0])
+
+    assert select_table_boxes(rects) == list(range(len(rects)))
+
+
+def test_empty_page():
+    assert select_table_boxes([]) == []
@@ -0,0 +1,96 @@
+"""
+NDJSON page records of the OCR scripts, on cold and warm cache runs
+"""
+
+import json
+import sys
+
+import cv2
+import fitz
+import numpy as np
+import pytest
+
+import paddle_ocr
+import run_easyocr
+from ocr_common.cache import OCRCache
+
+
+@pytest.fixture
+def report_pdf(tmp_path):
+    """
+    A page with a text layer followed by an image-only page
+    """
+    ok, png = cv2.imencode('.png', np.full((200, 150), 255, dtype=np.uint8))
+    doc = fitz.open()
+    page = doc.new_page(width=150, height=200)
+    for line, text in enumerate(['Glucose 5.2 mmol/L', 'Range 3.9-5.6 mmol/L', 'Hemoglobin A1c 5.4 %',
+                                 'Range 4.0-6.0 %']):
+        page.insert_text((10, 30 + 15 * line), text, fontsize=9)
+    page = doc.new_page(width=150, height=200)
+    page.insert_image(page.rect, stream=png.tobytes())
+    path = tmp_path / 'report.pdf'
+    doc.save(str(path))
+    doc.close()
+    return str(path)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = OCRCache(str(tmp_path / 'cache.sqlite'))
+    yield cache
+    cache.close()
+
+
+def paddle_stream(path, cache):
+    records = []
+    report = {}
+    text = paddle_ocr.process_pdf_simple(path, cache=cache, report=report, zoom=1.0, roi=False,
+                                         on_page=records.append)
+    return text, records, report
+
+
+def test_paddle_warm_run_streams_the_cached_pages(monkeypatch, report_pdf, cache):
+    def fake_ocr(image, page_num, *args):
+        return [{'text': 'WBC 6.1', 'x': 20, 'y': 10, 'confidence': 0.9, 'box': [1, 5, 40, 15]}], False
+
+    monkeypatch.setattr(paddle_ocr, 'TEXT_LAYER_ENABLED', True)
+    monkeypatch.setattr(paddle_ocr, 'create_ocr', lambda: None)
+    monkeypatch.setattr(paddle_ocr, 'ocr_page_cached', fake_ocr)
+
+    cold_text, cold, _ = paddle_stream(report_pdf, cache)
+    warm_text, warm, report = paddle_stream(report_pdf, cache)
+
+    assert report['document_cache_hit']
+    assert warm_text == cold_text
+    assert [record['source'] for record in cold] == ['text_layer', 'ocr']
+    assert [record['source'] for record in warm] == ['cache', 'cache']
+    assert [(r['page'], r['text'], r['words'], r['zoom']) for r in warm] == \
+        [(r['page'], r['text'], r['words'], r['zoom']) for r in cold]
+
+
+def easyocr_stream(capsys):
+    run_easyocr.main()
+    return [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+
+def test_easyocr_warm_run_streams_the_cached_pages(monkeypatch, capsys, report_pdf, cache):
+    class FakeReader:
+        def readtext(self, image):
+            return [([[1, 1], [30, 1], [30, 10], [1, 10]], 'WBC', 0.9)]
+
+    monkeypatch.setattr(run_easyocr, 'TEXT_LAYER_ENABLED', True)
+    monkeypatch.setattr(run_easyocr, 'open_cache', lambda: cache)
+    monkeypatch.setattr(sys, 'argv', ['run_easyocr.py', report_pdf, '--format', 'ndjson', '--enhance', 'off'])
+
+    monkeypatch.setattr(run_easyocr, 'create_reader', FakeReader)
+    cold = easyocr_stream(capsys)
+    monkeypatch.setattr(run_easyocr, 'create_reader', lambda: pytest.fail("model loaded on a cache hit"))
+    warm = easyocr_stream(capsys)
+
+    assert [record['type'] for record in warm] == ['page', 'page', 'summary']
+    assert warm[-1]['cached'] and not cold[-1]['cached']
+    assert warm[-1]['text'] == cold[-1]['text']
+    assert [record['source'] for record in cold[:2]] == ['text_layer', 'ocr']
+    assert [record['source'] for record in warm[:2]] == ['cache', 'cache']
+    assert [(r['page'], r['text'], r['words']) for r in warm[:2]] == \
+        [(r['page'], r['text'], r['words']) for r in cold[:2]]
@@ -0,0 +1,178 @@
+"""
+Serverless OCR handler (api/ocr/process.py): request body readers and
+error statuses
+"""
+
+import io
+import os
+import json
+import base64
+import threading
+import importlib.util
+import urllib.error
+import urllib.request
+from http.server import HTTPServer
+
+import pytest
+
+PROCESS_PATH = os.path.join(os.path.dirname(__file__), '..', '..', '..', 'api', 'ocr', 'process.py')
+spec = importlib.util.spec_from_file_location('ocr_process', PROCESS_PATH)
+process = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(process)
+
+BOUNDARY = 'form-boundary'
+
+
+def multipart(*parts):
+    """
+    multipart/form-data body of (headers, content) parts
+    """
+    body = b''
+    for disposition, content in parts:
+        body += (f'--{BOUNDARY}\r\nContent-Disposition: form-data; {disposition}\r\n'
+                 f'Content-Type: application/octet-stream\r\n\r\n').encode() + content + b'\r\n'
+    return body + f'--{BOUNDARY}--\r\n'.encode()
+
+
+def upload(content_type, body, chunk_size=7):
+    """
+    The file a body writer extracts from ``body`` fed in small chunks
+    """
+    out = io.BytesIO()
+    writer = process.body_writer(content_type, out)
+    for start in range(0, len(body), chunk_size):
+        writer.feed(body[start:start + chunk_size])
+    writer.close()
+    return out.getvalue(), writer
+
+
+def test_upload_writer_is_abstract():
+    with pytest.raises(TypeError):
+        process.UploadWriter(io.BytesIO())
+
+
+def test_raw_body_is_the_file():
+    data, writer = upload('application/pdf', b'%PDF-1.7 data')
+
+    assert data == b'%PDF-1.7 data'
+    assert process.file_suffix(writer.head) == '.pdf'
+
+
+@pytest.mark.parametrize('chunk_size', [1, 5, 4096])
+def test_base64_field_is_decoded(chunk_size):
+    content = b'\x89PNG\r\n' + bytes(range(256)) * 3
+    encoded = base64.b64encode(content).decode()
+    # JSON encoders may escape "/" as "\/"
+    body = json.dumps({'name': 'x', 'file': encoded, 'other': 1}).replace('/', '\\/').encode()
+
+    data, writer = upload('application/json', body, chunk_size)
+
+    assert data == content
+    assert process.file_suffix(writer.head) == '.png'
+
+
+def test_base64_body_without_file_field_is_rejected():
+    with pytest.raises(ValueError, match="no 'file' field"):
+        upload('application/json', b'{"image": "AAAA"}')
+
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 16, 4096])
+def test_multipart_file_part_wins_over_earlier_filename_part(chunk_size):
+    body = multipart(('name="thumbnail"; filename="thumb.png"', b'THUMB'),
+                     ('name="note"', b'ignored'),
+                     ('name="file"; filename="report.pdf"', b'%PDF-report'))
+
+    data, writer = upload(f'multipart/form-data; boundary={BOUNDARY}', body, chunk_size)
+
+    assert data == b'%PDF-report'
+    assert writer.size == len(b'%PDF-report')
+    assert process.file_suffix(writer.head) == '.pdf'
+
+
+def test_multipart_file_part_first():
+    body = multipart(('name="file"; filename="report.pdf"', b'%PDF-report'),
+                     ('name="thumbnail"; filename="thumb.png"', b'THUMB'))
+
+    data, _ = upload(f'multipart/form-data; boundary="{BOUNDARY}"', body)
+
+    assert data == b'%PDF-report'
+
+
+def test_multipart_falls_back_to_first_filename_part():
+    body = multipart(('name="note"', b'ignored'),
+                     ('name="upload"; filename="a.pdf"', b'%PDF-first'),
+                     ('name="other"; filename="b.pdf"', b'%PDF-second'))
+
+    data, _ = upload(f'multipart/form-data; boundary={BOUNDARY}', body)
+
+    assert data == b'%PDF-first'
+
+
+def test_multipart_part_containing_boundary_like_bytes():
+    content = b'%PDF\r\n--form-boundar\r\n-x'
+    body = multipart(('name="file"; filename="a.pdf"', content))
+
+    data, _ = upload(f'multipart/form-data; boundary={BOUNDARY}', body, chunk_size=2)
+
+    assert data == content
+
+
+def test_multipart_without_file_part_is_rejected():
+    body = multipart(('name="note"', b'no file here'))
+
+    with pytest.raises(ValueError, match='no file part'):
+        upload(f'multipart/form-data; boundary={BOUNDARY}', body)
+
+
+def test_multipart_cut_off_inside_file_part_is_rejected():
+    body = multipart(('name="file"; filename="a.pdf"', b'%PDF-report'))
+
+    with pytest.raises(ValueError, match='ended inside the file part'):
+        upload(f'multipart/form-data; boundary={BOUNDARY}', body[:-30])
+
+
+class FailingOCR:
+    """
+    Stands in for PaddleOCR on a file it can't read
+    """
+
+    def ocr(self, path, cls=True):
+        raise ValueError('cannot identify image file')
+
+
+@pytest.fixture
+def post(monkeypatch):
+    """
+    POST a body to the handler on a local server; returns (status, JSON)
+    """
+    monkeypatch.setattr(process, '_ocr', FailingOCR())
+    server = HTTPServer(('127.0.0.1', 0), process.handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    def post(content_type, body):
+        request = urllib.request.Request(f'http://127.0.0.1:{server.server_port}/', data=body,
+                                         headers={'Content-Type': content_type})
+        try:
+            with urllib.request.urlopen(request) as response:
+                return response.status, json.load(response)
+        except urllib.error.HTTPError as e:
+            return e.code, json.load(e)
+
+    yield post
+    server.shutdown()
+    server.server_close()
+
+
+def test_unreadable_body_is_a_client_error(post):
+    status, result = post('application/json', b'{"file": "not base64!"}')
+
+    assert status == 400
+    assert not result['success']
+
+
+def test_ocr_value_error_is_a_server_error(post):
+    status, result = post('image/png', b'\x89PNG\r\n\x1a\n broken')
+
+    assert status == 500
+    assert result['error'] == 'cannot identify image file'